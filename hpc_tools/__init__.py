@@ -0,0 +1,9 @@
+"""
+Shared analysis tooling for the instructional benchmark harnesses.
+
+The scripts in the harness directories (likwid-parser.py, aggregator.py, plot_data.py, ...) import from this
+package. They are run from within their harness directory and put the repository root on `sys.path` themselves.
+
+The package is also installable (`pip install .` in the repository root), which provides the `hpc` command
+(hpc_tools.cli) with the parse, aggregate, normalize, plot and view subcommands on arbitrary paths.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from hpc_tools.cli import main
+
+sys.exit(main())
@@ -0,0 +1,305 @@
+"""
+Autotuning of the block size and thread count of the blocked dgemm binaries by successive halving.
+
+Instead of running the full B x threads grid, every candidate configuration is first run once. After each round,
+only the fastest 1/eta of the candidates survive and are run eta times as often, until one is left, so most of
+the budget goes to the configurations that can win. Clearly bad configurations are stopped early: a run is killed
+once it takes `slack` times as long as the fastest run so far, and a candidate whose first runtime is more than
+`slack` times the best is dropped right away.
+
+Each run is a local process of the command template (e.g. './benchmark-blocked-omp -N {N} -B {B}'), pinned to
+'threads' cores with OMP_NUM_THREADS set, as hpc_tools.sweep runs them. The runtime is the 'Elapsed time is :'
+line of the benchmark (or its 'runtime' CSV column); runs that fail or report a wrong result are discarded. So are
+runs that report other problem or block sizes than requested, as from a binary that ignores -N and -B and runs its
+built-in grid (benchmark-blocked of mmul-harness-instructional before it took them).
+
+The best configuration per binary, host and N is kept in a JSON tuning database, so later runs and job scripts
+reuse it instead of tuning again:
+
+    python -m hpc_tools.autotune tune --db data/tuning.json -N 512 -N 2048 --threads 1,4,16,64 -- \\
+        ./benchmark-blocked-omp -N {N} -B {B}
+    read B T <<< $(python -m hpc_tools.autotune best --db data/tuning.json --name benchmark-blocked-omp -N 2048)
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.sweep import THREADS_PARAM, available_cores, parse_csv_rows
+
+BLOCK_PARAM = 'B'
+DEFAULT_BLOCK_SIZES = [4, 8, 16, 32, 64, 128, 256]
+DEFAULT_COMMAND = ['./benchmark-blocked-omp', '-N', '{N}', '-B', '{B}']
+ELAPSED_RE = re.compile(r'Elapsed time is : (\d+\.?\d*(?:[eE][-+]?\d+)?)')
+# The sizes a benchmark reports running: the lines of the OpenMP harness, or the CSV columns of the serial one
+SIZE_RE = re.compile(r'Working on problem size N=\s*(\d+)')
+BLOCK_SIZE_RE = re.compile(r'Working on Block size = (\d+)')
+CSV_SIZE = 'N'
+CSV_BLOCK_SIZE = 'block_size'
+WRONG_RESULT = 'your answer is not the same'
+
+# --- Fields of a tuning database entry ---
+RUNTIME = 'runtime'
+RUNS = 'runs'
+CANDIDATES = 'candidates'
+TUNED_AT = 'tuned at'
+
+
+class Candidate:
+    """
+    One configuration under evaluation.
+
+    Attributes:
+        params (dict): The parameters the command template is formatted with, e.g. {'N': 2048, 'B': 16, 'threads': 4}.
+        runtimes (list[float]): The runtimes reported by the benchmark, in seconds.
+        walltimes (list[float]): The wall times of the runs, including setup and verification, in seconds.
+        dropped (str | None): Why the candidate was eliminated, None while it is alive.
+    """
+    def __init__(self, params):
+        self.params = params
+        self.runtimes = []
+        self.walltimes = []
+        self.dropped = None
+
+    @property
+    def score(self):
+        return statistics.median(self.runtimes) if self.runtimes else math.inf
+
+    def __repr__(self):
+        return ', '.join(f"{name}={value}" for name, value in self.params.items() if name != 'N')
+
+
+def parse_runtime(stdout):
+    """
+    Returns the runtime a benchmark printed: the median 'Elapsed time is :' value or 'runtime' CSV column, or
+    None if it printed neither.
+    """
+    values = [float(match) for match in ELAPSED_RE.findall(stdout)]
+    if not values:
+        values = [row[RUNTIME] for row in parse_csv_rows(stdout) if RUNTIME in row]
+    return statistics.median(values) if values else None
+
+
+def reported_sizes(stdout):
+    """
+    Returns the problem sizes and the block sizes a benchmark printed that it ran, each a set.
+    """
+    rows = parse_csv_rows(stdout)
+    sizes = {int(n) for n in SIZE_RE.findall(stdout)} | {int(row[CSV_SIZE]) for row in rows if CSV_SIZE in row}
+    block_sizes = ({int(b) for b in BLOCK_SIZE_RE.findall(stdout)}
+                   | {int(row[CSV_BLOCK_SIZE]) for row in rows if CSV_BLOCK_SIZE in row})
+    return sizes, block_sizes
+
+
+def measure(command, candidate, cores, timeout=None):
+    """
+    Runs a candidate once, pinned to the first `threads` of `cores`, and records its runtime.
+
+    Returns:
+        bool: Whether the run succeeded. A failed run sets candidate.dropped.
+    """
+    threads = int(candidate.params.get(THREADS_PARAM, 1))
+    pinned = cores[:threads]
+    args = [arg.format(**candidate.params, cores=','.join(map(str, pinned))) for arg in command]
+    env = dict(os.environ, OMP_NUM_THREADS=str(threads))
+    preexec = (lambda: os.sched_setaffinity(0, pinned)) if hasattr(os, 'sched_setaffinity') else None
+    start = time.perf_counter()
+    try:
+        result = subprocess.run(args, env=env, capture_output=True, text=True, timeout=timeout,
+                                preexec_fn=preexec)
+    except subprocess.TimeoutExpired:
+        candidate.dropped = f"stopped after {timeout:.2f} s"
+        return False
+    walltime = time.perf_counter() - start
+
+    runtime = parse_runtime(result.stdout)
+    sizes, block_sizes = reported_sizes(result.stdout)
+    if result.returncode != 0:
+        candidate.dropped = f"failed ({result.returncode})"
+    elif WRONG_RESULT in result.stdout:
+        candidate.dropped = "wrong result"
+    elif sizes - {int(candidate.params['N'])} or block_sizes - {int(candidate.params[BLOCK_PARAM])}:
+        candidate.dropped = (f"ran N={','.join(map(str, sorted(sizes)))} "
+                             f"B={','.join(map(str, sorted(block_sizes)))}, does it take -N and -B?")
+    elif runtime is None:
+        candidate.dropped = "no runtime in the output"
+    if candidate.dropped:
+        return False
+    candidate.runtimes.append(runtime)
+    candidate.walltimes.append(walltime)
+    return True
+
+
+def successive_halving(command, candidates, cores=None, eta=2, min_runs=1, slack=3.0, verbose=True):
+    """
+    Finds the fastest of `candidates` by successive halving.
+
+    Args:
+        command (list[str]): The command template, formatted with the parameters of a candidate and {cores}.
+        candidates (list[Candidate]): The configurations to choose from.
+        cores (list[int], optional): The cores to pin runs to. Defaults to the affinity of this process.
+        eta (int, optional): The fraction 1/eta of candidates that survives a round, and the factor the runs per
+                             candidate grow by. Defaults to 2.
+        min_runs (int, optional): The runs per candidate in the first round. Defaults to 1.
+        slack (float, optional): Runs taking `slack` times longer than the best are stopped, and candidates with a
+                                 first runtime `slack` times the best are dropped. Defaults to 3.0.
+        verbose (bool, optional): Print every run. Defaults to True.
+
+    Returns:
+        Candidate | None: The best candidate, or None if every candidate failed.
+    """
+    cores = available_cores() if cores is None else list(cores)
+    alive = list(candidates)
+    runs = min_runs
+    round_idx = 0
+    while alive:
+        for candidate in alive:
+            while len(candidate.runtimes) < runs and not candidate.dropped:
+                best_wall = min((min(c.walltimes) for c in candidates if c.walltimes), default=None)
+                timeout = slack * best_wall if best_wall is not None else None
+                if measure(command, candidate, cores, timeout) and verbose:
+                    print(f"round {round_idx}: {candidate}: {candidate.runtimes[-1]:.4f} s")
+            if candidate.dropped and verbose:
+                print(f"round {round_idx}: {candidate}: dropped, {candidate.dropped}")
+
+        best_score = min((c.score for c in alive if not c.dropped), default=math.inf)
+        for candidate in alive:
+            if not candidate.dropped and candidate.score > slack * best_score:
+                candidate.dropped = f"more than {slack:g} x slower than the best"
+        alive = sorted((c for c in alive if not c.dropped), key=lambda c: c.score)
+        if len(alive) <= 1:
+            break
+        keep = max(1, math.ceil(len(alive) / eta))
+        for candidate in alive[keep:]:
+            candidate.dropped = f"eliminated in round {round_idx}"
+        alive = alive[:keep]
+        if keep == 1:
+            break
+        runs *= eta
+        round_idx += 1
+    return alive[0] if alive else None
+
+
+def make_candidates(n, block_sizes, thread_counts):
+    """
+    Returns a candidate per block size that divides N (the blocked codes require it) and thread count.
+    """
+    return [Candidate({'N': n, BLOCK_PARAM: b, THREADS_PARAM: t})
+            for b in block_sizes if b <= n and n % b == 0 for t in thread_counts]
+
+
+def load_db(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def lookup(db, name, n, host=None):
+    """
+    Returns the tuned entry of binary `name` at problem size `n` on `host` (default: this host), or None.
+    """
+    return db.get(host or platform.node(), {}).get(name, {}).get(str(n))
+
+
+def save_db(path, db):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(db, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def record(db, name, n, best, candidates, host=None):
+    """
+    Stores the best candidate of a tuning run in the database.
+    """
+    db.setdefault(host or platform.node(), {}).setdefault(name, {})[str(n)] = {
+        BLOCK_PARAM: best.params[BLOCK_PARAM],
+        THREADS_PARAM: best.params[THREADS_PARAM],
+        RUNTIME: best.score,
+        RUNS: sum(len(c.runtimes) for c in candidates),
+        CANDIDATES: len(candidates),
+        TUNED_AT: time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Tunes the block size and thread count of a blocked dgemm binary.",
+                                         epilog="The command template follows '--' (default: ./benchmark-blocked-omp "
+                                                "-N {N} -B {B}).")
+    arg_parser.add_argument('action', choices=['tune', 'best'],
+                            help="tune: search the configurations, best: print 'B threads' from the database")
+    arg_parser.add_argument('--db', default='data/tuning.json', help="The tuning database (default: %(default)s)")
+    arg_parser.add_argument('-N', dest='sizes', type=int, action='append', required=True,
+                            help="A problem size (repeatable)")
+    arg_parser.add_argument('--name', help="The binary in the database (default: the command's executable)")
+    arg_parser.add_argument('--block-sizes', type=parse_ints, default=DEFAULT_BLOCK_SIZES,
+                            help="The block sizes to try (default: 4,8,...,256, those dividing N)")
+    arg_parser.add_argument('--threads', type=parse_ints, default=None,
+                            help="The thread counts to try (default: powers of 2 up to the available cores)")
+    arg_parser.add_argument('--eta', type=int, default=2, help="Keep 1/eta of the candidates per round (default: 2)")
+    arg_parser.add_argument('--min-runs', type=int, default=1, help="Runs per candidate in the first round (default: 1)")
+    arg_parser.add_argument('--slack', type=float, default=3.0,
+                            help="Stop runs and drop candidates this many times slower than the best (default: 3)")
+    arg_parser.add_argument('--retune', action='store_true', help="Tune sizes that are already in the database")
+    argv = sys.argv[1:] if argv is None else list(argv)
+    # The command template has options of its own (-N), so it is split off before parsing
+    command = DEFAULT_COMMAND
+    if '--' in argv:
+        command = argv[argv.index('--') + 1:] or DEFAULT_COMMAND
+        argv = argv[:argv.index('--')]
+    args = arg_parser.parse_args(argv)
+
+    name = args.name or os.path.basename(command[0])
+    db = load_db(args.db)
+
+    if args.action == 'best':
+        status = 0
+        for n in args.sizes:
+            entry = lookup(db, name, n)
+            if entry is None:
+                print(f"No tuned configuration of {name} at N={n} on {platform.node()}", file=sys.stderr)
+                status = 1
+            else:
+                print(entry[BLOCK_PARAM], entry[THREADS_PARAM])
+        return status
+
+    cores = available_cores()
+    thread_counts = args.threads or [1 << i for i in range(int(math.log2(len(cores))) + 1)]
+    for n in args.sizes:
+        entry = lookup(db, name, n)
+        if entry is not None and not args.retune:
+            print(f"N={n}: reusing B={entry[BLOCK_PARAM]}, threads={entry[THREADS_PARAM]} "
+                  f"({entry[RUNTIME]:.4f} s, tuned at {entry[TUNED_AT]})")
+            continue
+        candidates = [c for c in make_candidates(n, args.block_sizes, thread_counts)
+                      if c.params[THREADS_PARAM] <= len(cores)]
+        print(f"N={n}: tuning {len(candidates)} configuration(s) of {shlex.join(command)}")
+        best = successive_halving(command, candidates, cores, eta=args.eta, min_runs=args.min_runs,
+                                  slack=args.slack)
+        if best is None:
+            print(f"N={n}: every configuration failed")
+            continue
+        record(db, name, n, best, candidates)
+        save_db(args.db, db)
+        print(f"N={n}: best is {best} ({best.score:.4f} s), {sum(len(c.runtimes) for c in candidates)} run(s) of "
+              f"{len(candidates)} configuration(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+"""
+The `hpc` command: one entry point for the analysis tools of the harnesses, with paths and parameters as arguments.
+
+    hpc parse data/raw --output-dir data --csv          # likwid-perfctr .out files -> group and merged tables
+    hpc aggregate dgemv basic=data/basic blas=data/blas openmp@16=data/openmp-16 \\
+        --output data/metrics --pivot MFLOP/s=data/mflops --pivot bandwidth=data/bandwidth
+    hpc normalize data/likwid_merged --output-dir data --baseline blas
+    hpc plot data/mflops --output flops.pdf --title "FLOP/s" --ylabel MFLOP/s
+    hpc view data/metrics --columns variant,N,MFLOP/s --where variant=blas --limit 5
+
+Install it with `pip install .` from the repository root (see pyproject.toml), or run it as `python -m hpc_tools`.
+
+Only the standard library is imported at startup. Every subcommand imports what it needs (pandas, matplotlib,
+pyarrow) when it runs, so `hpc --help` and `hpc view` of a CSV table start in tens of milliseconds, and `hpc view`
+of a Feather table only loads pyarrow.
+"""
+import argparse
+import os
+import sys
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+def parse_source(text):
+    """
+    Parses a 'variant[@threads]=path' result file argument into (variant, path, threads).
+    """
+    spec, sep, path = text.partition('=')
+    variant, _, threads = spec.partition('@')
+    if not sep or not variant or not path:
+        raise argparse.ArgumentTypeError(f"expected variant[@threads]=path, got '{text}'")
+    try:
+        return variant, path, int(threads) if threads else 1
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer thread count, got '{threads}'")
+
+
+def parse_assignment(text):
+    """
+    Parses a 'name=value' argument.
+    """
+    name, sep, value = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected name=value, got '{text}'")
+    return name, value
+
+
+def parse_list(text):
+    return [item for item in text.split(',') if item]
+
+
+def run_parse(args):
+    from hpc_tools.likwid import RunCache, expand_inputs, parse_files, write_group_tables
+
+    cache_dir = args.cache_dir or os.path.join(args.output_dir, '.likwid-cache')
+    if args.clear_cache:
+        RunCache(cache_dir).clear()
+    files = expand_inputs(args.inputs)
+    if not files:
+        print("Error: No .out files to parse.", file=sys.stderr)
+        return 1
+    all_data = parse_files(files, jobs=args.jobs, cache=None if args.no_cache else RunCache(cache_dir))
+    paths = write_group_tables(all_data, args.output_dir, args.merged_output, export_csv=args.csv or None)
+    return 0 if paths else 1
+
+
+def run_aggregate(args):
+    from hpc_tools.metrics import RunSource, compute_metrics, load_runs, write_pivot
+    from hpc_tools.stats import summarize_trials
+    from hpc_tools.storage import write_table
+
+    sources = [RunSource(variant, path, threads=threads) for variant, path, threads in args.sources]
+    runs = load_runs(args.kernel, sources)
+    # Median over the repetitions of each configuration, without warm-up trials
+    metrics = compute_metrics(runs if args.no_summary else summarize_trials(runs), args.peak_bandwidth)
+    print(f"Saved metrics to {write_table(metrics, args.output)}")
+
+    variants = args.variants or list(dict.fromkeys(source.variant for source in sources))
+    for metric, path in args.pivot:
+        if metric not in metrics.columns:
+            print(f"Error: Unknown metric '{metric}'.", file=sys.stderr)
+            return 1
+        write_pivot(metrics, metric, path, variants)
+        print(f"Saved {metric} of {', '.join(variants)} to {path}")
+    return 0
+
+
+def run_normalize(args):
+    from hpc_tools.counters import write_normalized_tables
+    from hpc_tools.storage import read_table
+
+    write_normalized_tables(read_table(args.input), args.output_dir, args.baseline, args.baseline_threads, args.kernel)
+    return 0
+
+
+def run_plot(args):
+    from hpc_tools.figures import FigureSpec, render_figure
+
+    prefixes = args.legend_prefix or [""]
+    if len(prefixes) == 1:
+        prefixes = prefixes * len(args.tables)
+    elif len(prefixes) != len(args.tables):
+        print("Error: Give one --legend-prefix, or one per table.", file=sys.stderr)
+        return 1
+    spec = FigureSpec(args.title, args.tables, args.output, args.xlabel, args.ylabel, ymodifier=args.ymodifier,
+                      logscale=args.logscale, legend_prefix=prefixes, ylims=args.ylims)
+    print(f"Saved plot to {render_figure(spec)}")
+    return 0
+
+
+def format_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def run_view(args):
+    from hpc_tools.storage import preview_table
+
+    # Filtered rows can be anywhere in the table, only an unfiltered view stops reading after --limit rows
+    columns = args.columns
+    if columns and args.where:
+        columns = list(dict.fromkeys(columns + [name for name, _ in args.where]))
+    try:
+        names, rows = preview_table(args.table, columns, None if args.where else args.limit)
+    except (FileNotFoundError, KeyError) as e:
+        print(f"Error: {e.args[0]}", file=sys.stderr)
+        return 1
+
+    cells = [[format_cell(value) for value in row] for row in rows]
+    for name, value in args.where:
+        if name not in names:
+            print(f"Error: No column '{name}' in '{args.table}'.", file=sys.stderr)
+            return 1
+        position = names.index(name)
+        cells = [row for row in cells if row[position] == value]
+    cells = cells[:args.limit]
+    if args.columns:
+        positions = [names.index(name) for name in args.columns]
+        names, cells = args.columns, [[row[i] for i in positions] for row in cells]
+
+    if args.csv:
+        print(','.join(names))
+        for row in cells:
+            print(','.join(row))
+        return 0
+    widths = [max([len(name)] + [len(row[i]) for row in cells]) for i, name in enumerate(names)]
+    print('  '.join(name.rjust(width) for name, width in zip(names, widths)))
+    for row in cells:
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+    return 0
+
+
+def build_parser():
+    arg_parser = argparse.ArgumentParser(prog='hpc', description="Analysis tools of the benchmark harnesses.")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+
+    parse = subparsers.add_parser('parse', help="Parse likwid-perfctr output into one table per performance group")
+    parse.add_argument('inputs', nargs='*', default=['data/raw'],
+                       help="Raw .out files, directories or glob patterns (default: data/raw)")
+    parse.add_argument('--output-dir', default='data', help="The directory of the group tables (default: %(default)s)")
+    parse.add_argument('--merged-output', help="The merged wide table (default: <output-dir>/likwid_merged)")
+    parse.add_argument('--csv', action='store_true', help="Also export every table as CSV")
+    parse.add_argument('-j', '--jobs', type=int, help="Number of worker processes (default: one per core)")
+    parse.add_argument('--cache-dir', help="The parsed run cache (default: <output-dir>/.likwid-cache)")
+    parse.add_argument('--no-cache', action='store_true', help="Parse every run without reading or updating the cache")
+    parse.add_argument('--clear-cache', action='store_true', help="Remove all cached runs before parsing")
+    parse.set_defaults(func=run_parse)
+
+    aggregate = subparsers.add_parser('aggregate', help="Compute the metrics of benchmark result files")
+    aggregate.add_argument('kernel', help="The kernel of the result files (sum, dgemm or dgemv)")
+    aggregate.add_argument('sources', nargs='+', type=parse_source,
+                           help="Result files as variant=path or variant@threads=path")
+    aggregate.add_argument('--output', default='data/metrics', help="The metrics table (default: %(default)s)")
+    aggregate.add_argument('--pivot', action='append', type=parse_assignment, default=[],
+                           help="Also write a metric as a wide table per N, e.g. MFLOP/s=data/mflops (repeatable)")
+    aggregate.add_argument('--variants', type=parse_list, help="The variants of the pivots (default: all, in order)")
+    aggregate.add_argument('--peak-bandwidth', type=float,
+                           help="The peak bandwidth in bytes/s (default: the machine profile, see hpc_tools.machine)")
+    aggregate.add_argument('--no-summary', action='store_true',
+                           help="Compute metrics of every trial instead of the median of each configuration")
+    aggregate.set_defaults(func=run_aggregate)
+
+    normalize = subparsers.add_parser('normalize', help="Normalize LIKWID counters against a baseline variant")
+    normalize.add_argument('input', nargs='?', default='data/likwid_merged',
+                           help="The merged LIKWID table (default: %(default)s)")
+    normalize.add_argument('--output-dir', default='data', help="The directory of the tables (default: %(default)s)")
+    normalize.add_argument('--baseline', default='blas', help="The baseline benchmark (default: %(default)s)")
+    normalize.add_argument('--baseline-threads', type=int,
+                           help="Normalize against the baseline at this thread count "
+                                "(default: the same count, else 1)")
+    normalize.add_argument('--kernel', default='dgemm',
+                           help="The kernel the ratios are computed per flop of (default: %(default)s)")
+    normalize.set_defaults(func=run_normalize)
+
+    plot = subparsers.add_parser('plot', help="Plot wide tables (x in the first column, one series per column)")
+    plot.add_argument('tables', nargs='+', help="The tables, series of different tables use different line styles")
+    plot.add_argument('-o', '--output', required=True, help="The plot file, e.g. flops.pdf")
+    plot.add_argument('--title', default="", help="The title of the plot")
+    plot.add_argument('--xlabel', default="Problem Size (n)", help="The label of the x-axis (default: %(default)s)")
+    plot.add_argument('--ylabel', default="", help="The label of the y-axis")
+    plot.add_argument('--ymodifier', type=float, default=1.0, help="Multiply the y-values by this factor")
+    plot.add_argument('--logscale', default="", help="'x', 'y' or 'xy' for logarithmic axes")
+    plot.add_argument('--ylims', type=float, nargs=2, metavar=('LOW', 'HIGH'), help="The limits of the y-axis")
+    plot.add_argument('--legend-prefix', action='append',
+                      help="A prefix of the legend entries, once or once per table (repeatable)")
+    plot.set_defaults(func=run_plot)
+
+    view = subparsers.add_parser('view', help="Print the rows of a table")
+    view.add_argument('table', help="The table, with or without extension")
+    view.add_argument('--columns', type=parse_list, help="Only print these columns, comma-separated")
+    view.add_argument('--where', action='append', type=parse_assignment, default=[],
+                      help="Only print rows where a column has this value, e.g. variant=blas (repeatable)")
+    view.add_argument('-n', '--limit', type=int, help="Print at most this many rows")
+    view.add_argument('--csv', action='store_true', help="Print CSV instead of aligned columns")
+    view.set_defaults(func=run_view)
+    return arg_parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
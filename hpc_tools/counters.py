@@ -0,0 +1,154 @@
+"""
+Normalized hardware counter tables of the dgemm variants, from the merged LIKWID table (see hpc_tools.likwid).
+
+The counters are pivoted once over (Benchmark, Number of blocks, Number of threads), so every variant, block size
+and thread count in the data becomes a column without code changes. Every counter is then divided by the baseline
+variant at the same problem size in one vectorized step. The baseline is 'blas' at the same thread count by
+default (its single-threaded run where it has no run at that count, as job.in only runs blas with one thread), or
+at a fixed thread count.
+
+Besides one normalized table per counter, derived ratios (L2 miss rate, misses and instructions per flop) are
+written as a long-form table, with flops counted analytically as in hpc_tools.metrics.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from hpc_tools.likwid import (BENCHMARK, INSTRUCTION_COUNT, L2_ACCESSES, L2_MISSES, L3_ACCESS_ALL, NUM_BLOCKS,
+                              NUM_THREADS, PROBLEM_SIZE)
+from hpc_tools.metrics import KERNELS
+from hpc_tools.storage import write_table
+
+CONFIG = [BENCHMARK, NUM_BLOCKS, NUM_THREADS]
+
+# Unblocked variants have no block size, they are pivoted with this one
+NO_BLOCKS = 0
+
+# --- Derived ratios ---
+FLOPS = 'Flops'
+L2_MISS_RATE = 'L2 miss rate'
+L2_MISSES_PER_FLOP = 'L2 misses per flop'
+L3_ACCESSES_PER_FLOP = 'L3 accesses per flop'
+INSTRUCTIONS_PER_FLOP = 'Instructions per flop'
+RATIOS = [L2_MISS_RATE, L2_MISSES_PER_FLOP, L3_ACCESSES_PER_FLOP, INSTRUCTIONS_PER_FLOP]
+
+# Output table name -> counter normalized against the baseline
+NORMALIZED_COUNTERS = {
+    'l2_cache': L2_ACCESSES,
+    'l2_misses': L2_MISSES,
+    'l3_cache': L3_ACCESS_ALL,
+    'instruction_count': INSTRUCTION_COUNT,
+}
+RATIOS_TABLE = 'derived_ratios'
+
+VARIANT_LABELS = {'blas': 'CBLAS', 'basic-omp': 'basic', 'blocked-omp': 'blocked'}
+
+
+def derive_ratios(df, kernel='dgemm'):
+    """
+    Adds the flop count and the derived ratios of every run as columns.
+    """
+    df = df.copy()
+    df[FLOPS] = KERNELS[kernel].flops(df[PROBLEM_SIZE].astype(float))
+    df[L2_MISS_RATE] = df[L2_MISSES] / df[L2_ACCESSES].replace(0, np.nan)
+    df[L2_MISSES_PER_FLOP] = df[L2_MISSES] / df[FLOPS]
+    df[L3_ACCESSES_PER_FLOP] = df[L3_ACCESS_ALL] / df[FLOPS]
+    df[INSTRUCTIONS_PER_FLOP] = df[INSTRUCTION_COUNT] / df[FLOPS]
+    return df
+
+
+def pivot_counters(df, counters):
+    """
+    Pivots the counters into one wide table: N as index, (counter, benchmark, blocks, threads) as columns.
+    Repeated runs of a configuration are averaged.
+    """
+    df = df.assign(**{NUM_BLOCKS: df[NUM_BLOCKS].fillna(NO_BLOCKS).astype(int)})
+    values = df[counters].apply(pd.to_numeric, errors='coerce').astype(float)
+    return pd.concat([df[[PROBLEM_SIZE] + CONFIG], values], axis=1).pivot_table(
+        index=PROBLEM_SIZE, columns=CONFIG, values=counters)
+
+
+def normalize(wide, baseline='blas', baseline_threads=None):
+    """
+    Divides every column of a pivot_counters() table by the same counter of the baseline variant, in one step.
+
+    Args:
+        wide (pd.DataFrame): The pivoted counters.
+        baseline (str, optional): The baseline benchmark. Defaults to 'blas'.
+        baseline_threads (int, optional): Normalize against the baseline at this thread count. Defaults to None,
+                                          the same thread count as the column, or 1 where the baseline has no
+                                          run at that count.
+
+    Raises:
+        ValueError: If the baseline is not in the table.
+    """
+    if baseline not in wide.columns.get_level_values(BENCHMARK):
+        raise ValueError(f"The baseline '{baseline}' is not in the table")
+    base = wide.xs((baseline, NO_BLOCKS), level=[BENCHMARK, NUM_BLOCKS], axis=1)  # (counter, threads)
+    counters = wide.columns.get_level_values(0)
+    if baseline_threads is None:
+        threads = wide.columns.get_level_values(NUM_THREADS)
+        threads = np.where([key in base.columns for key in zip(counters, threads)], threads, 1)
+    else:
+        threads = np.full(len(wide.columns), baseline_threads)
+    keys = pd.MultiIndex.from_arrays([counters, threads])
+    denominators = base.reindex(columns=keys).to_numpy()
+    return wide / denominators
+
+
+def column_label(benchmark, blocks, threads):
+    label = VARIANT_LABELS.get(benchmark, benchmark)
+    if blocks != NO_BLOCKS:
+        label += f" B{blocks}"
+    return f"{label} t={threads}"
+
+
+def counter_table(wide, counter):
+    """
+    Selects one counter of a pivoted table, with one labeled column per configuration.
+    """
+    table = wide[counter]
+    table.columns = [column_label(*config) for config in table.columns]
+    return table
+
+
+def write_normalized_tables(merged, output_dir='data', baseline='blas', baseline_threads=None, kernel='dgemm'):
+    """
+    Writes '<name>_normalized' for every counter of NORMALIZED_COUNTERS and the derived ratios to `output_dir`,
+    printing every table (and its LaTeX version) on the way.
+
+    Args:
+        merged (pd.DataFrame): The merged LIKWID table.
+        output_dir (str, optional): The directory of the tables. Defaults to 'data'.
+        baseline (str, optional): The baseline benchmark. Defaults to 'blas'.
+        baseline_threads (int, optional): Normalize against the baseline at this thread count. Defaults to None,
+                                          the same thread count as the column, or 1 where the baseline has no
+                                          run at that count.
+        kernel (str, optional): The kernel whose flop count the ratios are taken per. Defaults to 'dgemm'.
+
+    Returns:
+        list[str]: The paths written.
+    """
+    df = derive_ratios(merged, kernel)
+    normalized = normalize(pivot_counters(df, list(NORMALIZED_COUNTERS.values())), baseline, baseline_threads)
+
+    paths = []
+    baseline_label = VARIANT_LABELS.get(baseline, baseline)
+    for name, counter in NORMALIZED_COUNTERS.items():
+        result_df = counter_table(normalized, counter)
+        output_path = write_table(result_df, os.path.join(output_dir, f'{name}_normalized'), index=True)
+        paths.append(output_path)
+
+        latex_string = result_df.to_latex(float_format="%.2f")
+        print(f"--- {name.upper()} {counter} (Normalized by {baseline_label}) ---")
+        print(result_df)
+        print(f"--- Latex Output: ---\n{latex_string}")
+        print(f"\nTable successfully saved to '{output_path}'")
+
+    ratios_df = df[[BENCHMARK, PROBLEM_SIZE, NUM_THREADS, NUM_BLOCKS] + RATIOS]
+    output_path = write_table(ratios_df, os.path.join(output_dir, RATIOS_TABLE))
+    paths.append(output_path)
+    print(f"--- Derived ratios ---\n{ratios_df.to_string(index=False)}")
+    print(f"\nTable successfully saved to '{output_path}'")
+    return paths
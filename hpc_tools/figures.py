@@ -0,0 +1,202 @@
+"""
+Batch rendering of the line plots of the plot_data.py scripts.
+
+A figure is declared as a FigureSpec (title, data tables, axis labels, scales, legend prefixes), the same options
+the former plot() functions took. render_all() renders a list of specs concurrently in worker processes on the
+headless Agg backend, with one shared style, and skips figures whose output is newer than all of their input
+tables.
+
+Data tables are wide tables as written by hpc_tools.metrics.write_pivot(): the first column is the x-axis
+(usually N), every other column is one series. If a table has '<table>_low' and '<table>_high' companions, the
+confidence interval of every series is shaded.
+
+matplotlib is imported on first use (see pyplot()), so that harness scripts and pipelines that only declare figures
+start without it.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from hpc_tools.storage import read_table, table_files
+
+# --- Shared style of all figures ---
+STYLE = {
+    'figure.dpi': 100,
+    'savefig.dpi': 300,
+    'savefig.format': 'pdf',
+    'axes.grid': True,
+    'grid.alpha': 0.5,
+    'legend.loc': 'best',
+}
+MARKERS = ['o', 'x', '^', 's', 'D', '*', 'P', 'H']
+LINESTYLES = ['-', '--', ':', '-.']
+BAND_ALPHA = 0.2
+
+
+def pyplot():
+    """
+    Returns matplotlib.pyplot on the headless Agg backend, importing it on first use.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+class FigureSpec:
+    """
+    The declaration of one line plot.
+
+    Args:
+        title (str): The title of the plot.
+        sources (str | list[str]): The data table(s). Series of different tables use different line styles.
+        output_name (str): The filename for the saved plot (e.g., 'flops.pdf').
+        xlabel (str): The label for the x-axis.
+        ylabel (str): The label for the y-axis.
+        ymodifier (float, optional): A factor to multiply the y-values by. Defaults to 1.0.
+        logscale (str, optional): A string containing 'x' or 'y' (or both) to set the corresponding axes to a log
+                                  scale. Defaults to "".
+        log_base_x (float, optional): The base for the logarithmic x-axis. Defaults to 10.
+        log_base_y (float, optional): The base for the logarithmic y-axis. Defaults to 10.
+        legend_prefix (str | list[str], optional): A prefix for the legend entries of the series of each table.
+                                                   Defaults to "".
+        ylims (tuple, optional): The lower and upper limits of the y-axis. Defaults to None.
+        xtick_format (str, optional): The format of an x tick label, '{}' is the x value divided by
+                                      `xtick_divisor`. Defaults to "${}$".
+        xtick_divisor (int, optional): Divides the x values for the tick labels. Defaults to 1.
+    """
+    def __init__(self, title, sources, output_name, xlabel, ylabel, ymodifier=1.0, logscale="", log_base_x=10.0,
+                 log_base_y=10.0, legend_prefix="", ylims=None, xtick_format="${}$", xtick_divisor=1):
+        self.title = title
+        self.sources = [sources] if isinstance(sources, str) else list(sources)
+        self.output_name = output_name
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.ymodifier = ymodifier
+        self.logscale = logscale
+        self.log_base_x = log_base_x
+        self.log_base_y = log_base_y
+        prefixes = legend_prefix if isinstance(legend_prefix, list) else [legend_prefix] * len(self.sources)
+        assert len(prefixes) == len(self.sources), "Length of sources must be equal to legend prefixes!"
+        self.legend_prefix = prefixes
+        if ylims is not None:
+            assert len(ylims) == 2, "ylims must be a tuple with 2 elements"
+        self.ylims = ylims
+        self.xtick_format = xtick_format
+        self.xtick_divisor = xtick_divisor
+
+    def tables(self):
+        """
+        Returns the tables the figure may be rendered from, including the confidence interval tables.
+        """
+        return [source + band for source in self.sources for band in ('', '_low', '_high')]
+
+    def inputs(self):
+        """
+        Returns the existing files the figure is rendered from.
+        """
+        return [path for table in self.tables() for path in table_files(table)]
+
+
+def needs_update(outputs, inputs):
+    """
+    Returns whether any output is missing or older than the newest input.
+    """
+    if not all(os.path.exists(output) for output in outputs):
+        return True
+    newest_input = max((os.path.getmtime(path) for path in inputs), default=0)
+    return min(os.path.getmtime(output) for output in outputs) < newest_input
+
+
+def render_figure(spec: FigureSpec) -> str:
+    """
+    Renders one figure with the shared style.
+
+    Returns:
+        str: The path of the saved plot.
+    """
+    plt = pyplot()
+    with plt.rc_context(STYLE):
+        fig, ax = plt.subplots()
+        ax.set_title(spec.title)
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+
+        xlocs = None
+        for source_idx, (source, prefix) in enumerate(zip(spec.sources, spec.legend_prefix)):
+            df = read_table(source)
+            x_name, series = df.columns[0], list(df.columns[1:])
+            if xlocs is None:
+                # Problem sizes are evenly spaced categories, labeled with their value
+                xlocs = list(range(len(df)))
+                ax.set_xticks(xlocs, [spec.xtick_format.format(x // spec.xtick_divisor) for x in df[x_name]])
+
+            bands = table_files(source + '_low') and table_files(source + '_high')
+            if bands:
+                low, high = read_table(source + '_low'), read_table(source + '_high')
+            for series_idx, name in enumerate(series):
+                color = colors[series_idx % len(colors)]
+                ax.plot(xlocs, df[name] * spec.ymodifier, color=color, marker=MARKERS[series_idx % len(MARKERS)],
+                        linestyle=LINESTYLES[source_idx % len(LINESTYLES)], label=f"{prefix}{name}")
+                if bands:
+                    ax.fill_between(xlocs, low[name] * spec.ymodifier, high[name] * spec.ymodifier, color=color,
+                                    alpha=BAND_ALPHA)
+
+        ylabel = spec.ylabel
+        if 'y' in spec.logscale:
+            ax.set_yscale("log", base=spec.log_base_y)
+            ylabel += " (logarithmic)"
+        if 'x' in spec.logscale:
+            ax.set_xscale("log", base=spec.log_base_x)
+        if spec.ylims is not None:
+            ax.set_ylim(spec.ylims)
+
+        ax.set_xlabel(spec.xlabel)
+        ax.set_ylabel(ylabel)
+        ax.legend()
+        fig.savefig(spec.output_name)
+        plt.close(fig)
+    return spec.output_name
+
+
+def render_all(specs: list[FigureSpec], jobs: int | None = None, force: bool = False) -> list[str]:
+    """
+    Renders the figures whose output is missing or older than their inputs, in parallel worker processes.
+
+    Args:
+        specs (list[FigureSpec]): The figures to render.
+        jobs (int, optional): The number of worker processes. Defaults to the number of CPUs.
+        force (bool, optional): Whether to render up-to-date figures too. Defaults to False.
+
+    Returns:
+        list[str]: The paths of the rendered plots.
+    """
+    stale = [spec for spec in specs if force or needs_update([spec.output_name], spec.inputs())]
+    for spec in specs:
+        if spec not in stale:
+            print(f"Up to date: {spec.output_name}")
+    if len(stale) <= 1 or jobs == 1:
+        rendered = [render_figure(spec) for spec in stale]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            rendered = list(pool.map(render_figure, stale))
+    for output_name in rendered:
+        print(f"Saved plot to {output_name}")
+    return rendered
+
+
+def main(specs: list[FigureSpec], argv=None):
+    """
+    The command line of the plot_data.py scripts: renders `specs` (or the ones named on the command line), with
+    -j/--jobs and --force.
+    """
+    arg_parser = argparse.ArgumentParser(description="Renders the figures of this harness.")
+    arg_parser.add_argument('outputs', nargs='*', help="Only render these figures (e.g. flops.pdf)")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None, help="Number of worker processes (default: all CPUs)")
+    arg_parser.add_argument('--force', action='store_true', help="Also render figures that are up to date")
+    args = arg_parser.parse_args(argv)
+    unknown = set(args.outputs) - {spec.output_name for spec in specs}
+    if unknown:
+        arg_parser.error(f"unknown figure(s): {', '.join(sorted(unknown))}")
+    if args.outputs:
+        specs = [spec for spec in specs if spec.output_name in args.outputs]
+    render_all(specs, jobs=args.jobs, force=args.force)
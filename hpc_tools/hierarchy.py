@@ -0,0 +1,272 @@
+"""
+Memory hierarchy profile from a working-set sweep of the sum harness.
+
+The sum binaries sweep log-spaced working sets from a few KB to several GB with `-m min_bytes -M max_bytes`
+(see sum_harness_instructional/run_sweep.sh). The median runtime per element of every size is one point on a curve
+that steps up whenever the working set outgrows a cache level: the latency of the indirect sum, or the inverse
+bandwidth of the vector sum. The curve is segmented into plateaus automatically:
+
+    1. isotonic regression of log(ns per element) over the working set, since a larger working set is never
+       faster, which removes noise without smoothing the steps away,
+    2. adjacent steps of the fit are merged, closest first, until neighbors differ by at least `min_step`,
+    3. segments spanning at least `min_width` doublings of the working set are levels, the others transitions.
+
+Levels are named L1, L2, ... from the smallest working set, the largest one is DRAM, so the sweep has to reach
+well beyond the last-level cache. The capacity of a cache level is the largest working set still on its plateau.
+Other limits step the curve as well, e.g. the reach of the TLB, so the levels are a profile of what the loop sees
+rather than a list of caches; a variant with a single level shows no memory effect at all.
+The direct sum does not access memory; its median cost per element is the in-core limit of the loop, and a level
+whose 'in-core fraction' is close to 1 is limited by the additions, not by the memory.
+
+The indirect sum stores the next index as a float, which holds integers exactly only up to 2^24. Larger indirect
+working sets follow short cycles that stay in cache, so they are excluded (see MAX_EXACT_N).
+
+Usage, from sum_harness_instructional:
+
+    python -m hpc_tools.hierarchy --output data/hierarchy --plot hierarchy.pdf
+    python -m hpc_tools.hierarchy vector=data/sweep_vector indirect=data/sweep_indirect --min-step 1.5
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import KERNELS, N, NS_PER_ELEMENT, RUNTIME, VARIANT, RunSource, load_runs
+from hpc_tools.stats import summarize_trials
+from hpc_tools.storage import write_table
+
+VARIANTS = ['direct', 'vector', 'indirect']
+# The variants that access memory, and the in-core reference
+MEMORY_VARIANTS = ['vector', 'indirect']
+IN_CORE_VARIANT = 'direct'
+# The largest N whose indices the indirect sum walks exactly (float mantissa)
+MAX_EXACT_N = {'indirect': 1 << 24}
+
+# --- Columns of the curves and levels tables ---
+WORKING_SET = 'working set'  # bytes
+GBPS = 'GB/s'
+FIT = 'fit ns per element'
+LEVEL = 'level'
+FIRST_SIZE = 'from bytes'
+CAPACITY = 'capacity'  # bytes, the largest working set on the plateau
+POINTS = 'points'
+IN_CORE_FRACTION = 'in-core fraction'
+
+DRAM = 'DRAM'
+DEFAULT_MIN_STEP = 1.3
+DEFAULT_MIN_WIDTH = 1.0
+
+
+def load_sweep(sources: list[RunSource]) -> pd.DataFrame:
+    """
+    Reads the sweep output of the sum binaries and reduces every working set to its median runtime.
+
+    Returns:
+        pd.DataFrame: One row per variant and N with the runtime, working set, ns per element and GB/s columns,
+                      without the sizes above MAX_EXACT_N of a variant.
+    """
+    runs = summarize_trials(load_runs('sum', sources))
+    runs = runs[runs[N] <= runs[VARIANT].map(MAX_EXACT_N).fillna(np.inf)]
+    n = runs[N].astype(float)
+    curves = runs[[VARIANT, N, RUNTIME]].copy()
+    curves[WORKING_SET] = KERNELS['sum'].bytes_moved(n)
+    curves[NS_PER_ELEMENT] = runs[RUNTIME] / n * 1e9
+    curves[GBPS] = curves[WORKING_SET] / runs[RUNTIME] / 1e9
+    return curves.sort_values([VARIANT, N], ignore_index=True)
+
+
+def isotonic(y: np.ndarray) -> np.ndarray:
+    """
+    Returns the non-decreasing least-squares fit of `y` (pool adjacent violators).
+    """
+    values, counts = [], []
+    for value in y:
+        values.append(float(value))
+        counts.append(1)
+        while len(values) > 1 and values[-2] > values[-1]:
+            count = counts[-2] + counts[-1]
+            values[-2] = (values[-2] * counts[-2] + values[-1] * counts[-1]) / count
+            counts[-2] = count
+            values.pop()
+            counts.pop()
+    return np.repeat(values, counts)
+
+
+def segment(log_y: np.ndarray, min_step: float = DEFAULT_MIN_STEP) -> list[tuple[int, int]]:
+    """
+    Splits a curve of log values, ordered by working set, into plateaus.
+
+    Args:
+        log_y (np.ndarray): The natural logarithm of the cost per element.
+        min_step (float, optional): The smallest ratio between adjacent plateaus. Defaults to 1.3.
+
+    Returns:
+        list[tuple[int, int]]: The [start, stop) index ranges of the segments.
+    """
+    fit = isotonic(log_y)
+    bounds = [0] + [i for i in range(1, len(fit)) if fit[i] != fit[i - 1]] + [len(fit)]
+    segments = [[start, stop, fit[start:stop].mean()] for start, stop in zip(bounds, bounds[1:])]
+    # Merge the closest neighbors first, so a gradual ramp joins the plateau it leads to
+    while len(segments) > 1:
+        steps = np.diff([mean for _, _, mean in segments])
+        i = int(np.argmin(steps))
+        if steps[i] >= np.log(min_step):
+            break
+        (start, middle, left), (_, stop, right) = segments[i], segments[i + 1]
+        segments[i:i + 2] = [[start, stop, (left * (middle - start) + right * (stop - middle)) / (stop - start)]]
+    return [(start, stop) for start, stop, _ in segments]
+
+
+def find_levels(curve: pd.DataFrame, min_step: float = DEFAULT_MIN_STEP, min_width: float = DEFAULT_MIN_WIDTH):
+    """
+    Detects the memory levels of one variant's curve (see the module docstring).
+
+    Args:
+        curve (pd.DataFrame): The rows of one variant of load_sweep(), ordered by N.
+        min_step (float, optional): The smallest ratio between the cost of adjacent levels. Defaults to 1.3.
+        min_width (float, optional): The smallest number of working-set doublings a level spans. Defaults to 1.0.
+
+    Returns:
+        tuple[pd.DataFrame, pd.Series]: One row per level (level, points, from bytes, capacity, ns per element,
+                                        GB/s), and the level of every point of the curve, None in transitions.
+    """
+    log_y = np.log(curve[NS_PER_ELEMENT].to_numpy(dtype=float))
+    sizes = curve[WORKING_SET].to_numpy(dtype=float)
+    plateaus = [(start, stop) for start, stop in segment(log_y, min_step)
+                if np.log2(sizes[stop - 1] / sizes[start]) >= min_width]
+
+    names = [f"L{i + 1}" for i in range(len(plateaus) - 1)] + [DRAM]
+    point_levels = pd.Series(None, index=curve.index, dtype=object)
+    rows = []
+    for name, (start, stop) in zip(names, plateaus):
+        ns = np.median(curve[NS_PER_ELEMENT].iloc[start:stop])
+        rows.append({LEVEL: name, POINTS: stop - start, FIRST_SIZE: sizes[start],
+                     CAPACITY: sizes[stop - 1] if name != DRAM else np.nan,
+                     NS_PER_ELEMENT: ns, GBPS: KERNELS['sum'].bytes_moved(1) / ns})
+        point_levels.iloc[start:stop] = name
+    return pd.DataFrame(rows, columns=[LEVEL, POINTS, FIRST_SIZE, CAPACITY, NS_PER_ELEMENT, GBPS]), point_levels
+
+
+def profile(curves: pd.DataFrame, variants: list[str] = MEMORY_VARIANTS, min_step: float = DEFAULT_MIN_STEP,
+            min_width: float = DEFAULT_MIN_WIDTH) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Detects the levels of every variant in `variants`.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The levels table, and `curves` with the isotonic fit and the level of
+                                           every point.
+    """
+    curves = curves.copy()
+    curves[FIT] = np.nan
+    curves[LEVEL] = None
+    in_core = curves.loc[curves[VARIANT] == IN_CORE_VARIANT, NS_PER_ELEMENT].median()
+    tables = []
+    for variant in variants:
+        curve = curves[curves[VARIANT] == variant]
+        if curve.empty:
+            continue
+        levels, point_levels = find_levels(curve, min_step, min_width)
+        curves.loc[curve.index, FIT] = np.exp(isotonic(np.log(curve[NS_PER_ELEMENT].to_numpy(dtype=float))))
+        curves.loc[curve.index, LEVEL] = point_levels
+        levels.insert(0, VARIANT, variant)
+        levels[IN_CORE_FRACTION] = in_core / levels[NS_PER_ELEMENT]
+        tables.append(levels)
+    columns = [VARIANT, LEVEL, POINTS, FIRST_SIZE, CAPACITY, NS_PER_ELEMENT, GBPS, IN_CORE_FRACTION]
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=columns), curves
+
+
+def format_bytes(size):
+    if not np.isfinite(size):
+        return "-"
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024 or unit == 'GiB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def plot_profile(curves: pd.DataFrame, levels: pd.DataFrame, output_name: str, title: str = ""):
+    """
+    Plots ns per element and GB/s over the working set, with the isotonic fit and the detected levels shaded.
+    """
+    from hpc_tools.figures import MARKERS, STYLE, pyplot
+
+    plt = pyplot()
+
+    with plt.rc_context(STYLE):
+        fig, axes = plt.subplots(1, 2, figsize=(14, 5))
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        for idx, (variant, curve) in enumerate(curves.groupby(VARIANT, sort=False)):
+            color, marker = colors[idx % len(colors)], MARKERS[idx % len(MARKERS)]
+            for ax, value in zip(axes, [NS_PER_ELEMENT, GBPS]):
+                ax.plot(curve[WORKING_SET], curve[value], color=color, marker=marker, markersize=3, linestyle='',
+                        label=variant)
+            if curve[FIT].notna().any():
+                axes[0].plot(curve[WORKING_SET], curve[FIT], color=color, linewidth=1)
+                axes[1].plot(curve[WORKING_SET], KERNELS['sum'].bytes_moved(1) / curve[FIT], color=color,
+                             linewidth=1)
+            for _, level in levels[levels[VARIANT] == variant].iterrows():
+                last = curve.loc[curve[LEVEL] == level[LEVEL], WORKING_SET].max()
+                for ax, value in zip(axes, [NS_PER_ELEMENT, GBPS]):
+                    ax.hlines(level[value], level[FIRST_SIZE], last, color=color, linestyle='--', linewidth=2)
+                axes[0].annotate(level[LEVEL], (level[FIRST_SIZE], level[NS_PER_ELEMENT]), color=color,
+                                 textcoords='offset points', xytext=(0, 6))
+                if np.isfinite(level[CAPACITY]):
+                    axes[0].axvline(level[CAPACITY], color=color, linestyle=':', alpha=0.5)
+
+        for ax, ylabel in zip(axes, ["Runtime per element [ns]", "Bandwidth [GB/s]"]):
+            ax.set_xscale("log", base=2)
+            ax.set_yscale("log")
+            ax.set_xlabel("Working set [bytes]")
+            ax.set_ylabel(ylabel + " (logarithmic)")
+            ax.legend()
+        if title:
+            fig.suptitle(title)
+        fig.tight_layout()
+        fig.savefig(output_name)
+        plt.close(fig)
+    return output_name
+
+
+def parse_source(text):
+    variant, _, path = text.partition('=')
+    return RunSource(variant, path or f"data/sweep_{variant}")
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Detects cache and memory levels in a working-set sweep of the "
+                                                     "sum harness.")
+    arg_parser.add_argument('sources', nargs='*', type=parse_source,
+                            default=[parse_source(variant) for variant in VARIANTS],
+                            help="variant=table pairs, or variants read from data/sweep_<variant> "
+                                 "(default: direct vector indirect)")
+    arg_parser.add_argument('--min-step', type=float, default=DEFAULT_MIN_STEP,
+                            help="The smallest cost ratio between adjacent levels (default: %(default)s)")
+    arg_parser.add_argument('--min-width', type=float, default=DEFAULT_MIN_WIDTH,
+                            help="The fewest working-set doublings a level spans (default: %(default)s)")
+    arg_parser.add_argument('--output', default='data/hierarchy',
+                            help="The levels table, the curves are written to <output>_curves (default: %(default)s)")
+    arg_parser.add_argument('--plot', help="Also plot the curves and levels to this file")
+    arg_parser.add_argument('--title', default="", help="The title of the plot")
+    args = arg_parser.parse_args(argv)
+
+    curves = load_sweep(args.sources)
+    variants = [source.variant for source in args.sources if source.variant != IN_CORE_VARIANT]
+    levels, curves = profile(curves, variants, args.min_step, args.min_width)
+    write_table(levels, args.output)
+    write_table(curves, args.output + '_curves')
+
+    printed = levels.assign(**{FIRST_SIZE: levels[FIRST_SIZE].map(format_bytes),
+                               CAPACITY: levels[CAPACITY].map(format_bytes)})
+    with pd.option_context('display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print(printed.to_string(index=False))
+    if args.plot:
+        print(f"Saved plot to {plot_profile(curves, levels, args.plot, args.title)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,435 @@
+"""
+Indexed SQLite history of benchmark runs across all harnesses and builds.
+
+The result files of the harnesses (data/basic.csv, data/openmp-64.csv, the tables of likwid-parser.py, ...) are
+overwritten by every run of a job. Importing them into the history keeps every run, keyed by
+(kernel, variant, N, threads, B, timestamp, git revision, host):
+
+    runs     one row per trial: the key columns, the trial number, the runtime and the file it came from
+    metrics  any further numeric columns of a run (e.g. the LIKWID counters), as (run, name, value)
+    imports  one row per imported file, so importing the same file of the same build again is a no-op
+
+The runs are indexed by configuration and timestamp, so a question like "dgemm blocked-omp at N=2048 over the last
+30 builds" is a range scan of the index. A build is one (timestamp, revision, host) combination; the timestamp of
+an import defaults to the modification time of the result file, the revision to `git describe` of the repository.
+
+query_runs() returns the long-form run table of hpc_tools.metrics (kernel, variant, N, threads, B, runtime, trial)
+plus the build columns and, on request, the metrics as columns, so the aggregators and plotters can read the
+history like any other run table.
+
+Usage (the database defaults to $HPC_HISTORY, or history.sqlite in the repository root):
+
+    python -m hpc_tools.history import-results dgemm basic=data/basic blocked=data/blocked blas=data/blas
+    python -m hpc_tools.history import-results dgemv openmp-16@16=data/openmp-16 --timestamp 2025-10-01T12:00:00
+    python -m hpc_tools.history import-likwid data/raw            # raw likwid-perfctr output, or
+    python -m hpc_tools.history import-likwid data/likwid_merged  # the tables of likwid-parser.py
+    python -m hpc_tools.history query --kernel dgemm --variant blocked-omp -N 2048 --last 30 --metrics
+    python -m hpc_tools.history builds
+"""
+import argparse
+import hashlib
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import BLOCK_SIZE, KERNEL, N, RUNTIME, THREADS, TRIAL, VARIANT, RunSource, load_runs
+from hpc_tools.regression import parse_source
+from hpc_tools.storage import read_table, table_files, write_table
+
+HISTORY_ENV = 'HPC_HISTORY'
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'history.sqlite')
+
+# --- Build columns of a run ---
+TIMESTAMP = 'timestamp'
+REVISION = 'revision'
+HOST = 'host'
+SOURCE = 'source'
+
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+# --- LIKWID tables (see hpc_tools.likwid) ---
+LIKWID_KEYS = {
+    'Benchmark': VARIANT,
+    'Problem Size': N,
+    'Number of threads': THREADS,
+    'Number of blocks': BLOCK_SIZE,
+}
+LIKWID_RUNTIMES = ['Runtime (RDTSC)', 'Runtime (chrono)']
+
+# Columns of the runs table, in the order of the long-form run table
+RUN_COLUMNS = {KERNEL: 'kernel', VARIANT: 'variant', N: 'n', THREADS: 'threads', BLOCK_SIZE: 'b',
+               RUNTIME: 'runtime', TRIAL: 'trial', TIMESTAMP: 'timestamp', REVISION: 'revision', HOST: 'host',
+               SOURCE: 'source'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    kernel TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    n INTEGER NOT NULL,
+    threads INTEGER NOT NULL,
+    b INTEGER,
+    runtime REAL,
+    trial INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    revision TEXT,
+    host TEXT NOT NULL,
+    source TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_by_config ON runs (kernel, variant, n, threads, b, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_size ON runs (kernel, variant, n, timestamp);
+CREATE INDEX IF NOT EXISTS runs_by_build ON runs (timestamp, revision, host);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS imports (
+    digest TEXT PRIMARY KEY,
+    source TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    revision TEXT,
+    host TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+
+def history_path():
+    return os.environ.get(HISTORY_ENV, DEFAULT_HISTORY)
+
+
+def connect(path=None):
+    """
+    Opens (and if needed creates) a history database.
+
+    The database uses write-ahead logging, so queries (e.g. from job epilogues) do not block on a running import.
+    """
+    path = path or history_path()
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def git_revision(path='.'):
+    """
+    Returns `git describe --always --dirty` of the repository containing `path`, or None outside of a repository.
+    """
+    directory = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+    try:
+        result = subprocess.run(['git', '-C', directory, 'describe', '--always', '--dirty'], capture_output=True,
+                                text=True)
+    except OSError:
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def file_timestamp(path):
+    """
+    Returns the modification time of a file, i.e. when the benchmark wrote it, in TIMESTAMP_FORMAT.
+    """
+    return time.strftime(TIMESTAMP_FORMAT, time.localtime(os.path.getmtime(path)))
+
+
+def file_digest(path, revision, host):
+    """
+    Returns the identity of an import: the content of the file and the build it is attributed to.
+    """
+    digest = hashlib.sha1(f"{revision}\0{host}\0".encode())
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _column_values(series):
+    """
+    Converts a column into Python values for sqlite3, with None for missing values.
+    """
+    values = series.astype(object).where(series.notna(), None)
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+
+def insert_runs(conn, runs: pd.DataFrame, timestamp: str, revision: str | None, host: str,
+                source: str | None = None, metrics: list[str] | None = None) -> int:
+    """
+    Inserts a long-form run table (see hpc_tools.metrics.load_runs()) in one transaction.
+
+    Args:
+        conn (sqlite3.Connection): The history, see connect().
+        runs (pd.DataFrame): The runs, with the columns kernel, variant, N, threads, B, runtime and trial.
+        timestamp (str): The time of the build, in TIMESTAMP_FORMAT.
+        revision (str | None): The git revision of the build.
+        host (str): The host the runs ran on.
+        source (str, optional): The file the runs were read from. Defaults to None.
+        metrics (list[str], optional): Further numeric columns to store in the metrics table. Defaults to None.
+
+    Returns:
+        int: The number of inserted runs.
+    """
+    if runs.empty:
+        return 0
+    runs = runs.assign(**{TIMESTAMP: timestamp, REVISION: revision, HOST: host, SOURCE: source})
+    if TRIAL not in runs.columns:
+        runs[TRIAL] = runs.groupby([KERNEL, VARIANT, N, THREADS, BLOCK_SIZE], dropna=False, sort=False).cumcount()
+    columns = list(RUN_COLUMNS)
+
+    with conn:
+        # sqlite3 only begins the transaction at the first INSERT. Take the write lock before reading MAX(id), so
+        # concurrent imports (e.g. from job epilogues) wait for each other instead of picking the same ids.
+        conn.execute('BEGIN IMMEDIATE')
+        first_id = conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM runs').fetchone()[0]
+        ids = list(range(first_id, first_id + len(runs)))
+        rows = zip(ids, *(_column_values(runs[column]) for column in columns))
+        conn.executemany(f"INSERT INTO runs (id, {', '.join(RUN_COLUMNS.values())}) "
+                         f"VALUES ({', '.join('?' * (len(columns) + 1))})", rows)
+        for name in metrics or []:
+            values = pd.to_numeric(runs[name], errors='coerce')
+            conn.executemany('INSERT INTO metrics (run_id, name, value) VALUES (?, ?, ?)',
+                             ((run_id, name, value) for run_id, value in zip(ids, _column_values(values))
+                              if value is not None))
+    return len(runs)
+
+
+def _import_file(conn, path, runs_of, timestamp=None, revision=None, host=None, force=False):
+    """
+    Imports the runs of one file unless the same file of the same build was imported before.
+
+    Args:
+        runs_of (callable): Returns the run table and the names of its metric columns for the path.
+
+    Returns:
+        int: The number of inserted runs.
+    """
+    revision = revision if revision is not None else git_revision(path)
+    host = host or platform.node()
+    timestamp = timestamp or file_timestamp(path)
+    digest = file_digest(path, revision, host)
+    if not force and conn.execute('SELECT 1 FROM imports WHERE digest = ?', (digest,)).fetchone():
+        print(f"Already imported: {path}")
+        return 0
+
+    runs, metrics = runs_of(path)
+    count = insert_runs(conn, runs, timestamp, revision, host, source=path, metrics=metrics)
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO imports VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (digest, path, timestamp, revision, host, count, time.strftime(TIMESTAMP_FORMAT)))
+    print(f"Imported {count} run(s) of {path} ({revision or 'no revision'}, {host}, {timestamp})")
+    return count
+
+
+def import_results(conn, kernel: str, sources: list[RunSource], **build) -> int:
+    """
+    Imports the result files of the benchmark binaries (read with hpc_tools.metrics.load_runs()).
+
+    Args:
+        conn (sqlite3.Connection): The history, see connect().
+        kernel (str): The kernel of the result files (e.g. 'dgemm').
+        sources (list[RunSource]): The result files and the variant and thread count of each.
+        **build: timestamp, revision and host of the build, each defaulting to the file (see _import_file()),
+                 and force=True to import files again.
+
+    Returns:
+        int: The number of inserted runs.
+    """
+    count = 0
+    for source in sources:
+        path = table_files(source.path)[-1] if table_files(source.path) else source.path
+        count += _import_file(conn, path, lambda _: (load_runs(kernel, [source]), []), **build)
+    return count
+
+
+def likwid_runs(table: pd.DataFrame, kernel: str = 'dgemm') -> tuple[pd.DataFrame, list[str]]:
+    """
+    Converts a group or merged table of hpc_tools.likwid into a run table, with every counter as a metric column.
+
+    The runtime is the RDTSC runtime where the table has one (FLOPS_DP), the chrono runtime otherwise.
+
+    Returns:
+        tuple: The run table and the names of the metric columns.
+    """
+    runs = table.rename(columns=LIKWID_KEYS).assign(**{KERNEL: kernel})
+    runtimes = [column for prefix in LIKWID_RUNTIMES for column in runs.columns if column.startswith(prefix)]
+    runs[RUNTIME] = runs[runtimes[0]] if runtimes else np.nan
+    metrics = [column for column in table.columns
+               if column not in LIKWID_KEYS and pd.api.types.is_numeric_dtype(table[column])]
+    return runs, metrics
+
+
+def import_likwid(conn, inputs: list[str], kernel: str = 'dgemm', **build) -> int:
+    """
+    Imports LIKWID results: raw likwid-perfctr output (.out files or directories of them), parsed with
+    hpc_tools.likwid, or the tables written by likwid-parser.py.
+
+    Returns:
+        int: The number of inserted runs.
+    """
+    from hpc_tools.likwid import GROUPS_BY_NAME, build_group_table, expand_inputs, parse_file
+
+    def raw_runs(path):
+        group_name, rows = parse_file(path)
+        if not rows:
+            return pd.DataFrame(), []
+        return likwid_runs(build_group_table(GROUPS_BY_NAME[group_name], rows), kernel)
+
+    count = 0
+    for path in inputs:
+        if os.path.isdir(path) or path.endswith('.out'):
+            for raw_path in expand_inputs([path]):
+                count += _import_file(conn, raw_path, raw_runs, **build)
+        else:
+            table_path = table_files(path)[0]
+            count += _import_file(conn, table_path, lambda p: likwid_runs(read_table(p), kernel), **build)
+    return count
+
+
+def query_runs(conn, kernel: str | None = None, variant: str | None = None, n: int | None = None,
+               threads: int | None = None, block_size: int | None = None, host: str | None = None,
+               revision: str | None = None, since: str | None = None, until: str | None = None,
+               last_builds: int | None = None, metrics: bool | list[str] = False) -> pd.DataFrame:
+    """
+    Selects runs from the history. Every argument that is given restricts the result.
+
+    Args:
+        conn (sqlite3.Connection): The history, see connect().
+        since, until (str, optional): Only runs with a timestamp in [since, until] (TIMESTAMP_FORMAT, or a prefix
+                                      such as '2025-10').
+        last_builds (int, optional): Only runs of the latest builds (distinct timestamps) among the selected runs.
+        metrics (bool | list[str], optional): Add all metrics (True) or the named ones as columns. Defaults to False.
+
+    Returns:
+        pd.DataFrame: The long-form run table (kernel, variant, N, threads, B, runtime, trial) with timestamp,
+                      revision, host and source, ordered by timestamp.
+    """
+    conditions, params = [], []
+    for column, value in (('kernel', kernel), ('variant', variant), ('n', n), ('threads', threads),
+                          ('b', block_size), ('host', host), ('revision', revision)):
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        conditions.append("timestamp >= ?")
+        params.append(since)
+    if until is not None:
+        # A prefix such as '2025-10' includes the whole month
+        conditions.append("timestamp <= ?")
+        params.append(until + '\uffff')
+    where = ' AND '.join(conditions) or '1'
+
+    if last_builds is not None:
+        # The oldest of the latest builds is a lower bound on the timestamp, another range scan of the same index
+        where = (f"{where} AND timestamp >= (SELECT MIN(timestamp) FROM (SELECT DISTINCT timestamp FROM runs "
+                 f"WHERE {where} ORDER BY timestamp DESC LIMIT ?))")
+        params = params + params + [last_builds]
+    columns = ', '.join(f"{column} AS \"{name}\"" for name, column in RUN_COLUMNS.items())
+    runs = pd.read_sql_query(f"SELECT id, {columns} FROM runs WHERE {where} ORDER BY timestamp, id", conn,
+                             params=params, index_col='id')
+    # Unblocked variants have no B, as in load_runs()
+    runs[BLOCK_SIZE] = pd.to_numeric(runs[BLOCK_SIZE]).astype(float)
+
+    if metrics and not runs.empty:
+        names = [] if metrics is True else list(metrics)
+        name_filter = f" AND name IN ({', '.join('?' * len(names))})" if names else ''
+        # The ids of the selected runs are passed through a temporary table, not as thousands of parameters
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS selected (id INTEGER PRIMARY KEY)')
+        with conn:
+            conn.execute('DELETE FROM selected')
+            conn.executemany('INSERT INTO selected VALUES (?)', ((int(run_id),) for run_id in runs.index))
+        values = pd.read_sql_query(f"SELECT run_id, name, value FROM metrics JOIN selected ON run_id = selected.id "
+                                   f"WHERE 1{name_filter}", conn, params=names)
+        wide = values.pivot(index='run_id', columns='name', values='value')
+        runs = runs.join(wide[[name for name in names if name in wide.columns] or list(wide.columns)])
+    return runs.reset_index(drop=True)
+
+
+def list_builds(conn, kernel: str | None = None) -> pd.DataFrame:
+    """
+    Returns one row per build (timestamp, revision, host) with its number of runs, newest first.
+    """
+    where, params = ("WHERE kernel = ?", [kernel]) if kernel else ("", [])
+    return pd.read_sql_query(f"SELECT timestamp, revision, host, COUNT(*) AS runs, "
+                             f"GROUP_CONCAT(DISTINCT variant) AS variants FROM runs {where} "
+                             f"GROUP BY timestamp, revision, host ORDER BY timestamp DESC", conn, params=params)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Imports and queries the run history database.")
+    arg_parser.add_argument('--db', default=None,
+                            help=f"The history database (default: ${HISTORY_ENV} or {DEFAULT_HISTORY})")
+    subparsers = arg_parser.add_subparsers(dest='action', required=True)
+
+    build = argparse.ArgumentParser(add_help=False)
+    build.add_argument('--timestamp', help="The time of the build (default: the modification time of each file)")
+    build.add_argument('--revision', help="The git revision of the build (default: git describe of the file's repository)")
+    build.add_argument('--host', help="The host the runs ran on (default: this host)")
+    build.add_argument('--force', action='store_true', help="Import files that were imported before again")
+
+    results = subparsers.add_parser('import-results', parents=[build], help="Import result files of the binaries")
+    results.add_argument('kernel', help="The kernel of the result files (sum, dgemm or dgemv)")
+    results.add_argument('sources', nargs='+', type=parse_source,
+                         help="Result files as variant=path or variant@threads=path")
+
+    likwid = subparsers.add_parser('import-likwid', parents=[build], help="Import LIKWID output or tables")
+    likwid.add_argument('inputs', nargs='+', help=".out files, directories of them, or tables of likwid-parser.py")
+    likwid.add_argument('--kernel', default='dgemm', help="The kernel of the runs (default: %(default)s)")
+
+    query = subparsers.add_parser('query', help="Print or export runs")
+    query.add_argument('--kernel')
+    query.add_argument('--variant')
+    query.add_argument('-N', type=int, dest='n')
+    query.add_argument('--threads', type=int)
+    query.add_argument('-B', type=int, dest='block_size')
+    query.add_argument('--host')
+    query.add_argument('--revision')
+    query.add_argument('--since', help="Only runs at or after this timestamp (e.g. 2025-10-01)")
+    query.add_argument('--until', help="Only runs at or before this timestamp (e.g. 2025-10)")
+    query.add_argument('--last', type=int, dest='last_builds', help="Only runs of the latest LAST builds")
+    query.add_argument('--metrics', nargs='*', help="Add all metrics, or the named ones, as columns")
+    query.add_argument('--output', help="Write the runs to this table instead of printing them")
+
+    builds = subparsers.add_parser('builds', help="List the builds in the history")
+    builds.add_argument('--kernel')
+    args = arg_parser.parse_args(argv)
+
+    conn = connect(args.db)
+    if args.action in ('import-results', 'import-likwid'):
+        build_args = dict(timestamp=args.timestamp, revision=args.revision, host=args.host, force=args.force)
+        if args.action == 'import-results':
+            count = import_results(conn, args.kernel, args.sources, **build_args)
+        else:
+            count = import_likwid(conn, args.inputs, args.kernel, **build_args)
+        print(f"Imported {count} run(s) into {args.db or history_path()}")
+    elif args.action == 'query':
+        metrics = False if args.metrics is None else (args.metrics or True)
+        runs = query_runs(conn, args.kernel, args.variant, args.n, args.threads, args.block_size, args.host,
+                          args.revision, args.since, args.until, args.last_builds, metrics)
+        if args.output:
+            print(f"Saved {len(runs)} run(s) to {write_table(runs, args.output)}")
+        else:
+            with pd.option_context('display.max_rows', None, 'display.width', 200):
+                print(runs.drop(columns=[SOURCE]).to_string(index=False))
+    else:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(list_builds(conn, args.kernel).to_string(index=False))
+    conn.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Streaming comparison of raw 8-bit images, e.g. the outputs of the CPU, offload, CUDA and NumPy Sobel variants.
+
+The images are memory-mapped (see hpc_tools.rawimage) and compared band by band, so multi-gigabyte outputs are never
+loaded as a whole. For every image against the reference, compare() accumulates the maximum absolute difference,
+the number of pixels differing by more than a tolerance, the PSNR and the maximum absolute difference of every
+tile x tile tile (the error heatmap).
+
+Usage:
+    python -m hpc_tools.imagediff data/processed-raw-int8-4x-cpu.dat data/processed-raw-int8-4x-gpu.dat \
+        [more outputs ...] [--tolerance 1] [--heatmap diff.pdf]
+
+The first image is the reference. The exit status is 1 if any image has mismatches.
+"""
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from hpc_tools.rawimage import open_raw
+
+DEFAULT_TILE = 256
+DEFAULT_BAND_ROWS = 4096
+PIXEL_MAX = 255
+
+
+class Comparison:
+    """
+    The differences of one image to the reference.
+
+    Attributes:
+        max_abs_diff (int): The largest absolute difference of a pixel.
+        mismatches (int): The number of pixels differing by more than the tolerance.
+        pixels (int): The number of pixels compared.
+        squared_error (int): The sum of squared differences.
+        heatmap (np.ndarray): The largest absolute difference in every tile, shape (tile rows, tile columns).
+    """
+    def __init__(self, shape, tile):
+        self.max_abs_diff = 0
+        self.mismatches = 0
+        self.pixels = 0
+        self.squared_error = 0
+        self.heatmap = np.zeros((math.ceil(shape[0] / tile), math.ceil(shape[1] / tile)), dtype=np.uint8)
+
+    @property
+    def mse(self):
+        return self.squared_error / self.pixels if self.pixels else 0.0
+
+    @property
+    def psnr(self):
+        """
+        The peak signal-to-noise ratio in dB, inf for identical images.
+        """
+        return math.inf if self.squared_error == 0 else 10 * math.log10(PIXEL_MAX ** 2 / self.mse)
+
+
+def tile_max(diff, tile):
+    """
+    Returns the maximum of every tile x tile tile of `diff`, padding the last row and column of tiles.
+    """
+    rows, cols = diff.shape
+    tiles_y, tiles_x = math.ceil(rows / tile), math.ceil(cols / tile)
+    padded = np.zeros((tiles_y * tile, tiles_x * tile), dtype=diff.dtype)
+    padded[:rows, :cols] = diff
+    return padded.reshape(tiles_y, tile, tiles_x, tile).max(axis=(1, 3))
+
+
+def compare(reference, others, tolerance=0, tile=DEFAULT_TILE, band_rows=DEFAULT_BAND_ROWS):
+    """
+    Compares images to a reference, band by band.
+
+    Args:
+        reference (np.ndarray): The reference image, shape (rows, cols), uint8 (may be an np.memmap).
+        others (list[np.ndarray]): The images to compare, each of the reference's shape.
+        tolerance (int, optional): The absolute difference still counted as a match. Defaults to 0.
+        tile (int, optional): The side of the heatmap tiles in pixels. Defaults to DEFAULT_TILE.
+        band_rows (int, optional): The rows read per band, rounded to whole tiles. Defaults to DEFAULT_BAND_ROWS.
+
+    Returns:
+        list[Comparison]: One comparison per image of `others`.
+
+    Raises:
+        ValueError: If an image does not have the reference's shape.
+    """
+    for other in others:
+        if other.shape != reference.shape:
+            raise ValueError(f"Shape {other.shape} does not match the reference's {reference.shape}")
+    results = [Comparison(reference.shape, tile) for _ in others]
+    band_rows = max(band_rows // tile, 1) * tile
+
+    for y0 in range(0, reference.shape[0], band_rows):
+        ref_band = np.asarray(reference[y0:y0 + band_rows], dtype=np.int16)
+        for other, result in zip(others, results):
+            diff = np.abs(np.asarray(other[y0:y0 + band_rows], dtype=np.int16) - ref_band).astype(np.uint8)
+            result.max_abs_diff = max(result.max_abs_diff, int(diff.max(initial=0)))
+            result.mismatches += int(np.count_nonzero(diff > tolerance))
+            result.pixels += diff.size
+            result.squared_error += int(np.square(diff, dtype=np.int64).sum())
+            result.heatmap[y0 // tile:y0 // tile + math.ceil(len(diff) / tile)] = tile_max(diff, tile)
+    return results
+
+
+def save_heatmaps(names, results, output_name, tile):
+    """
+    Saves the error heatmaps of all compared images side by side.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, axes = plt.subplots(1, len(results), squeeze=False, figsize=(6 * len(results), 5))
+    for ax, name, result in zip(axes[0], names, results):
+        im = ax.imshow(result.heatmap, cmap="inferno", vmin=0, vmax=max(result.max_abs_diff, 1),
+                       interpolation="nearest")
+        ax.set_title(f"{name}\nmax |diff| per {tile} x {tile} tile")
+        ax.set_xlabel("tile column")
+        ax.set_ylabel("tile row")
+        fig.colorbar(im, ax=ax)
+    fig.tight_layout()
+    fig.savefig(output_name)
+    plt.close(fig)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compares raw 8-bit images to a reference, chunk by chunk.")
+    arg_parser.add_argument('reference', help="The reference raw image")
+    arg_parser.add_argument('images', nargs='+', help="The raw images to compare")
+    arg_parser.add_argument('--size', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'),
+                            help="The image dimensions (default: the .dims sidecars)")
+    arg_parser.add_argument('--tolerance', type=int, default=0,
+                            help="Largest absolute difference counted as a match (default: %(default)s)")
+    arg_parser.add_argument('--tile', type=int, default=DEFAULT_TILE, help="Heatmap tile side (default: %(default)s)")
+    arg_parser.add_argument('--band-rows', type=int, default=DEFAULT_BAND_ROWS,
+                            help="Rows read per chunk (default: %(default)s)")
+    arg_parser.add_argument('--heatmap', help="Save the per-tile error heatmaps to this file")
+    args = arg_parser.parse_args(argv)
+
+    width, height = args.size if args.size else (None, None)
+    reference = open_raw(args.reference, width, height)
+    others = [open_raw(path, width, height) for path in args.images]
+    results = compare(reference, others, tolerance=args.tolerance, tile=args.tile, band_rows=args.band_rows)
+
+    print(f"Reference: {args.reference} ({reference.shape[1]} x {reference.shape[0]})")
+    for path, result in zip(args.images, results):
+        print(f"{path}: max |diff| = {result.max_abs_diff}, mismatches = {result.mismatches} "
+              f"({result.mismatches / result.pixels:.4%}), PSNR = {result.psnr:.2f} dB")
+    if args.heatmap:
+        save_heatmaps([os.path.basename(path) for path in args.images], results, args.heatmap, args.tile)
+        print(f"Saved heatmap to {args.heatmap}")
+    return 1 if any(result.mismatches for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,609 @@
+"""
+Tokenizer, metric extraction and table output of likwid-perfctr output, shared by likwid-parser.py, `hpc parse`
+(hpc_tools.cli) and the live runner (hpc_tools.likwid_live).
+
+The tokenizer is incremental: RunParser takes the output of one likwid-perfctr run a line at a time, so a run can
+be parsed while it is still printing. extract_run() turns a tokenized run into one row of a MetricGroup table.
+parse_files() parses captured .out files in worker processes, with a persistent cache of parsed runs (RunCache),
+and write_group_tables() writes one table per metric group and the merged wide table.
+"""
+import functools
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from hpc_tools.storage import write_table
+
+
+# --- Constants for DataFrame column names ---
+BENCHMARK = 'Benchmark'
+PROBLEM_SIZE = 'Problem Size'
+NUM_THREADS = 'Number of threads'
+NUM_BLOCKS = 'Number of blocks'
+RUNTIME_CHRONO = 'Runtime (chrono)'
+RUNTIME_RDTSC = 'Runtime (RDTSC)'
+INSTRUCTION_COUNT = 'Instruction Count'
+CPI = 'CPI'
+DP_MFLOPS = 'DP MFLOP/s'
+MAX_CLOCK = 'Max Clock'
+MIN_CLOCK = 'Min Clock'
+CPU_CLOCKS_UNHALTED = 'CPU_CLOCKS_UNHALTED'
+L3_ACCESS_ALL = 'L3_ACCESS_ALL_TYPES'
+L3_MISSES = 'L3 Misses'
+L2_ACCESSES = 'L2 accesses'
+L2_MISSES = 'L2 misses'
+RUN_COMMAND = 'Run Command'
+
+
+class MetricGroup:
+    """
+    A class to hold the configuration for a group of metrics.
+
+    Args:
+        name (str): The name of the metric group (e.g., 'FLOPS_DP').
+        files_keyword (str): A unique string to identify files belonging to this group.
+        output_file (str): The path of the output table, without extension (see hpc_tools.storage).
+        columns (dict): A mapping of desired DataFrame column names to the metric names in the LIKWID output.
+        stat_types (dict, optional): Specifies which statistic (Sum, Min, Max, Avg) to use for multi-threaded runs. Defaults to {}.
+        value_types (dict, optional): Specifies the desired data type (e.g., int, float) for each column. Defaults to {}.
+        """
+    def __init__(self, name, files_keyword, output_file, columns, stat_types={}, value_types={}):
+        self.name = name
+        self.files_keyword = files_keyword
+        self.output_file = output_file
+        self.columns = columns
+        self.stat_types = stat_types
+        self.value_types = value_types
+
+
+# -- Desired Ouput Metrics --
+METRIC_GROUPS = [
+    MetricGroup(
+        name='FLOPS_DP',
+        files_keyword='flops_dp',
+        output_file='data/flops_dp_data',
+        columns={
+            RUNTIME_RDTSC: 'Runtime (RDTSC) [s]',
+            INSTRUCTION_COUNT: 'RETIRED_INSTRUCTIONS',
+            CPI: 'CPI',
+            DP_MFLOPS: 'DP [MFLOP/s]'
+        },
+        stat_types={RUNTIME_RDTSC: 'Max', CPI: 'Avg'},
+        value_types={INSTRUCTION_COUNT: int}
+    ),
+    MetricGroup(
+        name='L2CACHE',
+        files_keyword='l2cache',
+        output_file='data/l2_cache_data',
+        columns={
+            L2_ACCESSES: 'L2 accesses',
+            L2_MISSES: 'L2 misses'
+        },
+        value_types={L2_ACCESSES: int, L2_MISSES: int}
+    ),
+    MetricGroup(
+        name='L3CACHE',
+        files_keyword='l3cache',
+        output_file='data/l3_cache_data',
+        columns={
+            L3_ACCESS_ALL: 'L3_ACCESS_ALL_TYPES'
+        },
+        value_types={L3_ACCESS_ALL: int}
+    )
+]
+
+
+GROUPS_BY_NAME = {group.name: group for group in METRIC_GROUPS}
+MERGE_KEYS = [BENCHMARK, PROBLEM_SIZE, NUM_THREADS, NUM_BLOCKS]
+# The position of a run among the runs of its configuration in a group table (reruns), only used while merging
+RUN_INDEX = 'Run index'
+MERGED_TABLE = 'likwid_merged'
+
+
+# -- LIKWID output tokenizer --
+# Group 1 (\S+): Core selection (e.g., 'N:0-3' from the job scripts, or '0,1,2,3' from hpc_tools.sweep).
+# Group 2 ([\w-]+): Benchmark name (e.g., 'basic-omp'), the binary may be given with any path.
+# Group 3 (\d+): Problem size '-N'.
+# Group 4 (\d+): Optional block size '-B'.
+COMMAND_LINE_RE = re.compile(r'^\s*-m -g \w+ -C (\S+)\s+\S*benchmark-([\w-]+)\s+-N\s+(\d+)(?:\s+-B\s+(\d+))?')
+# Group 1 (\w+): Performance group, from the command line ('-g FLOPS_DP') or a region header ('Group 1: FLOPS_DP').
+GROUP_RE = re.compile(r'(?:-g\s+|Group \d+:\s*)(\w+)')
+# Group 1 (\d+\.\d+): The floating-point value for the elapsed time.
+CHRONO_RE = re.compile(r'Elapsed time is : (\d+\.\d+)')
+
+# Table kinds, keyed by the first header cell and whether the table holds STAT rows
+EVENT = 'Event'
+EVENT_STAT = 'Event STAT'
+METRIC = 'Metric'
+METRIC_STAT = 'Metric STAT'
+STATS = ('Sum', 'Min', 'Max', 'Avg')
+
+
+class LikwidRun:
+    """
+    The tokenized content of a single `likwid-perfctr` invocation.
+
+    Every LIKWID table is reduced to a dictionary from row name (without the trailing 'STAT') to its values,
+    so looking up a metric does not require scanning the run text again.
+
+    Attributes:
+        command (str): The first line of the run, i.e. the arguments passed to likwid-perfctr.
+        chrono (float | None): The runtime reported by the benchmark itself ('Elapsed time is : ...').
+        tables (dict): Maps EVENT and METRIC to {row name: [per-thread values]} and EVENT_STAT and METRIC_STAT
+                       to {row name: {'Sum': ..., 'Min': ..., 'Max': ..., 'Avg': ...}}.
+    """
+    def __init__(self, command):
+        self.command = command
+        self.chrono = None
+        self.tables = {EVENT: {}, EVENT_STAT: {}, METRIC: {}, METRIC_STAT: {}}
+
+    def get_metric(self, metric_name, stat_type='Sum', value_type=float):
+        """
+        Looks up a single metric. Multi-threaded runs report the requested statistic from the STAT tables,
+        single-threaded runs the only value in the 'Event' or 'Metric' table.
+        """
+        for kind in (EVENT_STAT, METRIC_STAT):
+            stats = self.tables[kind].get(metric_name)
+            if stats is not None and stats.get(stat_type) is not None:
+                return _convert(stats[stat_type], value_type)
+
+        for kind in (EVENT, METRIC):
+            values = self.tables[kind].get(metric_name)
+            if values:
+                return _convert(values[0], value_type)
+        return None
+
+
+def _convert(cell, value_type):
+    try:
+        return value_type(float(cell))
+    except ValueError:
+        return None
+
+
+class _TableTokenizer:
+    """
+    Incrementally tokenizes the ASCII tables of a LIKWID run, one line at a time.
+
+    A table is delimited by '+---+' separator lines: the first '|' row after the opening separator is
+    the header, all following '|' rows up to the next separator are data rows.
+    """
+    def __init__(self, run):
+        self.run = run
+        self.kind = None
+        self.header = None
+        self.in_body = False
+
+    def feed(self, line):
+        if line.startswith('+'):
+            if self.in_body:
+                # Closing separator of the current table
+                self.kind = self.header = None
+                self.in_body = False
+            elif self.header is not None:
+                self.in_body = True
+            return
+        if not line.startswith('|'):
+            self.kind = self.header = None
+            self.in_body = False
+            return
+
+        cells = [cell.strip() for cell in line.strip().strip('|').split('|')]
+        if self.header is None:
+            self.header = cells
+            if cells[0] in (EVENT, METRIC):
+                self.kind = f"{cells[0]} STAT" if 'Sum' in cells else cells[0]
+            return
+        if self.kind is None:
+            return  # e.g. the 'Region Info' table
+
+        name = cells[0]
+        table = self.run.tables[self.kind]
+        if self.kind in (EVENT_STAT, METRIC_STAT):
+            name = name.removesuffix('STAT').rstrip()
+            if name not in table:
+                table[name] = {col: cell for col, cell in zip(self.header, cells) if col in STATS}
+        elif name not in table:
+            # Event tables have a 'Counter' column before the per-thread values
+            table[name] = cells[2:] if self.kind == EVENT else cells[1:]
+
+
+class RunParser:
+    """
+    Parses the output of one run line by line, as it is printed.
+
+    Args:
+        command (str): The arguments passed to likwid-perfctr (the first line of a run in a .out file).
+    """
+    def __init__(self, command):
+        self.run = LikwidRun(command)
+        self._tokenizer = _TableTokenizer(self.run)
+
+    def feed(self, line):
+        if self.run.chrono is None:
+            chrono_match = CHRONO_RE.search(line)
+            if chrono_match:
+                self.run.chrono = float(chrono_match.group(1))
+        self._tokenizer.feed(line.strip())
+
+
+# Every run of a .out file starts with its command line
+RUN_SEPARATOR = 'likwid-perfctr'
+
+
+def iter_run_blocks(file_path):
+    """
+    Streams a LIKWID output file and yields the raw text of one `likwid-perfctr` invocation at a time.
+
+    The file is read line by line, so memory usage is bounded by the size of a single run, not by the size
+    of the file. Text that precedes the first command is yielded as well, so callers can report it as
+    unparseable.
+
+    Args:
+        file_path (str): The path to the .out file.
+
+    Yields:
+        list: The text of a run split into lines. The first line is the command line without the leading
+              'likwid-perfctr'.
+    """
+    block = None
+    has_text = False
+    with open(file_path, 'r') as f:
+        for line in f:
+            # A run starts wherever 'likwid-perfctr' occurs, including mid-line
+            for i, part in enumerate(line.split(RUN_SEPARATOR)):
+                if i > 0 or block is None:
+                    if has_text:
+                        yield block
+                    block = []
+                    has_text = False
+                block.append(part)
+                has_text = has_text or bool(part.strip())
+    if has_text:
+        yield block
+
+
+def tokenize_run(block):
+    """
+    Tokenizes the raw text of a single run (see iter_run_blocks()) into a LikwidRun in one pass.
+    """
+    parser = RunParser(block[0].rstrip('\n'))
+    for part in block[1:]:
+        parser.feed(part)
+    return parser.run
+
+
+def count_cores(selection):
+    """
+    Counts the cores of a likwid-perfctr -C selection, e.g. 'N:0-3' or '0,2,4-7' (one thread per core).
+    """
+    count = 0
+    for part in selection.split(':')[-1].split(','):
+        lo, _, hi = part.partition('-')
+        count += int(hi or lo) - int(lo) + 1
+    return count
+
+
+def extract_run(run, file_path, group_config):
+    """
+    Converts a tokenized run into a single output row of the given metric group.
+
+    Returns:
+        dict | None: The row, or None if the command line of the run could not be parsed.
+    """
+    cmd_line_match = COMMAND_LINE_RE.match(run.command)
+    if not cmd_line_match:
+        print(f"Warning: Could not parse command line in {file_path}. Skipping.")
+        return None
+
+    command_line = f"likwid-perfctr {run.command.strip()}"
+    print(f"Processing data from run: {command_line}")
+    data = {
+        RUN_COMMAND: command_line,
+        NUM_THREADS: count_cores(cmd_line_match.group(1)),
+        BENCHMARK: cmd_line_match.group(2),
+        PROBLEM_SIZE: int(cmd_line_match.group(3)),
+        NUM_BLOCKS: int(cmd_line_match.group(4)) if cmd_line_match.group(4) else None,
+        RUNTIME_CHRONO: run.chrono,
+    }
+    for col_name, metric_in_file in group_config.columns.items():
+        stat = group_config.stat_types.get(col_name, 'Sum')
+        v_type = group_config.value_types.get(col_name, float)
+        data[col_name] = run.get_metric(metric_in_file, stat, v_type)
+    return data
+
+
+def build_group_table(group_config, rows):
+    """
+    Builds the output DataFrame of a metric group from the extracted rows.
+    """
+    df = pd.DataFrame(rows)
+
+    base_cols = [BENCHMARK, PROBLEM_SIZE, NUM_THREADS, NUM_BLOCKS, RUNTIME_CHRONO]
+    metric_cols = list(group_config.columns.keys())
+    output_cols = base_cols + metric_cols
+
+    df = df[output_cols]
+    # A group whose runs are all unblocked would otherwise get an object column that cannot be merged on
+    df[NUM_BLOCKS] = df[NUM_BLOCKS].astype(float)
+
+    int_cols = [k for k, v in group_config.value_types.items() if v == int]
+    for col in int_cols:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype('Int64')
+    return df
+
+
+def merge_group_tables(tables):
+    """
+    Joins the tables of all metric groups into one wide table on (Benchmark, Problem Size, Number of threads,
+    Number of blocks). Columns that appear in more than one group, such as the chrono runtime, are suffixed
+    with the group name. A configuration that was run more than once in a group (e.g. a rerun in the same raw
+    directory) is joined run by run in file order, so the n-th runs of the groups share a row instead of every
+    combination of them getting one.
+
+    Args:
+        tables (dict): A mapping of group names to their DataFrames.
+    """
+    seen = {}
+    for df in tables.values():
+        for col in df.columns:
+            seen[col] = seen.get(col, 0) + 1
+
+    merged = None
+    for name, df in tables.items():
+        df = df.rename(columns={col: f"{col} [{name}]" for col in df.columns
+                                if col not in MERGE_KEYS and seen[col] > 1})
+        df = df.assign(**{RUN_INDEX: df.groupby(MERGE_KEYS, dropna=False, sort=False).cumcount()})
+        merged = df if merged is None else merged.merge(df, on=MERGE_KEYS + [RUN_INDEX], how='outer')
+    return merged.sort_values(MERGE_KEYS + [RUN_INDEX], ignore_index=True).drop(columns=RUN_INDEX)
+
+
+# -- Parsing captured .out files --
+def run_digest(block):
+    """
+    Returns the content hash of a raw run block, as used to key the run cache.
+    """
+    return hashlib.sha1(''.join(block).encode()).hexdigest()
+
+
+def iter_likwid_runs(file_path):
+    """
+    Streams a LIKWID output file and yields one tokenized LikwidRun per `likwid-perfctr` invocation.
+
+    Args:
+        file_path (str): The path to the .out file.
+
+    Yields:
+        LikwidRun: The tokenized runs in file order.
+    """
+    for block in iter_run_blocks(file_path):
+        yield tokenize_run(block)
+
+
+class RunCache:
+    """
+    A persistent on-disk cache of parsed runs, keyed by the path of the raw file and the content hash of each
+    `likwid-perfctr` run block within it.
+
+    Every raw file gets its own JSON file in the cache directory, so worker processes never write to the same
+    file. A cache file is only used if it was built with the same MetricGroup configuration (and parser
+    version); otherwise it is discarded and the raw file is parsed again. After parsing, the cache file is
+    rewritten with exactly the runs found in the raw file, which evicts runs that were removed or changed.
+
+    Args:
+        cache_dir (str): The directory holding the cache files.
+    """
+    # Bump when the extraction logic changes, to invalidate all existing cache files.
+    VERSION = 2
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    @classmethod
+    def fingerprint(cls, group_config):
+        """
+        Returns a hash of everything in a MetricGroup that influences the extracted rows.
+        """
+        config = {
+            'version': cls.VERSION,
+            'name': group_config.name,
+            'columns': group_config.columns,
+            'stat_types': group_config.stat_types,
+            'value_types': {k: v.__name__ for k, v in group_config.value_types.items()},
+        }
+        return hashlib.sha1(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def load(self, file_path, group_config):
+        """
+        Returns the cached rows of a raw file as {run digest: row}, or an empty dict if there are none
+        or the cache was built with a different configuration.
+        """
+        try:
+            with open(self._path(file_path), 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+        if entry.get('fingerprint') != self.fingerprint(group_config):
+            print(f"Cache of '{file_path}' was built with a different {group_config.name} configuration. Invalidating.")
+            return {}
+        return entry['runs']
+
+    def store(self, file_path, group_config, runs):
+        """
+        Replaces the cached rows of a raw file. Rows are None for runs that could not be parsed.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        entry = {'source': file_path, 'fingerprint': self.fingerprint(group_config), 'runs': runs}
+        tmp_path = f"{self._path(file_path)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(file_path))
+
+    def clear(self):
+        """
+        Removes all cache files.
+        """
+        if os.path.isdir(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+            print(f"Cleared cache '{self.cache_dir}'")
+
+
+def parse_likwid_output(file_path, group_config, cache=None):
+    """
+    Parses a LIKWID output file to extract a specified set of performance metrics.
+
+    Args:
+        file_path (str): The path to the .out file.
+        group_config (MetricGroup): A MetricGroup object specifying which metrics to extract.
+        cache (RunCache, optional): If given, only runs that are not in the cache are tokenized,
+                                    and the cache is updated afterwards. Defaults to None.
+
+    Returns:
+        list: A list of dictionaries, each representing a test run.
+    """
+    cached_runs = cache.load(file_path, group_config) if cache is not None else {}
+    runs = {}
+    extracted_data = []
+    try:
+        for block in iter_run_blocks(file_path):
+            digest = run_digest(block)
+            if digest in cached_runs:
+                data = cached_runs[digest]
+            else:
+                data = extract_run(tokenize_run(block), file_path, group_config)
+            runs[digest] = data
+            if data:
+                extracted_data.append(data)
+    except FileNotFoundError:
+        print(f"Error: File not found at {file_path}")
+        return []
+
+    if cache is not None:
+        reused = sum(digest in cached_runs for digest in runs)
+        print(f"Reused {reused} cached run(s), parsed {len(runs) - reused} run(s) of '{file_path}'")
+        cache.store(file_path, group_config, runs)
+    return extracted_data
+
+
+def detect_group(file_path):
+    """
+    Detects the performance group of a LIKWID output file from the header of its first run.
+
+    Only reads the file up to the first line that names a group. If no group is named, the file name is
+    matched against the `files_keyword` of each MetricGroup instead.
+
+    Returns:
+        MetricGroup | None: The configuration of the detected group, or None if the group is unknown.
+    """
+    with open(file_path, 'r') as f:
+        for line in f:
+            group_match = GROUP_RE.search(line)
+            if group_match:
+                return GROUPS_BY_NAME.get(group_match.group(1).upper())
+    for group_config in METRIC_GROUPS:
+        if group_config.files_keyword in os.path.basename(file_path):
+            return group_config
+    return None
+
+
+def parse_file(file_path, cache=None):
+    """
+    Parses a single raw file with the metric group detected from its header. Runs in a worker process.
+
+    Returns:
+        tuple: The name of the detected group (or None) and the list of extracted rows.
+    """
+    group_config = detect_group(file_path)
+    if group_config is None:
+        print(f"Warning: Could not detect the performance group of '{file_path}'. Skipping.")
+        return None, []
+    print(f"--- Processing {file_path} as group: {group_config.name} ---")
+    return group_config.name, parse_likwid_output(file_path, group_config, cache)
+
+
+def expand_inputs(inputs):
+    """
+    Expands directories (all .out files within) and glob patterns into a sorted list of files.
+    """
+    files = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            files.extend(sorted(glob.glob(os.path.join(pattern, '*.out'))))
+        elif glob.has_magic(pattern):
+            files.extend(sorted(glob.glob(pattern)))
+        elif os.path.exists(pattern):
+            files.append(pattern)
+        else:
+            print(f"Warning: File '{pattern}' not found and will be skipped.")
+    return list(dict.fromkeys(files))
+
+
+def parse_files(files, jobs=None, cache=None):
+    """
+    Parses raw files in worker processes, each with the metric group detected from its header.
+
+    Args:
+        files (list[str]): The .out files, e.g. from expand_inputs().
+        jobs (int, optional): The number of worker processes. Defaults to the number of cores.
+        cache (RunCache, optional): The cache of parsed runs. Defaults to None.
+
+    Returns:
+        dict: Maps every group name of METRIC_GROUPS to its extracted rows, in input order.
+    """
+    all_data = {group_config.name: [] for group_config in METRIC_GROUPS}
+    jobs = jobs or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=max(1, min(jobs, len(files) or 1))) as executor:
+        # map() keeps the input order, so rows appear in the same order as with serial parsing
+        for group_name, rows in executor.map(functools.partial(parse_file, cache=cache), files):
+            if group_name is not None:
+                all_data[group_name].extend(rows)
+    return all_data
+
+
+def write_group_tables(all_data, output_dir=None, merged_output=None, export_csv=None):
+    """
+    Writes one table per metric group with extracted rows, and the merged table of all of them.
+
+    Args:
+        all_data (dict): Maps group names to their extracted rows.
+        output_dir (str, optional): The directory of the tables. Defaults to the `output_file` of each MetricGroup.
+        merged_output (str, optional): The path of the merged table. Defaults to 'likwid_merged' in the output
+                                       directory.
+        export_csv (bool, optional): Whether to also write CSV files (see hpc_tools.storage.write_table()).
+
+    Returns:
+        list[str]: The paths written.
+    """
+    paths, tables = [], {}
+    for group_config in METRIC_GROUPS:
+        if not all_data.get(group_config.name):
+            print(f"No data extracted for group {group_config.name}.")
+            continue
+
+        df = build_group_table(group_config, all_data[group_config.name])
+        output_path = group_config.output_file
+        if output_dir is not None:
+            output_path = os.path.join(output_dir, os.path.basename(output_path))
+        output_path = write_table(df, output_path, export_csv=export_csv)
+        tables[group_config.name] = df
+        paths.append(output_path)
+        print(f"Successfully created '{output_path}'\n")
+
+    if tables:
+        if merged_output is None:
+            merged_output = os.path.join(output_dir or os.path.dirname(METRIC_GROUPS[0].output_file), MERGED_TABLE)
+        merged_path = write_table(merge_group_tables(tables), merged_output, export_csv=export_csv)
+        paths.append(merged_path)
+        print(f"Successfully created '{merged_path}'\n")
+    return paths
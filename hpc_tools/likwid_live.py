@@ -0,0 +1,248 @@
+"""
+Runs likwid-perfctr sweeps as asyncio subprocesses and parses their output while it streams, without .out files.
+
+The job scripts redirect every likwid-perfctr run into data/raw/*.out, and likwid-parser.py reads those files
+after the job has finished. This runner starts the runs of a parameter grid (see hpc_tools.sweep) itself, up to
+--jobs at a time, each pinned to its own disjoint cores. The stdout of every run is fed line by line to the
+incremental LIKWID tokenizer (hpc_tools.likwid.RunParser) as it is printed. Once a run exits, its metric row is
+appended to a JSON Lines store in the format of hpc_tools.sweep, so results are visible while the job is running
+and an interrupted job resumes where it stopped. The raw output itself is not kept.
+
+Example, the FLOPS_DP and L2CACHE runs of job-blocked-omp (run from mmul-omp-harness-instructional/build):
+
+    python -m hpc_tools.likwid_live run --store ../data/likwid.jsonl --tables ../data \\
+        -p group=FLOPS_DP,L2CACHE -p N=128,512,2048 -p B=4,16 -p threads=1,4,16,64 -- \\
+        -m -g {group} -C {cores} ./benchmark-blocked-omp -N {N} -B {B}
+
+The command template holds the arguments of likwid-perfctr. --tables writes the same per-group and merged tables
+as likwid-parser.py from the store.
+
+Without LIKWID, the `replay` subcommand stands in for likwid-perfctr. It prints the matching run of
+previously captured .out files (same group, benchmark, N, B and thread count), optionally line by line with a
+delay:
+
+    python -m hpc_tools.likwid_live run --store /tmp/likwid.jsonl \\
+        --likwid "python -m hpc_tools.likwid_live replay --delay 0.01 ../data/raw" \\
+        -p N=128,512 -p B=4 -p threads=1,4 -- -m -g FLOPS_DP -C {cores} ./benchmark-blocked-omp -N {N} -B {B}
+
+tests/fake-likwid-perfctr synthesizes FLOPS_DP output instead, without captured files; tests/test_likwid_live.py
+runs sweeps through it.
+"""
+import argparse
+import asyncio
+import os
+import shlex
+import sys
+import time
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.likwid import (COMMAND_LINE_RE, GROUP_RE, GROUPS_BY_NAME, RUN_SEPARATOR, RunParser, count_cores,
+                              extract_run, iter_run_blocks, write_group_tables)
+from hpc_tools.sweep import (CORES, COMMAND, PARAMS, RETURNCODE, ROWS, STDERR, WALLTIME, CoreAllocator, Sweep,
+                             append_record, available_cores, load_store, open_store, parse_cores, parse_param,
+                             pending_configurations, start_pending)
+
+LIKWID = 'likwid-perfctr'
+
+# Additional field of a store record: the performance group of the run
+GROUP = 'group'
+
+
+def command_group(command):
+    """
+    Returns the MetricGroup named by the '-g' argument of a likwid-perfctr command line, or None.
+    """
+    group_match = GROUP_RE.search(command)
+    return GROUPS_BY_NAME.get(group_match.group(1).upper()) if group_match else None
+
+
+async def run_streaming(command, args, cores):
+    """
+    Runs one likwid-perfctr invocation pinned to `cores` and tokenizes its stdout as it arrives.
+
+    Args:
+        command (list[str]): The launcher, e.g. ['likwid-perfctr'].
+        args (list[str]): The formatted likwid-perfctr arguments.
+        cores (list[int]): The cores the process (and the benchmark it starts) is pinned to.
+
+    Returns:
+        tuple: The return code, the wall time in seconds, the tokenized LikwidRun and stderr.
+    """
+    def pin():
+        if hasattr(os, 'sched_setaffinity'):
+            os.sched_setaffinity(0, cores)
+
+    parser = RunParser(' ' + shlex.join(args))
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(*command, *args, stdout=asyncio.subprocess.PIPE,
+                                                   stderr=asyncio.subprocess.PIPE, preexec_fn=pin)
+
+    async def read_stdout():
+        async for line in process.stdout:
+            parser.feed(line.decode(errors='replace'))
+
+    # Drain both pipes concurrently, so a run that writes a lot to stderr cannot block on a full pipe
+    _, stderr = await asyncio.gather(read_stdout(), process.stderr.read())
+    returncode = await process.wait()
+    return returncode, time.perf_counter() - start, parser.run, stderr.decode(errors='replace')
+
+
+async def _run_live(sweep, store, likwid, cores, jobs, retry_failed):
+    allocator = CoreAllocator(cores)
+    pending = pending_configurations(sweep, load_store(store), allocator.total, retry_failed)
+
+    def launch(params, pinned, args):
+        return asyncio.create_task(run_streaming(likwid, args, pinned))
+
+    written = []
+    with open_store(store) as store_file:
+        running = {}
+        try:
+            while pending or running:
+                start_pending(pending, allocator, running, sweep.command, launch, max_running=jobs)
+                completed, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in completed:
+                    params, pinned, args = running.pop(task)
+                    allocator.release(pinned)
+                    returncode, walltime, run, stderr = task.result()
+                    command_line = shlex.join([LIKWID, *args])
+                    group_config = command_group(run.command)
+                    row = None
+                    if returncode == 0 and group_config is not None:
+                        row = extract_run(run, command_line, group_config)
+                    elif group_config is None:
+                        print(f"Warning: Unknown performance group in '{command_line}'. Storing no metrics.")
+                    record = {PARAMS: params, CORES: pinned, COMMAND: [LIKWID, *args], RETURNCODE: returncode,
+                              WALLTIME: walltime, GROUP: group_config.name if group_config else None,
+                              ROWS: [row] if row else [], STDERR: stderr}
+                    append_record(store_file, record)
+                    written.append(record)
+                    status = 'ok' if returncode == 0 else f'failed ({returncode})'
+                    print(f"{status}: {command_line} [{walltime:.2f} s]")
+        finally:
+            for task in running:
+                task.cancel()
+    return written
+
+
+def run_live(sweep: Sweep, store: str, likwid: list[str] | None = None, cores: list[int] | None = None,
+             jobs: int | None = None, retry_failed: bool = True) -> list[dict]:
+    """
+    Runs the configurations of a sweep through likwid-perfctr that are not finished in `store`, appending one
+    record with the extracted metric row per run.
+
+    Args:
+        sweep (Sweep): The grid. Its command holds the likwid-perfctr arguments, formatted with the parameters
+                       and {cores}; the parameter 'threads' sets the number of cores of a run.
+        store (str): The JSON Lines store. Finished configurations are skipped on resume.
+        likwid (list[str], optional): The launcher the arguments are passed to. Defaults to ['likwid-perfctr'].
+        cores (list[int], optional): The cores to schedule on. Defaults to the affinity of this process.
+        jobs (int, optional): The maximum number of concurrent runs. Defaults to the number of cores.
+        retry_failed (bool, optional): Whether to rerun configurations whose stored run failed. Defaults to True.
+
+    Returns:
+        list[dict]: The records written by this call.
+    """
+    cores = available_cores() if cores is None else list(cores)
+    jobs = len(cores) if jobs is None else jobs
+    likwid = [LIKWID] if likwid is None else list(likwid)
+    return asyncio.run(_run_live(sweep, store, likwid, cores, max(1, jobs), retry_failed))
+
+
+def store_rows(records):
+    """
+    Collects the metric rows of the successful runs in store records by group, as taken by write_group_tables().
+    """
+    all_data = {}
+    for record in records:
+        if record.get(GROUP) and record[RETURNCODE] == 0:
+            all_data.setdefault(record[GROUP], []).extend(record[ROWS])
+    return all_data
+
+
+def _run_signature(command):
+    """
+    Returns what identifies a run in captured output: group, benchmark, N, B and the number of cores.
+    """
+    cmd_line_match = COMMAND_LINE_RE.match(command)
+    group_match = GROUP_RE.search(command)
+    if not cmd_line_match or not group_match:
+        return None
+    selection, benchmark, n, block_size = cmd_line_match.groups()
+    return group_match.group(1).upper(), benchmark, int(n), block_size and int(block_size), count_cores(selection)
+
+
+def replay(raw_inputs, args, delay=0.0):
+    """
+    Stands in for likwid-perfctr: prints the output of the captured run that matches the given arguments.
+
+    Args:
+        raw_inputs (list[str]): Captured .out files or directories of them.
+        args (list[str]): The likwid-perfctr arguments of the run to replay.
+        delay (float, optional): Seconds to sleep before every line, to simulate a running benchmark.
+
+    Returns:
+        int: 0, or 1 if no captured run matches.
+    """
+    signature = _run_signature(' ' + shlex.join(args))
+    files = []
+    for path in raw_inputs:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.out')))
+        else:
+            files.append(path)
+
+    for file_path in files:
+        for block in iter_run_blocks(file_path):
+            if signature is None or _run_signature(block[0]) != signature:
+                continue
+            # The first line is the command line echoed by the job script, not output of likwid-perfctr
+            for part in ''.join(block[1:]).splitlines(keepends=True):
+                if delay:
+                    time.sleep(delay)
+                sys.stdout.write(part)
+                sys.stdout.flush()
+            return 0
+    print(f"{RUN_SEPARATOR}: no captured run matches '{shlex.join(args)}'", file=sys.stderr)
+    return 1
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Runs likwid-perfctr sweeps and parses their output live.")
+    subparsers = arg_parser.add_subparsers(dest='action', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Run a grid of likwid-perfctr invocations")
+    run_parser.add_argument('command', nargs='+',
+                            help="The likwid-perfctr arguments, e.g. -m -g {group} -C {cores} ./benchmark-basic-omp -N {N}")
+    run_parser.add_argument('-p', '--param', action='append', type=parse_param, default=[],
+                            help="A parameter and its values, e.g. -p N=128,512,2048 (repeatable)")
+    run_parser.add_argument('--store', required=True, help="The JSON Lines store results are appended to")
+    run_parser.add_argument('--tables', help="Also write the per-group and merged tables to this directory")
+    run_parser.add_argument('--csv', action='store_true', help="Also export the tables as CSV")
+    run_parser.add_argument('--likwid', default=LIKWID,
+                            help=f"The launcher, e.g. a replay command (default: {LIKWID})")
+    run_parser.add_argument('--cores', help="The cores to schedule on, e.g. 0-63 or 0,2,4 (default: all available)")
+    run_parser.add_argument('-j', '--jobs', type=int, help="Maximum number of concurrent runs (default: one per core)")
+    run_parser.add_argument('--keep-failed', action='store_true', help="Do not rerun configurations that failed")
+
+    replay_parser = subparsers.add_parser('replay', help="Stand in for likwid-perfctr by replaying captured output")
+    replay_parser.add_argument('--delay', type=float, default=0.0, help="Seconds to sleep before every line")
+    replay_parser.add_argument('raw', help="A captured .out file or a directory of them")
+    replay_parser.add_argument('args', nargs=argparse.REMAINDER, help="The likwid-perfctr arguments")
+    args = arg_parser.parse_args(argv)
+
+    if args.action == 'replay':
+        return replay([args.raw], args.args, args.delay)
+
+    command = args.command[1:] if args.command[0] == LIKWID else args.command
+    records = run_live(Sweep(command, dict(args.param)), args.store, likwid=shlex.split(args.likwid),
+                       cores=parse_cores(args.cores) if args.cores else None, jobs=args.jobs,
+                       retry_failed=not args.keep_failed)
+    if args.tables:
+        write_group_tables(store_rows(load_store(args.store)), args.tables, export_csv=args.csv or None)
+    return 1 if any(record[RETURNCODE] != 0 for record in records) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,329 @@
+"""
+Measured machine profiles: the sustainable memory bandwidth and DP flop rate of a node type.
+
+Bandwidth fractions (hpc_tools.metrics) and rooflines (hpc_tools.roofline) are relative to the peaks of the node the
+data was measured on. Instead of a hand-typed number for one node type, `calibrate` measures them:
+
+    - STREAM-style copy (a = b) and triad (a = b + s c) over arrays of 4x the last-level cache of the whole node
+      (all L3 instances, not only the one of cpu0), at several worker counts. The triad runs as two NumPy passes, so
+      it is counted as the 5 arrays it moves, not STREAM's 3.
+    - the DP flop rate of single-threaded NumPy/BLAS dgemm on every worker, the practical peak of the cores.
+
+Every worker is a process pinned to its own core that allocates (and first touches) its share of the arrays. The
+workers start each repetition together, a repetition takes from the first start to the last finish, and the best
+repetition counts, as in STREAM.
+
+Profiles are kept in a JSON file (HPC_MACHINE_PROFILES, default machines.json at the repository root), keyed by
+CPU model and host. The peaks of the current host are its own profile, or the latest profile of another host with
+the same CPU model, so one calibration covers a node type. Set HPC_MACHINE to a host or CPU model to analyze data
+of another machine. Without a matching profile, the nominal peaks of a Perlmutter CPU node are used.
+
+    python -m hpc_tools.machine calibrate --threads 1,4,16,64,128
+    python -m hpc_tools.machine show
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+
+import numpy as np
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.sweep import available_cores
+
+PROFILES_ENV = 'HPC_MACHINE_PROFILES'
+MACHINE_ENV = 'HPC_MACHINE'
+DEFAULT_PROFILES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'machines.json')
+
+# --- Fields of a profile ---
+HOST = 'host'
+CPU_MODEL = 'cpu model'
+CORES = 'cores'
+CALIBRATED_AT = 'calibrated at'
+PEAK_BANDWIDTH = 'peak bandwidth'  # bytes/s
+PEAK_FLOPS = 'peak flops'  # flops/s
+# Measured rates per worker count
+COPY = 'copy'
+TRIAD = 'triad'
+DGEMM = 'dgemm'
+
+# Bytes moved per element: copy reads b and writes a, the triad passes a = s c and a += b move 5 arrays
+BYTES_PER_ELEMENT = {COPY: 2 * 8, TRIAD: 5 * 8}
+DEFAULT_ARRAY_BYTES = 256 << 20  # per array, when the last-level cache size is unknown
+DGEMM_SIZE = 1024
+# Single-threaded BLAS in every worker, the workers are the threads
+BLAS_THREAD_ENVS = ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS', 'BLIS_NUM_THREADS']
+
+
+def cpu_model():
+    """
+    Returns the CPU model name of this host, e.g. 'AMD EPYC 7763 64-Core Processor'.
+    """
+    try:
+        with open('/proc/cpuinfo') as f:
+            for line in f:
+                if line.startswith('model name'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def _read_sysfs(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def last_level_cache_bytes(root='/sys/devices/system/cpu'):
+    """
+    Returns the total size of the last-level cache over all of its instances (e.g. the L3 of every CCX), or None if
+    sysfs does not tell. Each instance is counted once, by the CPUs that share it.
+    """
+    instances = {}  # (level, shared CPUs) -> bytes
+    for cpu in os.listdir(root) if os.path.isdir(root) else []:
+        cache_dir = os.path.join(root, cpu, 'cache')
+        if not cpu[3:].isdigit() or not os.path.isdir(cache_dir):
+            continue
+        for index in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, index)
+            level, size = _read_sysfs(os.path.join(path, 'level')), _read_sysfs(os.path.join(path, 'size'))
+            if not level or not size or _read_sysfs(os.path.join(path, 'type')) == 'Instruction':
+                continue
+            shared = _read_sysfs(os.path.join(path, 'shared_cpu_list')) or cpu
+            scale = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}.get(size[-1:], 1)
+            instances[(int(level), shared)] = int(size.rstrip('KMG')) * scale
+    if not instances:
+        return None
+    last_level = max(level for level, _ in instances)
+    return sum(size for (level, _), size in instances.items() if level == last_level)
+
+
+def _stream_worker(core, kind, elements, repeats, barrier, results):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [core])
+    a, b, c = np.zeros(elements), np.ones(elements), np.full(elements, 2.0)
+    scalar = 3.0
+    spans = []
+    for _ in range(repeats):
+        barrier.wait()
+        start = time.perf_counter()
+        if kind == COPY:
+            np.copyto(a, b)
+        else:
+            np.multiply(c, scalar, out=a)
+            np.add(a, b, out=a)
+        spans.append((start, time.perf_counter()))
+    results.put(spans)
+
+
+def _dgemm_worker(core, n, repeats, barrier, results):
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [core])
+    rng = np.random.default_rng(core)
+    a, b, c = rng.random((n, n)), rng.random((n, n)), np.empty((n, n))
+    np.dot(a, b, out=c)  # loads the BLAS library and its kernels
+    spans = []
+    for _ in range(repeats):
+        barrier.wait()
+        start = time.perf_counter()
+        np.dot(a, b, out=c)
+        spans.append((start, time.perf_counter()))
+    results.put(spans)
+
+
+def run_workers(target, cores, args, repeats):
+    """
+    Runs `target(core, *args, repeats, barrier, results)` in one process per core and returns the best (shortest)
+    repetition, from the first start to the last finish over all workers, in seconds.
+    """
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(len(cores))
+    results = context.Queue()
+    saved = {name: os.environ.get(name) for name in BLAS_THREAD_ENVS}
+    os.environ.update({name: '1' for name in BLAS_THREAD_ENVS})  # inherited by the spawned workers
+    try:
+        workers = [context.Process(target=target, args=(core, *args, repeats, barrier, results)) for core in cores]
+        for worker in workers:
+            worker.start()
+        spans = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+    return min(max(end for _, end in rep) - min(start for start, _ in rep) for rep in zip(*spans))
+
+
+def measure_stream(kind, cores, array_bytes, repeats=5):
+    """
+    Measures the bandwidth of `kind` (copy or triad) with one worker per core, each on array_bytes / workers.
+
+    Returns:
+        float: The bandwidth in bytes/s.
+    """
+    elements = max(1, array_bytes // 8 // len(cores))
+    seconds = run_workers(_stream_worker, cores, (kind, elements), repeats)
+    return BYTES_PER_ELEMENT[kind] * elements * len(cores) / seconds
+
+
+def measure_dgemm(cores, n=DGEMM_SIZE, repeats=3):
+    """
+    Measures the DP flop rate of one single-threaded n x n dgemm per core.
+
+    Returns:
+        float: The flop rate in flops/s.
+    """
+    seconds = run_workers(_dgemm_worker, cores, (n,), repeats)
+    return 2 * n**3 * len(cores) / seconds
+
+
+def calibrate(thread_counts, array_bytes=None, repeats=5, dgemm_size=DGEMM_SIZE, verbose=True):
+    """
+    Measures the profile of this host at every worker count.
+
+    Args:
+        thread_counts (list[int]): The worker counts, at most the available cores.
+        array_bytes (int, optional): The size of one array over all workers. Defaults to 4x the total last-level
+                                     cache, so that no worker count runs from the caches.
+        repeats (int, optional): The repetitions of every kernel. Defaults to 5.
+        dgemm_size (int, optional): The matrix size of the flop measurement. Defaults to 1024.
+        verbose (bool, optional): Print every measurement. Defaults to True.
+
+    Returns:
+        dict: The profile, see the field constants.
+    """
+    cores = available_cores()
+    if array_bytes is None:
+        llc = last_level_cache_bytes()
+        array_bytes = 4 * llc if llc else DEFAULT_ARRAY_BYTES
+    profile = {HOST: platform.node(), CPU_MODEL: cpu_model(), CORES: len(cores), COPY: {}, TRIAD: {}, DGEMM: {}}
+    for threads in sorted(t for t in thread_counts if t <= len(cores)):
+        for kind in (COPY, TRIAD):
+            profile[kind][str(threads)] = measure_stream(kind, cores[:threads], array_bytes, repeats)
+        profile[DGEMM][str(threads)] = measure_dgemm(cores[:threads], dgemm_size, max(1, repeats // 2))
+        if verbose:
+            print(f"{threads:4d} worker(s): copy {profile[COPY][str(threads)] / 1e9:8.2f} GB/s, "
+                  f"triad {profile[TRIAD][str(threads)] / 1e9:8.2f} GB/s, "
+                  f"dgemm {profile[DGEMM][str(threads)] / 1e9:8.2f} GFLOP/s")
+    profile[PEAK_BANDWIDTH] = max(list(profile[COPY].values()) + list(profile[TRIAD].values()))
+    profile[PEAK_FLOPS] = max(profile[DGEMM].values())
+    profile[CALIBRATED_AT] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    return profile
+
+
+def profiles_path():
+    return os.environ.get(PROFILES_ENV, DEFAULT_PROFILES)
+
+
+def load_profiles(path=None):
+    path = path or profiles_path()
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_profile(profile, path=None):
+    """
+    Adds a profile to the profiles file, replacing the previous one of its host and CPU model.
+    """
+    path = path or profiles_path()
+    profiles = load_profiles(path)
+    profiles.setdefault(profile[CPU_MODEL], {})[profile[HOST]] = profile
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(profiles, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return path
+
+
+def find_profile(profiles, machine=None):
+    """
+    Returns the profile of `machine`, a host or CPU model (default: HPC_MACHINE, or this host and its CPU model).
+    A host without a profile of its own gets the latest profile of its CPU model. Returns None if there is none.
+    """
+    machine = machine or os.environ.get(MACHINE_ENV)
+    hosts = {host: profile for by_host in profiles.values() for host, profile in by_host.items()}
+    if machine is None:
+        host, model = platform.node(), cpu_model()
+    elif machine in hosts:
+        host, model = machine, hosts[machine][CPU_MODEL]
+    else:
+        host, model = None, machine
+    if host in hosts:
+        return hosts[host]
+    candidates = profiles.get(model, {}).values()
+    return max(candidates, key=lambda profile: profile[CALIBRATED_AT], default=None)
+
+
+@functools.lru_cache(maxsize=None)
+def current_profile():
+    """
+    Returns the profile the analysis uses (see find_profile()), read once per process, or None.
+    """
+    profile = find_profile(load_profiles())
+    if profile is None:
+        print(f"No machine profile for {os.environ.get(MACHINE_ENV) or platform.node()} in {profiles_path()}, using "
+              f"nominal peaks (run: python -m hpc_tools.machine calibrate)", file=sys.stderr)
+    return profile
+
+
+def peak(field, default):
+    """
+    Returns the peak `field` (PEAK_BANDWIDTH or PEAK_FLOPS) of the current profile, or `default` without one.
+    """
+    profile = current_profile()
+    return profile[field] if profile is not None else default
+
+
+def parse_ints(text):
+    return [int(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Measures and stores the peak bandwidth and flop rate of this "
+                                                     "machine.")
+    arg_parser.add_argument('action', choices=['calibrate', 'show'],
+                            help="calibrate: measure this host, show: print the profile the analysis uses")
+    arg_parser.add_argument('--profiles', help=f"The profiles file (default: ${PROFILES_ENV} or {DEFAULT_PROFILES})")
+    arg_parser.add_argument('--threads', type=parse_ints, default=None,
+                            help="The worker counts (default: powers of 2 up to the available cores, and all cores)")
+    arg_parser.add_argument('--array-size', type=int, default=None,
+                            help="Bytes per array over all workers (default: 4x the total last-level cache)")
+    arg_parser.add_argument('--repeats', type=int, default=5, help="Repetitions per kernel (default: 5)")
+    arg_parser.add_argument('--dgemm-size', type=int, default=DGEMM_SIZE,
+                            help="The matrix size of the flop measurement (default: %(default)s)")
+    arg_parser.add_argument('--machine', help=f"show: the host or CPU model (default: ${MACHINE_ENV} or this host)")
+    args = arg_parser.parse_args(argv)
+
+    if args.action == 'show':
+        profile = find_profile(load_profiles(args.profiles), args.machine)
+        if profile is None:
+            print(f"No profile for {args.machine or platform.node()} ({cpu_model()})", file=sys.stderr)
+            return 1
+        print(json.dumps(profile, indent=1, sort_keys=True))
+        return 0
+
+    cores = len(available_cores())
+    thread_counts = args.threads or sorted({1 << i for i in range(cores.bit_length()) if 1 << i <= cores} | {cores})
+    profile = calibrate(thread_counts, args.array_size, args.repeats, args.dgemm_size)
+    path = save_profile(profile, args.profiles)
+    print(f"{profile[HOST]} ({profile[CPU_MODEL]}): peak bandwidth {profile[PEAK_BANDWIDTH] / 1e9:.2f} GB/s, "
+          f"peak {profile[PEAK_FLOPS] / 1e9:.2f} GFLOP/s, saved to {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
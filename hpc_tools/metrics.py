@@ -0,0 +1,199 @@
+"""
+Declarative, vectorized performance metrics for the benchmark harnesses.
+
+Each kernel declares its flop count, the bytes it moves and the variant its speedup is measured against.
+The engine works on a long-form table with one row per run (kernel, variant, N, threads, B, runtime) and
+computes MFLOP/s, the fraction of the peak memory bandwidth, speedup and parallel efficiency for all
+variants at once. Variants are aligned on N (and B), never on row position, so result files with a
+different number of rows cannot silently shift against each other.
+"""
+import numpy as np
+import pandas as pd
+
+from hpc_tools import machine
+from hpc_tools.storage import read_table, write_table
+
+# --- Columns of the long-form run table ---
+KERNEL = 'kernel'
+VARIANT = 'variant'
+N = 'N'
+THREADS = 'threads'
+BLOCK_SIZE = 'B'
+RUNTIME = 'runtime'
+TRIAL = 'trial'
+CONFIG_KEYS = [KERNEL, VARIANT, N, THREADS, BLOCK_SIZE]
+
+# --- Derived metric columns ---
+MFLOPS = 'MFLOP/s'
+BANDWIDTH = 'bandwidth'
+SPEEDUP = 'speedup'
+EFFICIENCY = 'efficiency'
+NS_PER_ELEMENT = 'ns per element'
+# Suffixes of the confidence interval bounds of a column (see hpc_tools.stats)
+CI_LOW = ' CI low'
+CI_HIGH = ' CI high'
+
+# Nominal peak of one Perlmutter CPU node (204.8 GB/s), used without a machine profile (see hpc_tools.machine)
+PEAK_BANDWIDTH = 204.8e9
+
+# Column names used by the benchmark binaries for the long-form columns
+RAW_COLUMNS = {'t': RUNTIME, 'block_size': BLOCK_SIZE}
+
+
+class Kernel:
+    """
+    The declaration of a benchmarked kernel.
+
+    Args:
+        name (str): The name of the kernel (e.g., 'dgemm').
+        flops (callable): Maps the problem size N to the number of floating point operations.
+        bytes_moved (callable): Maps the problem size N to the number of bytes moved to and from memory.
+        baseline (str): The variant that speedups are computed against.
+    """
+    def __init__(self, name, flops, bytes_moved, baseline):
+        self.name = name
+        self.flops = flops
+        self.bytes_moved = bytes_moved
+        self.baseline = baseline
+
+
+KERNELS = {
+    kernel.name: kernel for kernel in [
+        # One addition per 32-bit float element
+        Kernel('sum', flops=lambda n: n, bytes_moved=lambda n: n * 4, baseline='direct'),
+        # y += A x: read A and x, read and write y
+        Kernel('dgemv', flops=lambda n: 2 * n**2, bytes_moved=lambda n: 2 * n + 2 * n**2 * 8, baseline='basic'),
+        # C += A B: read A, B and C, write C
+        Kernel('dgemm', flops=lambda n: 2 * n**3, bytes_moved=lambda n: 4 * n**2 * 8, baseline='blas'),
+        # N is the number of pixels: two 3x3 stencils (36 flops), squares, sum and sqrt; read and write a float
+        Kernel('sobel', flops=lambda n: 40 * n, bytes_moved=lambda n: 2 * n * 4, baseline='cpu'),
+    ]
+}
+
+
+class RunSource:
+    """
+    A result file written by a benchmark binary, and the configuration it was run with.
+
+    Args:
+        variant (str): The name of the variant in the run table (e.g., 'openmp-16').
+        path (str): The path of the result table (see hpc_tools.storage).
+        threads (int, optional): The number of threads the binary ran with. Defaults to 1.
+    """
+    def __init__(self, variant, path, threads=1):
+        self.variant = variant
+        self.path = path
+        self.threads = threads
+
+
+def load_runs(kernel: str, sources: list[RunSource]) -> pd.DataFrame:
+    """
+    Reads the result files of a kernel into one long-form run table.
+
+    Repeated rows of the same configuration (written with `-R repetitions`, or the smallest problem size that
+    the harnesses run twice to "condition" BLAS) are numbered as trials in file order. Use
+    hpc_tools.stats.summarize_trials() to reduce them to one row per configuration.
+
+    Returns:
+        pd.DataFrame: One row per trial with the columns kernel, variant, N, threads, B, runtime and trial.
+    """
+    frames = []
+    for source in sources:
+        df = read_table(source.path).rename(columns=RAW_COLUMNS)
+        df = df.assign(**{KERNEL: kernel, VARIANT: source.variant, THREADS: source.threads})
+        if BLOCK_SIZE not in df.columns:
+            df[BLOCK_SIZE] = np.nan
+        frames.append(df[CONFIG_KEYS + [RUNTIME]])
+
+    runs = pd.concat(frames, ignore_index=True)
+    runs[TRIAL] = runs.groupby(CONFIG_KEYS, dropna=False, sort=False).cumcount()
+    return runs
+
+
+def compute_metrics(runs: pd.DataFrame, peak_bandwidth: float | None = None) -> pd.DataFrame:
+    """
+    Computes the derived metrics of every run in a long-form run table.
+
+    The speedup of a run is the runtime of the kernel's baseline variant (single-threaded, same N) divided
+    by the run's runtime, the efficiency is the speedup per thread. If the table holds the confidence interval
+    of the runtime (see hpc_tools.stats.summarize_trials()), the intervals of the derived metrics are added too.
+
+    Args:
+        runs (pd.DataFrame): A table as returned by load_runs() or hpc_tools.stats.summarize_trials(),
+                             possibly holding several kernels.
+        peak_bandwidth (float, optional): The peak memory bandwidth in bytes/s. Defaults to the measured peak of the
+                                          machine profile, or PEAK_BANDWIDTH without one.
+
+    Returns:
+        pd.DataFrame: The run table with the additional columns MFLOP/s, bandwidth (as a fraction of the peak),
+                      speedup, efficiency and ns per element, and their ' CI low' / ' CI high' bounds.
+    """
+    if peak_bandwidth is None:
+        peak_bandwidth = machine.peak(machine.PEAK_BANDWIDTH, PEAK_BANDWIDTH)
+    n = runs[N].astype('float64')
+    flops = pd.Series(np.nan, index=runs.index)
+    bytes_moved = pd.Series(np.nan, index=runs.index)
+    baseline_variant = pd.Series(None, index=runs.index, dtype=object)
+    for name, index in runs.groupby(KERNEL).groups.items():
+        kernel = KERNELS[name]
+        flops[index] = kernel.flops(n[index])
+        bytes_moved[index] = kernel.bytes_moved(n[index])
+        baseline_variant[index] = kernel.baseline
+
+    is_baseline = (runs[VARIANT] == baseline_variant) & (runs[THREADS] == 1)
+    baseline = runs[is_baseline].groupby([KERNEL, N])[RUNTIME].min().rename('baseline runtime')
+    baseline_runtime = runs.join(baseline, on=[KERNEL, N])['baseline runtime']
+
+    metrics = runs.copy()
+    metrics[NS_PER_ELEMENT] = runs[RUNTIME].clip(lower=0) / n * 1e9
+    # A longer runtime gives a lower rate, so the upper runtime bound gives the lower metric bound
+    for suffix, runtime in (('', RUNTIME), (CI_LOW, RUNTIME + CI_HIGH), (CI_HIGH, RUNTIME + CI_LOW)):
+        if runtime not in runs.columns:
+            continue
+        metrics[MFLOPS + suffix] = flops / runs[runtime] / 10**6
+        metrics[BANDWIDTH + suffix] = bytes_moved / runs[runtime] / peak_bandwidth
+        metrics[SPEEDUP + suffix] = baseline_runtime / runs[runtime]
+        metrics[EFFICIENCY + suffix] = metrics[SPEEDUP + suffix] / runs[THREADS]
+    return metrics
+
+
+def pivot_metric(metrics: pd.DataFrame, value: str, variants: list[str] | None = None,
+                 columns: str | list[str] = VARIANT, labels=None) -> pd.DataFrame:
+    """
+    Pivots one metric into a wide table with one row per N, as read by the plot_data.py scripts.
+
+    Args:
+        metrics (pd.DataFrame): A table as returned by compute_metrics().
+        value (str): The metric column to pivot (e.g., MFLOPS).
+        variants (list[str], optional): Only include these variants, in this order. Defaults to all.
+        columns (str | list[str], optional): The column(s) whose values become the columns of the table.
+                                             Defaults to variant.
+        labels (callable, optional): Maps a column value (a tuple for several columns) to a column label.
+                                     Defaults to None.
+
+    Returns:
+        pd.DataFrame: A table with N as first column and one column per variant (or other `columns` value).
+    """
+    cols = [columns] if isinstance(columns, str) else list(columns)
+    if variants is not None:
+        metrics = metrics[metrics[VARIANT].isin(variants)]
+    wide = metrics.groupby([N] + cols, dropna=False)[value].last().unstack(cols).sort_index()
+    if variants is not None and VARIANT in cols:
+        position = {variant: i for i, variant in enumerate(variants)}
+        level = wide.columns.get_level_values(cols.index(VARIANT))
+        wide = wide.iloc[:, sorted(range(len(level)), key=lambda i: position[level[i]])]
+    if labels is not None:
+        wide.columns = [labels(col) for col in wide.columns]
+    wide.columns.name = None
+    return wide.reset_index()
+
+
+def write_pivot(metrics: pd.DataFrame, value: str, path: str, variants: list[str] | None = None, **kwargs):
+    """
+    Writes pivot_metric() of a metric to `path`. If the metric has confidence interval bounds, they are
+    written as the tables `<path>_low` and `<path>_high` with the same layout, for error bands in plots.
+    """
+    write_table(pivot_metric(metrics, value, variants, **kwargs), path)
+    for suffix, band in ((CI_LOW, '_low'), (CI_HIGH, '_high')):
+        if value + suffix in metrics.columns:
+            write_table(pivot_metric(metrics, value + suffix, variants, **kwargs), path + band)
@@ -0,0 +1,257 @@
+"""
+Streaming parser of Nsight Compute (ncu) command line output.
+
+scripts/run-cp5-cuda-configs-gpu-perlmutter.sh runs sobel_gpu under ncu for every threads per block (N) x number of
+blocks (B) configuration, so its log interleaves the driver script's echo lines, the program's output and one ncu
+report per profiled kernel. iter_records() reads such a log line by line and yields one Record per metric value. It
+understands the default text report ('Section: ...' tables) as well as '--csv' output, both in the long layout
+(one row per metric) and in the '--page raw' layout (one row per kernel).
+
+The launch configuration of a record is taken from the report itself where ncu states it (the grid and block
+dimensions in the kernel header, the 'Block Size'/'Grid Size' launch statistics or the CSV columns). Otherwise it
+is the configuration last announced in the log ('Working on config N=.., B=..', the program's 'GPU configuration:
+.. blocks, .. threads per block' or an '-N .. -B ..' command line).
+
+metric_grids() then builds one (N, B) table per metric and kernel. Times are converted to milliseconds.
+
+tests/data/ncu-text.log and tests/data/ncu-csv.log are captured logs of both formats, parsed by tests/test_ncu.py.
+"""
+import csv
+import re
+from collections import defaultdict
+
+import pandas as pd
+
+# The metrics collected by the sweep script (prefixes of the full metric names)
+TIME = 'gpu__time_duration'
+SM_ACTIVE = 'smsp__cycles_active'
+DRAM_THROUGHPUT = 'dram__throughput'
+SWEEP_METRICS = [TIME, SM_ACTIVE, DRAM_THROUGHPUT]
+
+# Time units are converted to milliseconds
+TIME_UNIT = 'msecond'
+TIME_SCALE = {'nsecond': 1e-6, 'usecond': 1e-3, 'msecond': 1.0, 'second': 1e3}
+
+# --- Launch configuration announced in the log ---
+# Group 1: threads per block, group 2: number of blocks
+CONFIG_RE = re.compile(r'Working on config N=(\d+), B=(\d+)')
+COMMAND_LINE_RE = re.compile(r'\s-N\s+(\d+)\s+-B\s+(\d+)')
+# Group 1: number of blocks, group 2: threads per block
+GPU_CONFIG_RE = re.compile(r'GPU configuration: (\d+) blocks, (\d+) threads per block')
+
+# --- Text report ---
+# Group 1: kernel name, the rest of the header may contain '(gx, gy, gz)x(bx, by, bz)'
+KERNEL_RE = re.compile(r'^\s*([A-Za-z_][\w:<>~]*)\(.*Context \d+')
+LAUNCH_DIMS_RE = re.compile(r'\((\d+), (\d+), (\d+)\)x\((\d+), (\d+), (\d+)\)')
+LAUNCH_STAT_RE = re.compile(r'^\s*(Block Size|Grid Size)\s+(?:\S+\s+)?([\d,]+)\s*$')
+# Group 1: metric name, group 2: optional unit, group 3: value
+METRIC_RE = re.compile(r'^\s*([a-z]\w*__[\w.]+)\s+(?:(\S+)\s+)?([-+]?[\d,]*\.?\d+(?:[eE][-+]?\d+)?)\s*$')
+
+# --- CSV report columns ---
+CSV_KERNEL = 'Kernel Name'
+CSV_BLOCK = 'Block Size'
+CSV_GRID = 'Grid Size'
+CSV_METRIC = 'Metric Name'
+CSV_UNIT = 'Metric Unit'
+CSV_VALUE = 'Metric Value'
+
+
+class Record:
+    """
+    One metric value of one profiled kernel launch.
+
+    Attributes:
+        kernel (str): The kernel name, without its parameter list.
+        threads_per_block (int | None): N, the threads per block.
+        blocks (int | None): B, the number of blocks.
+        metric (str): The full metric name, e.g. 'gpu__time_duration.avg'.
+        unit (str): The unit, after converting times to TIME_UNIT.
+        value (float): The value.
+    """
+    def __init__(self, kernel, threads_per_block, blocks, metric, unit, value):
+        self.kernel = kernel
+        self.threads_per_block = threads_per_block
+        self.blocks = blocks
+        self.metric = metric
+        self.unit = unit
+        self.value = value
+
+    def __repr__(self):
+        return (f"Record({self.kernel!r}, N={self.threads_per_block}, B={self.blocks}, {self.metric!r}, "
+                f"{self.value} {self.unit})")
+
+
+def parse_number(text):
+    return float(text.replace(',', ''))
+
+
+def launch_size(text):
+    """
+    Returns the total size of a launch dimension as ncu prints it, e.g. '(256, 1, 1)' or '256'.
+    """
+    size = 1
+    for part in re.findall(r'\d[\d,]*', text):
+        size *= int(part.replace(',', ''))
+    return size
+
+
+def make_record(kernel, config, metric, unit, value):
+    unit = unit or ''
+    if unit in TIME_SCALE:
+        value, unit = value * TIME_SCALE[unit], TIME_UNIT
+    return Record(kernel, config[0], config[1], metric, unit, value)
+
+
+def kernel_name(text):
+    """
+    Strips the parameter list of a demangled kernel signature.
+    """
+    return text.split('(', 1)[0].strip()
+
+
+def iter_records(lines):
+    """
+    Parses ncu output line by line.
+
+    Args:
+        lines (Iterable[str]): The lines of the log, e.g. an open file.
+
+    Yields:
+        Record: The metric values in log order.
+    """
+    announced = (None, None)  # (N, B) last announced by the script or the program
+    # The kernel of the current text report, its launch statistics and its metric rows. The launch statistics
+    # may follow the metrics, so the rows are only yielded when the report ends.
+    kernel, launch, pending = None, {}, []
+    csv_header, csv_units = None, None
+
+    def end_report():
+        config = (launch.get(CSV_BLOCK, announced[0]), launch.get(CSV_GRID, announced[1]))
+        records = [make_record(kernel, config, *row) for row in pending]
+        pending.clear()
+        return records
+
+    for line in lines:
+        line = line.rstrip('\n')
+        if pending and ((line and not line.startswith(' ')) or KERNEL_RE.match(line)):
+            yield from end_report()
+
+        match = CONFIG_RE.search(line) or COMMAND_LINE_RE.search(line)
+        if match:
+            announced = (int(match.group(1)), int(match.group(2)))
+        match = GPU_CONFIG_RE.search(line)
+        if match:
+            announced = (int(match.group(2)), int(match.group(1)))
+
+        # --- CSV output: a header row, then one row per metric (or per kernel with --page raw) ---
+        if line.startswith('"'):
+            row = next(csv.reader([line]))
+            if row[0] == 'ID':
+                csv_header, csv_units = row, None
+                continue
+            if csv_header is None or len(row) != len(csv_header):
+                continue
+            cells = dict(zip(csv_header, row))
+            config = announced
+            if cells.get(CSV_BLOCK) and cells.get(CSV_GRID):
+                config = (launch_size(cells[CSV_BLOCK]), launch_size(cells[CSV_GRID]))
+            if CSV_METRIC in cells:
+                try:
+                    value = parse_number(cells[CSV_VALUE])
+                except ValueError:
+                    continue
+                yield make_record(kernel_name(cells[CSV_KERNEL]), config, cells[CSV_METRIC], cells[CSV_UNIT], value)
+            elif not row[0]:
+                csv_units = cells  # the unit row of the raw page
+            else:
+                for column, text in cells.items():
+                    if '__' not in column:
+                        continue
+                    try:
+                        value = parse_number(text)
+                    except ValueError:
+                        continue
+                    unit = csv_units.get(column) if csv_units else None
+                    yield make_record(kernel_name(cells[CSV_KERNEL]), config, column, unit, value)
+            continue
+
+        # --- Text output: a kernel header, then sections of 'metric unit value' rows ---
+        match = KERNEL_RE.match(line)
+        if match:
+            kernel, launch = match.group(1), {}
+            dims = LAUNCH_DIMS_RE.search(line)
+            if dims:
+                launch[CSV_GRID] = int(dims.group(1)) * int(dims.group(2)) * int(dims.group(3))
+                launch[CSV_BLOCK] = int(dims.group(4)) * int(dims.group(5)) * int(dims.group(6))
+            continue
+        if kernel is None:
+            continue
+        match = LAUNCH_STAT_RE.match(line)
+        if match:
+            launch.setdefault(match.group(1), int(match.group(2).replace(',', '')))
+            continue
+        match = METRIC_RE.match(line)
+        if match:
+            pending.append((match.group(1), match.group(2), parse_number(match.group(3))))
+    if pending:
+        yield from end_report()
+
+
+def parse_log(path):
+    """
+    Parses an ncu log file.
+
+    Returns:
+        list[Record]: The metric values in log order.
+    """
+    with open(path, 'r', errors='replace') as f:
+        return list(iter_records(f))
+
+
+def metric_grids(records):
+    """
+    Builds one (N, B) table per metric and kernel. Values of repeated launches are averaged.
+
+    Args:
+        records (Iterable[Record]): The parsed metric values.
+
+    Returns:
+        dict: Maps (metric, kernel) to a DataFrame with the threads per block as index and the number of blocks as
+              columns, both sorted, missing configurations NaN. Each DataFrame has attrs['unit'].
+    """
+    values = defaultdict(lambda: defaultdict(list))
+    units = {}
+    for record in records:
+        if record.threads_per_block is None or record.blocks is None:
+            continue
+        key = (record.metric, record.kernel)
+        values[key][(record.threads_per_block, record.blocks)].append(record.value)
+        units[key] = record.unit
+
+    grids = {}
+    for key, cells in values.items():
+        series = pd.Series({config: sum(v) / len(v) for config, v in cells.items()})
+        grid = series.unstack().sort_index().sort_index(axis=1)
+        grid.index.name, grid.columns.name = 'N', 'B'
+        grid.attrs['unit'] = units[key]
+        grids[key] = grid
+    return grids
+
+
+def find_metric(grids, prefix, kernel=None):
+    """
+    Returns the key of the first grid whose metric starts with `prefix` (and of `kernel`, if given), or None.
+    """
+    for metric, grid_kernel in sorted(grids):
+        if metric.startswith(prefix) and (kernel is None or grid_kernel == kernel):
+            return metric, grid_kernel
+    return None
+
+
+def best_config(grid, minimize=True):
+    """
+    Returns the (N, B) of the smallest (or largest) value of a grid.
+    """
+    stacked = grid.stack().dropna()
+    n, b = stacked.idxmin() if minimize else stacked.idxmax()
+    return int(n), int(b)
@@ -0,0 +1,234 @@
+"""
+Dependency-tracked, incremental execution of the analysis scripts of a harness.
+
+Each step (parsing, aggregation, cache tables, one figure, ...) is declared as a Stage with its command, the
+files it reads and the files it writes. A stage depends on the stages that write its inputs. The fingerprint of
+a stage is the content hash of its command and of all its inputs; a stage runs again only if its fingerprint
+changed or its outputs are missing or were modified since it last ran. Because fingerprints hash content, not
+modification times, a stage that reruns but writes identical tables does not invalidate the stages after it.
+Independent stages run in parallel.
+
+Paths are relative to the harness directory. Tables can be named without extension (see hpc_tools.storage),
+inputs may be glob patterns (e.g. 'data/raw/*.out'). The fingerprints are kept in 'data/.pipeline-state.json'.
+"""
+import argparse
+import fnmatch
+import glob
+import hashlib
+import json
+import os
+import subprocess
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from hpc_tools.storage import table_files, table_stem
+
+STATE_FILE = 'data/.pipeline-state.json'
+HASH_CHUNK = 1 << 20
+
+# --- Outcomes of a stage ---
+RAN = 'ran'
+UP_TO_DATE = 'up to date'
+STALE = 'stale'  # would run (dry run)
+FAILED = 'failed'
+BLOCKED = 'blocked'  # an upstream stage failed
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name (str): The unique name of the stage.
+        command (list[str]): The command to run, from the pipeline's directory.
+        inputs (list[str]): The files (or tables, or glob patterns) the stage reads.
+        outputs (list[str]): The files (or tables) the stage writes.
+    """
+    def __init__(self, name, command, inputs, outputs):
+        self.name = name
+        self.command = list(command)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+def resolve(root, path):
+    """
+    Returns the existing files behind a declared path: the file itself, the files of a table, or the matches of a
+    glob pattern, relative to `root`.
+    """
+    full = os.path.join(root, path)
+    if glob.has_magic(path):
+        return sorted(os.path.relpath(match, root) for match in glob.glob(full))
+    if os.path.isfile(full):
+        return [path]
+    return [os.path.relpath(match, root) for match in table_files(full)]
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class Hasher:
+    """
+    Hashes file contents, remembering the digest of a file until its size or modification time changes.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.known = {}
+
+    def digest(self, path):
+        stat = os.stat(os.path.join(self.root, path))
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        if key not in self.known:
+            self.known[key] = file_digest(os.path.join(self.root, path))
+        return self.known[key]
+
+    def digests(self, paths):
+        """
+        Maps every existing file behind the declared paths to its digest. Paths without files map to None.
+        """
+        digests = {}
+        for path in paths:
+            files = resolve(self.root, path)
+            if not files:
+                digests[path] = None
+            for file in files:
+                digests[file] = self.digest(file)
+        return digests
+
+
+def fingerprint(stage, input_digests):
+    h = hashlib.sha1(json.dumps(stage.command).encode())
+    h.update(json.dumps(sorted(input_digests.items())).encode())
+    return h.hexdigest()
+
+
+def dependencies(stages):
+    """
+    Maps every stage name to the names of the stages that write its inputs.
+
+    Raises:
+        ValueError: If two stages write the same output, or the stages depend on each other in a cycle.
+    """
+    producers = {}
+    for stage in stages:
+        for output in stage.outputs:
+            key = table_stem(output)
+            if key in producers:
+                raise ValueError(f"'{output}' is written by both '{producers[key]}' and '{stage.name}'")
+            producers[key] = stage.name
+
+    deps = {}
+    for stage in stages:
+        deps[stage.name] = {producers[key] for path in stage.inputs
+                            for key in producers if fnmatch.fnmatch(key, table_stem(path))} - {stage.name}
+
+    # Kahn's algorithm, only to reject cycles
+    remaining = {name: set(d) for name, d in deps.items()}
+    while remaining:
+        free = [name for name, d in remaining.items() if not d]
+        if not free:
+            raise ValueError(f"The stages {', '.join(sorted(remaining))} depend on each other in a cycle")
+        for name in free:
+            del remaining[name]
+        for d in remaining.values():
+            d.difference_update(free)
+    return deps
+
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def run_pipeline(stages: list[Stage], root: str = '.', jobs: int | None = None, force: bool = False,
+                 dry_run: bool = False, state_file: str = STATE_FILE) -> dict:
+    """
+    Runs the stages whose fingerprint changed, and their downstream stages if their outputs changed.
+
+    Args:
+        stages (list[Stage]): The stages of the pipeline.
+        root (str, optional): The directory paths are relative to and commands run in. Defaults to '.'.
+        jobs (int, optional): The number of stages to run in parallel. Defaults to the number of CPUs.
+        force (bool, optional): Whether to run every stage. Defaults to False.
+        dry_run (bool, optional): Only report which stages would run. Defaults to False.
+        state_file (str, optional): The fingerprint file, relative to `root`. Defaults to STATE_FILE.
+
+    Returns:
+        dict: Maps every stage name to its outcome ('ran', 'up to date', 'stale', 'failed' or 'blocked').
+    """
+    by_name = {stage.name: stage for stage in stages}
+    deps = dependencies(stages)
+    state_path = os.path.join(root, state_file)
+    state = load_state(state_path)
+    hasher = Hasher(root)
+    outcomes = {}
+
+    def execute(stage, upstream_stale):
+        digests = hasher.digests(stage.inputs)
+        current = fingerprint(stage, digests)
+        recorded = state.get(stage.name, {})
+        outputs_intact = all(resolve(root, output) for output in stage.outputs) and \
+            hasher.digests(stage.outputs) == recorded.get('outputs')
+        if not force and not upstream_stale and recorded.get('fingerprint') == current and outputs_intact:
+            return UP_TO_DATE, None
+        if dry_run:
+            return STALE, None
+        print(f"[{stage.name}] {' '.join(stage.command)}\n", end="", flush=True)
+        result = subprocess.run(stage.command, cwd=root)
+        if result.returncode != 0:
+            return FAILED, None
+        return RAN, {'fingerprint': current, 'outputs': hasher.digests(stage.outputs)}
+
+    with ThreadPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        running = {}
+        while len(outcomes) < len(stages):
+            for name, stage in by_name.items():
+                if name in outcomes or name in running.values() or not deps[name] <= outcomes.keys():
+                    continue
+                upstream = [outcomes[d] for d in deps[name]]
+                if any(outcome in (FAILED, BLOCKED) for outcome in upstream):
+                    outcomes[name] = BLOCKED
+                    continue
+                # In a dry run, the outputs of stale stages would change, so everything downstream is stale too
+                running[pool.submit(execute, stage, STALE in upstream)] = name
+            if not running:
+                continue
+            completed, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in completed:
+                name = running.pop(future)
+                outcomes[name], record = future.result()
+                if record is not None:
+                    state[name] = record
+                    save_state(state_path, state)
+                print(f"[{name}] {outcomes[name]}\n", end="", flush=True)
+    return outcomes
+
+
+def main(stages: list[Stage], root: str, argv=None):
+    """
+    The command line of the pipeline.py scripts of the harnesses.
+
+    Returns:
+        int: 1 if a stage failed, else 0.
+    """
+    arg_parser = argparse.ArgumentParser(description="Refreshes the tables and figures that depend on changed data.")
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None, help="Number of stages run in parallel (default: all CPUs)")
+    arg_parser.add_argument('--force', action='store_true', help="Run every stage")
+    arg_parser.add_argument('-n', '--dry-run', action='store_true', help="Only show which stages would run")
+    args = arg_parser.parse_args(argv)
+    outcomes = run_pipeline(stages, root, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    return 1 if FAILED in outcomes.values() else 0
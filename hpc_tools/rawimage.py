@@ -0,0 +1,124 @@
+"""
+Raw 8-bit grayscale images, as read and written by the Sobel codes.
+
+A raw image is a file of width * height bytes in row-major order, without a header. Its dimensions are kept in a
+sidecar text file '<image>.dims' holding "width height" (columns, rows), which scripts/zebra-convert.py writes
+next to every image it generates and which the Sobel codes read instead of their hard-coded data_dims. Images
+are opened as np.memmap, so they never have to fit in memory.
+"""
+import os
+
+import numpy as np
+
+DIMS_SUFFIX = '.dims'
+
+
+def dims_path(path):
+    return path + DIMS_SUFFIX
+
+
+def write_dims(path, width, height):
+    """
+    Writes the sidecar with the dimensions of the raw image at `path`.
+    """
+    with open(dims_path(path), 'w') as f:
+        f.write(f"{width} {height}\n")
+
+
+def read_dims(path):
+    """
+    Reads the dimensions of the raw image at `path` from its sidecar.
+
+    Returns:
+        tuple[int, int]: The width (columns) and height (rows).
+
+    Raises:
+        FileNotFoundError: If the image has no sidecar.
+    """
+    with open(dims_path(path)) as f:
+        width, height = (int(value) for value in f.read().split()[:2])
+    return width, height
+
+
+def open_raw(path, width=None, height=None, mode='r'):
+    """
+    Memory-maps a raw image as a (height, width) uint8 array.
+
+    Args:
+        path (str): The raw image.
+        width (int, optional): The number of columns. Defaults to the sidecar.
+        height (int, optional): The number of rows. Defaults to the sidecar.
+        mode (str, optional): The np.memmap mode, 'r' or 'r+'. Defaults to 'r'.
+
+    Raises:
+        ValueError: If the file size does not match the dimensions.
+    """
+    if width is None or height is None:
+        width, height = read_dims(path)
+    size = os.path.getsize(path)
+    if size != width * height:
+        raise ValueError(f"'{path}' has {size} bytes, expected {width} x {height} = {width * height}")
+    return np.memmap(path, dtype=np.uint8, mode=mode, shape=(height, width))
+
+
+def create_raw(path, width, height):
+    """
+    Creates a raw image of the given dimensions (and its sidecar) and memory-maps it for writing.
+    """
+    image = np.memmap(path, dtype=np.uint8, mode='w+', shape=(height, width))
+    write_dims(path, width, height)
+    return image
+
+
+PYRAMID_SUFFIX = '.pyramid'
+PYRAMID_BAND_ROWS = 512
+
+
+def _downsample(src, dst, band_rows=PYRAMID_BAND_ROWS):
+    """
+    Writes the 2x2 block mean of `src` into `dst` (half the size, odd last row/column dropped), band by band.
+    """
+    height, width = dst.shape
+    for y0 in range(0, height, band_rows):
+        y1 = min(y0 + band_rows, height)
+        band = src[2 * y0:2 * y1, :2 * width].reshape(y1 - y0, 2, width, 2)
+        dst[y0:y1] = (band.sum(axis=(1, 3), dtype=np.uint16) + 2) // 4
+
+
+def pyramid(path, min_size=1024, width=None, height=None):
+    """
+    Returns the downsampled pyramid of a raw image: level 0 is the image, level k the 2^k x 2^k block mean, down
+    to the first level whose longer side is at most `min_size`.
+
+    The levels are cached as raw images in '<image>.pyramid/' and rebuilt when the image is newer. If the cache
+    cannot be written, strided views of the image are used instead.
+
+    Returns:
+        list[np.ndarray]: The levels, each memory-mapped.
+    """
+    levels = [open_raw(path, width, height)]
+    cache_dir = path + PYRAMID_SUFFIX
+    source_mtime = os.path.getmtime(path)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        cache_dir = None
+
+    while max(levels[-1].shape) > min_size:
+        prev = levels[-1]
+        height, width = prev.shape[0] // 2, prev.shape[1] // 2
+        if cache_dir is None:
+            levels.append(levels[0][::2 ** len(levels), ::2 ** len(levels)])
+            continue
+        level_path = os.path.join(cache_dir, f"level-{len(levels)}")
+        try:
+            if os.path.getmtime(level_path) >= source_mtime and read_dims(level_path) == (width, height):
+                levels.append(open_raw(level_path))
+                continue
+        except (OSError, ValueError):
+            pass
+        level = create_raw(level_path, width, height)
+        _downsample(prev, level)
+        level.flush()
+        levels.append(open_raw(level_path))
+    return levels
@@ -0,0 +1,318 @@
+"""
+NumPy/BLAS reference kernels of the dgemm, dgemv and sum harnesses: baseline series and correctness oracles.
+
+Every kernel computes what its C++ counterpart computes, on the problem sizes of that harness's benchmark.cpp, and
+writes its runtimes in the same format, so aggregator.py adds them to the MFLOP/s plots as extra series. They show
+how far the hand-written kernels are from what the Python stack gets for free:
+
+    - numpy (dgemm, dgemv): C += A B and y += A x with `@`, i.e. the BLAS library NumPy links against.
+    - numpy-blocked (dgemm): the tiling of dgemm-blocked.cpp with block size B. A and B are copied into B x B tiles
+      once (the copy optimization), then every step k multiplies the tiles (i, k) with the tiles (k, j) for all
+      (i, j) in one batched matmul, so the Python loop runs n / B times instead of (n / B)^3 times.
+    - numpy-direct, numpy-vector, numpy-indirect (sum, 32-bit floats): np.add.reduce over the values 0 .. N-1,
+      generated in a cache-sized buffer (direct) or read from an array (vector). NumPy cannot express the dependent
+      loads of the indirect sum, where each address is the value of the previous load, so numpy-indirect gathers
+      the array through a random permutation: the access pattern of the indirect sum, but with overlapping loads.
+
+The dgemm and dgemv results are checked against BLAS with the tolerance of benchmark.cpp (1e-5), the sums against
+the exact sum N (N - 1) / 2. `check` compares the results of the sum harness's own result files with it.
+
+BLAS uses as many threads as the C++ blas variant would, set OMP_NUM_THREADS (or OPENBLAS_NUM_THREADS, ...) to 1 for
+the serial comparison. From a harness directory,
+
+    OMP_NUM_THREADS=1 python ../hpc_tools/reference.py dgemm -R 5    # writes data/numpy.csv, data/numpy-blocked.csv
+    python ../hpc_tools/reference.py sum -R 5 --sizes 8388608 16777216
+    python ../hpc_tools/reference.py check data/direct.csv data/vector.csv data/indirect.csv
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import RunSource
+from hpc_tools.storage import table_files
+
+# --- Problem sizes of the benchmark.cpp files, the smallest one runs twice to "condition" BLAS ---
+DGEMM_SIZES = [64, 64, 128, 256, 512, 1024, 2048]
+DGEMM_BLOCK_SIZES = [2, 16, 32, 64]
+DGEMV_SIZES = [1024, 1024, 2048, 4096, 8192, 16384]
+SUM_SIZES = [1 << k for k in range(23, 29)]
+
+# --- Variants, also the names of their result files ---
+NUMPY = 'numpy'
+NUMPY_BLOCKED = 'numpy-blocked'
+SUM_VARIANTS = {'direct': 'numpy-direct', 'vector': 'numpy-vector', 'indirect': 'numpy-indirect'}
+VARIANTS = {'dgemm': [NUMPY, NUMPY_BLOCKED], 'dgemv': [NUMPY], 'sum': list(SUM_VARIANTS.values())}
+
+# The tolerance of check_accuracy() in benchmark.cpp
+EPS = 1e-5
+# Values of the direct sum generated per step, 64 KB of 32-bit floats
+DIRECT_CHUNK = 1 << 14
+# Indices of the indirect sum gathered per step
+GATHER_CHUNK = 1 << 20
+
+
+def fill(rng, shape):
+    """
+    Random values in [-3, 1), the distribution of fill() in benchmark.cpp.
+    """
+    return 2 * rng.uniform(-1.0, 1.0, shape) - 1
+
+
+def dgemm_basic(a, b, c):
+    """
+    C += A B with BLAS.
+    """
+    c += a @ b
+    return c
+
+
+def dgemm_blocked(a, b, c, block_size):
+    """
+    C += A B over B x B tiles, as square_dgemm_blocked() in dgemm-blocked.cpp.
+
+    Args:
+        a (np.ndarray): A, shape (n, n).
+        b (np.ndarray): B, shape (n, n).
+        c (np.ndarray): C, shape (n, n), updated in place.
+        block_size (int): The edge length of the tiles.
+
+    Raises:
+        ValueError: If the block size does not divide n.
+    """
+    n = a.shape[0]
+    if n % block_size:
+        raise ValueError(f"The block size {block_size} does not divide n = {n}")
+    blocks = n // block_size
+    # tiles[i, k] is the tile at block row i and block column k, contiguous in memory
+    shape = (blocks, block_size, blocks, block_size)
+    a_tiles = np.ascontiguousarray(a.reshape(shape).transpose(0, 2, 1, 3))
+    b_tiles = np.ascontiguousarray(b.reshape(shape).transpose(0, 2, 1, 3))
+    c_tiles = np.ascontiguousarray(c.reshape(shape).transpose(0, 2, 1, 3))
+    product = np.empty_like(c_tiles)
+    for k in range(blocks):
+        np.matmul(a_tiles[:, k, None], b_tiles[None, k], out=product)
+        c_tiles += product
+    c[...] = c_tiles.transpose(0, 2, 1, 3).reshape(n, n)
+    return c
+
+
+def dgemv(a, x, y):
+    """
+    y += A x with BLAS.
+    """
+    y += a @ x
+    return y
+
+
+def sum_direct(n):
+    """
+    Sums the values 0 .. n-1 without reading them from memory, as sum_direct.cpp. The values are generated in a
+    buffer that stays in the L1/L2 cache.
+    """
+    base = np.arange(DIRECT_CHUNK, dtype=np.float32)
+    values = np.empty(DIRECT_CHUNK, dtype=np.float32)
+    total = 0.0
+    for start in range(0, n, DIRECT_CHUNK):
+        count = min(DIRECT_CHUNK, n - start)
+        np.add(base[:count], np.float32(start), out=values[:count])
+        total += float(np.add.reduce(values[:count]))
+    return total
+
+
+def sum_vector(a):
+    """
+    Sums the array, as sum_vector.cpp.
+    """
+    return float(np.add.reduce(a))
+
+
+def sum_indirect(a, order):
+    """
+    Sums the array in the order of `order`, a permutation of its indices. Unlike sum_indirect.cpp, the loads are
+    independent of each other.
+    """
+    values = np.empty(min(GATHER_CHUNK, len(order)), dtype=a.dtype)
+    total = 0.0
+    for start in range(0, len(order), GATHER_CHUNK):
+        indices = order[start:start + GATHER_CHUNK]
+        np.take(a, indices, out=values[:len(indices)])
+        total += float(np.add.reduce(values[:len(indices)]))
+    return total
+
+
+def exact_sum(n):
+    """
+    The sum of 0 .. n-1, the `expected` column of the sum harness without its rounding to float.
+    """
+    return n * (n - 1) / 2
+
+
+def max_error(result, expected):
+    return float(np.max(np.abs(result - expected))) if result.size else 0.0
+
+
+def time_call(function, *args):
+    """
+    Calls `function` once, returning its result and runtime in seconds.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def run_dgemm(output_dir, sizes=DGEMM_SIZES, block_sizes=DGEMM_BLOCK_SIZES, repetitions=1, seed=None):
+    """
+    Times numpy and numpy-blocked over the problem sizes of mmul-harness-instructional/benchmark.cpp.
+
+    Every repetition starts from the original C. The result of numpy-blocked is checked against BLAS.
+
+    Returns:
+        list[str]: The paths of the result files, '<output_dir>/numpy.csv' and '<output_dir>/numpy-blocked.csv'.
+    """
+    rng = np.random.default_rng(seed)
+    paths = [os.path.join(output_dir, f'{NUMPY}.csv'), os.path.join(output_dir, f'{NUMPY_BLOCKED}.csv')]
+    with open(paths[0], 'w') as basic_file, open(paths[1], 'w') as blocked_file:
+        print("N,runtime", file=basic_file, flush=True)
+        print("N,runtime,block_size", file=blocked_file, flush=True)
+        for n in sizes:
+            print(f"Working on problem size N={n}", file=sys.stderr)
+            a, b, c = fill(rng, (n, n)), fill(rng, (n, n)), fill(rng, (n, n))
+            for _ in range(repetitions):
+                expected, t = time_call(dgemm_basic, a, b, c.copy())
+                print(f"{n},{t:.9f}", file=basic_file, flush=True)
+            for block_size in block_sizes:
+                for _ in range(repetitions):
+                    result, t = time_call(dgemm_blocked, a, b, c.copy(), block_size)
+                    print(f"{n},{t:.9f},{block_size}", file=blocked_file, flush=True)
+                error = max_error(result, expected)
+                if error > EPS:
+                    print(f" Error: numpy-blocked with B = {block_size} is not the same as BLAS, max error {error:g}",
+                          file=sys.stderr)
+    return paths
+
+
+def run_dgemv(output_dir, sizes=DGEMV_SIZES, repetitions=1, seed=None):
+    """
+    Times numpy over the problem sizes of vmmul-omp-harness-instructional/benchmark.cpp.
+
+    Returns:
+        list[str]: The path of the result file, '<output_dir>/numpy.csv'.
+    """
+    rng = np.random.default_rng(seed)
+    path = os.path.join(output_dir, f'{NUMPY}.csv')
+    with open(path, 'w') as f:
+        print("N,t", file=f, flush=True)
+        for n in sizes:
+            print(f"Working on problem size N={n}", file=sys.stderr)
+            a, x, y = fill(rng, (n, n)), fill(rng, n), fill(rng, n)
+            for _ in range(repetitions):
+                _, t = time_call(dgemv, a, x, y.copy())
+                print(f"{n},{t:.9f}", file=f, flush=True)
+    return [path]
+
+
+def run_sum(output_dir, sizes=SUM_SIZES, repetitions=1, seed=None):
+    """
+    Times numpy-direct, numpy-vector and numpy-indirect over the problem sizes of
+    sum_harness_instructional/benchmark.cpp. The result files have its columns N, runtime, expected and result;
+    `expected` is the exact sum. Results off by more than the rounding of a pairwise 32-bit sum are reported.
+
+    Returns:
+        list[str]: The paths of the result files, '<output_dir>/numpy-<variant>.csv' for every variant.
+    """
+    rng = np.random.default_rng(seed)
+    paths = {variant: os.path.join(output_dir, f'{name}.csv') for variant, name in SUM_VARIANTS.items()}
+    files = {variant: open(path, 'w') for variant, path in paths.items()}
+    try:
+        for f in files.values():
+            print("N,runtime,expected,result", file=f, flush=True)
+        for n in sizes:
+            print(f"Working on problem size N={n}", file=sys.stderr)
+            a = np.arange(n, dtype=np.float32)
+            order = np.arange(n, dtype=np.int32 if n <= np.iinfo(np.int32).max else np.int64)
+            rng.shuffle(order)
+            calls = {'direct': (sum_direct, n), 'vector': (sum_vector, a), 'indirect': (sum_indirect, a, order)}
+            expected = exact_sum(n)
+            for variant, (function, *args) in calls.items():
+                for _ in range(repetitions):
+                    result, t = time_call(function, *args)
+                    print(f"{n},{t:.9f},{expected:.1f},{result:.1f}", file=files[variant], flush=True)
+                if abs(result - expected) > expected * np.log2(n) * np.finfo(np.float32).eps:
+                    print(f" Error: {SUM_VARIANTS[variant]} returned {result:.1f}, expected {expected:.1f}",
+                          file=sys.stderr)
+            del a, order
+    finally:
+        for f in files.values():
+            f.close()
+    return list(paths.values())
+
+
+def sources(kernel, data='data'):
+    """
+    The result files of the reference variants of a kernel that exist in `data`, for hpc_tools.metrics.load_runs().
+    """
+    return [RunSource(variant, os.path.join(data, variant)) for variant in VARIANTS[kernel]
+            if table_files(os.path.join(data, variant))]
+
+
+def check_sum_results(path, rtol=1e-3):
+    """
+    Compares the `result` column of a sum result file with the exact sum of every N.
+
+    Returns:
+        list[tuple[int, float, float]]: N, the largest relative error over its rows and whether it exceeds `rtol`.
+    """
+    from hpc_tools.storage import read_table
+
+    df = read_table(path, columns=['N', 'result'])
+    exact = exact_sum(df['N'].astype('float64'))
+    error = ((df['result'] - exact).abs() / exact.where(exact != 0, 1.0)).groupby(df['N']).max()
+    return [(int(n), float(e), bool(e > rtol)) for n, e in error.items()]
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Times the NumPy/BLAS reference kernels of the harnesses.")
+    subparsers = arg_parser.add_subparsers(dest='command', required=True)
+    for kernel, sizes in (('dgemm', DGEMM_SIZES), ('dgemv', DGEMV_SIZES), ('sum', SUM_SIZES)):
+        run = subparsers.add_parser(kernel, help=f"Time the {kernel} references ({', '.join(VARIANTS[kernel])})")
+        run.add_argument('--output-dir', default='data', help="The directory of the result files (default: %(default)s)")
+        run.add_argument('-R', '--repetitions', type=int, default=1,
+                         help="Timed repetitions per problem size (default: %(default)s)")
+        run.add_argument('--sizes', type=int, nargs='+', default=sizes,
+                         help="The problem sizes (default: those of benchmark.cpp, %(default)s)")
+        run.add_argument('--seed', type=int, help="The seed of the random inputs (default: random)")
+        if kernel == 'dgemm':
+            run.add_argument('--block-sizes', type=int, nargs='+', default=DGEMM_BLOCK_SIZES,
+                             help="The block sizes of numpy-blocked (default: %(default)s)")
+    check = subparsers.add_parser('check', help="Compare the results of sum result files with the exact sums")
+    check.add_argument('tables', nargs='+', help="Result files of the sum harness, e.g. data/direct.csv")
+    check.add_argument('--rtol', type=float, default=1e-3, help="The tolerated relative error (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+
+    if args.command == 'check':
+        failed = False
+        for path in args.tables:
+            for n, error, mismatch in check_sum_results(path, args.rtol):
+                print(f"{path}: N={n} relative error {error:.3g}{' MISMATCH' if mismatch else ''}")
+                failed |= mismatch
+        return 1 if failed else 0
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    repetitions = max(1, args.repetitions)
+    if args.command == 'dgemm':
+        paths = run_dgemm(args.output_dir, args.sizes, args.block_sizes, repetitions, args.seed)
+    elif args.command == 'dgemv':
+        paths = run_dgemv(args.output_dir, args.sizes, repetitions, args.seed)
+    else:
+        paths = run_sum(args.output_dir, args.sizes, repetitions, args.seed)
+    print(f"Saved runtimes to {', '.join(paths)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Performance regression detection against stored baseline runs.
+
+The baseline is a long-form run table (see hpc_tools.metrics.load_runs()) that keeps every trial of every
+configuration (kernel, variant, N, threads, B). A new run is compared with it configuration by configuration:
+
+    - The change is the relative difference of the median MFLOP/s, computed with hpc_tools.metrics, so it uses
+      the same flop counts as the aggregators.
+    - The change is significant if the bootstrap confidence interval of the ratio of the median runtimes excludes
+      1. Warm-up trials are dropped first (see hpc_tools.stats).
+
+A configuration is a regression (or an improvement) if its MFLOP/s dropped (or rose) by more than the threshold
+and the change is significant. Configurations with fewer than `min_samples` trials on either side cannot be
+tested and are reported as 'insufficient samples', whatever their change; run the benchmarks with `-R 5` or more.
+
+Usage, from the repository root:
+
+    # Record the runs of the current build as the baseline
+    python -m hpc_tools.regression update --baseline data/baseline --kernel dgemm \\
+        --source basic=mmul-harness-instructional/data/basic --source blas=mmul-harness-instructional/data/blas
+    # After a compiler or library change: exits with 1 if a configuration is slower by more than 5 %
+    python -m hpc_tools.regression check --baseline data/baseline --kernel dgemm \\
+        --source basic=mmul-harness-instructional/data/basic --source blas=mmul-harness-instructional/data/blas
+
+Sources are given as variant=path, or variant@threads=path for parallel runs. Runs that are not written by a
+benchmark binary (e.g. the Sobel timings) can be passed as a long-form run table with --runs.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import CONFIG_KEYS, MFLOPS, RUNTIME, SPEEDUP, TRIAL, RunSource, compute_metrics, load_runs
+from hpc_tools.stats import SAMPLES, bootstrap_medians, detect_warmup, padded_samples, percentile_interval, \
+    summarize_trials
+from hpc_tools.storage import read_table, table_files, write_table
+
+# --- Columns of the comparison report ---
+BASELINE = 'baseline '
+CHANGE = 'change'  # relative change of the median MFLOP/s
+RATIO_LOW = 'speed ratio CI low'
+RATIO_HIGH = 'speed ratio CI high'
+SIGNIFICANT = 'significant'
+TESTED = 'tested'
+STATUS = 'status'
+
+REGRESSION = 'regression'
+IMPROVEMENT = 'improvement'
+UNCHANGED = 'unchanged'
+NEW = 'new'
+INSUFFICIENT = 'insufficient samples'
+
+
+def load_baseline(path: str) -> pd.DataFrame:
+    """
+    Reads the baseline run table, or returns an empty one if there is none yet.
+    """
+    if not table_files(path):
+        return pd.DataFrame(columns=CONFIG_KEYS + [RUNTIME, TRIAL])
+    return read_table(path)
+
+
+def update_baseline(path: str, runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replaces the baseline trials of every configuration in `runs` with the trials in `runs`. Configurations
+    that are not in `runs` keep their baseline.
+
+    Returns:
+        pd.DataFrame: The new baseline run table.
+    """
+    baseline = load_baseline(path)
+    if len(baseline):
+        replaced = baseline.set_index(CONFIG_KEYS).index.isin(runs.set_index(CONFIG_KEYS).index)
+        baseline = baseline[~replaced]
+    updated = pd.concat([baseline, runs[CONFIG_KEYS + [RUNTIME, TRIAL]]], ignore_index=True)
+    write_table(updated, path)
+    return updated
+
+
+def speed_ratio_ci(baseline: pd.DataFrame, runs: pd.DataFrame, confidence: float = 0.95, n_boot: int = 1000,
+                   seed: int = 0) -> pd.DataFrame:
+    """
+    Computes the bootstrap confidence interval of the speed ratio (baseline median runtime / new median runtime)
+    of every configuration in both tables, after dropping warm-up trials.
+
+    Returns:
+        pd.DataFrame: One row per configuration with the interval bounds and the smaller number of samples.
+    """
+    frames = []
+    # Independent random streams, so that equally shaped sides do not draw the same resample indices
+    for runs_, stream in zip((baseline, runs), np.random.SeedSequence(seed).spawn(2)):
+        kept = runs_[~detect_warmup(runs_)]
+        configs, padded, counts = padded_samples(kept)
+        frames.append((configs, bootstrap_medians(padded, counts, n_boot, stream), counts))
+
+    (base_configs, base_medians, base_counts), (new_configs, new_medians, new_counts) = frames
+    base_configs['_base'] = np.arange(len(base_configs))
+    new_configs['_new'] = np.arange(len(new_configs))
+    both = base_configs.merge(new_configs, on=CONFIG_KEYS)
+    base_rows, new_rows = both.pop('_base').to_numpy(), both.pop('_new').to_numpy()
+
+    # The resamples of both sides are independent, so their ratio samples the distribution of the ratio
+    with np.errstate(all='ignore'):
+        ratios = base_medians[base_rows] / new_medians[new_rows]
+    both[RATIO_LOW], both[RATIO_HIGH] = percentile_interval(ratios, confidence)
+    both[SAMPLES] = np.minimum(base_counts[base_rows], new_counts[new_rows])
+    return both
+
+
+def compare(baseline: pd.DataFrame, runs: pd.DataFrame, threshold: float = 0.05, confidence: float = 0.95,
+            min_samples: int = 3, n_boot: int = 1000) -> pd.DataFrame:
+    """
+    Compares new runs with the baseline, configuration by configuration.
+
+    Args:
+        baseline (pd.DataFrame): The baseline run table (one row per trial).
+        runs (pd.DataFrame): The new run table (one row per trial).
+        threshold (float, optional): The relative MFLOP/s change that counts as a regression or improvement.
+                                     Defaults to 0.05.
+        confidence (float, optional): The confidence level of the significance test. Defaults to 0.95.
+        min_samples (int, optional): The number of trials both sides need for the significance test.
+                                     Defaults to 3.
+        n_boot (int, optional): The number of bootstrap resamples. Defaults to 1000.
+
+    Returns:
+        pd.DataFrame: One row per configuration of `runs` with the new and baseline MFLOP/s and speedup, the
+                      relative change, the speed ratio interval, whether the change was tested and significant,
+                      and its status ('regression', 'improvement', 'unchanged', 'new' or 'insufficient samples').
+    """
+    new = compute_metrics(summarize_trials(runs, n_boot=n_boot, confidence=confidence))
+    report = new[CONFIG_KEYS + [MFLOPS, SPEEDUP]]
+    if len(baseline):
+        old = compute_metrics(summarize_trials(baseline, n_boot=n_boot, confidence=confidence))
+        old = old[CONFIG_KEYS + [MFLOPS, SPEEDUP]].rename(columns={MFLOPS: BASELINE + MFLOPS,
+                                                                   SPEEDUP: BASELINE + SPEEDUP})
+        report = report.merge(old, on=CONFIG_KEYS, how='left')
+        report = report.merge(speed_ratio_ci(baseline, runs, confidence, n_boot), on=CONFIG_KEYS, how='left')
+    else:
+        report = report.assign(**{BASELINE + MFLOPS: np.nan, BASELINE + SPEEDUP: np.nan, RATIO_LOW: np.nan,
+                                  RATIO_HIGH: np.nan, SAMPLES: np.nan})
+
+    report[CHANGE] = report[MFLOPS] / report[BASELINE + MFLOPS] - 1
+    report[TESTED] = report[SAMPLES] >= min_samples
+    report[SIGNIFICANT] = report[TESTED] & ((report[RATIO_LOW] > 1) | (report[RATIO_HIGH] < 1))
+    report[STATUS] = np.select(
+        [report[BASELINE + MFLOPS].isna(),
+         ~report[TESTED],
+         report[SIGNIFICANT] & (report[CHANGE] < -threshold),
+         report[SIGNIFICANT] & (report[CHANGE] > threshold)],
+        [NEW, INSUFFICIENT, REGRESSION, IMPROVEMENT], default=UNCHANGED)
+    return report
+
+
+def parse_source(text):
+    """
+    Parses a '--source variant[@threads]=path' argument.
+    """
+    spec, sep, path = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected variant[@threads]=path, got '{text}'")
+    variant, _, threads = spec.partition('@')
+    return RunSource(variant, path, threads=int(threads) if threads else 1)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Detects performance regressions against stored baseline runs.")
+    arg_parser.add_argument('action', choices=['check', 'update'],
+                            help="check: compare the runs with the baseline, update: store them as the baseline")
+    arg_parser.add_argument('--baseline', required=True, help="The baseline run table (see hpc_tools.storage)")
+    arg_parser.add_argument('--kernel', help="The kernel of the --source files (e.g. dgemm)")
+    arg_parser.add_argument('--source', action='append', type=parse_source, default=[],
+                            help="A result file as variant=path or variant@threads=path (repeatable)")
+    arg_parser.add_argument('--runs', action='append', default=[], help="A long-form run table (repeatable)")
+    arg_parser.add_argument('--threshold', type=float, default=0.05,
+                            help="The relative MFLOP/s change that counts as a regression (default: 0.05)")
+    arg_parser.add_argument('--confidence', type=float, default=0.95, help="The confidence level (default: 0.95)")
+    arg_parser.add_argument('--min-samples', type=int, default=3,
+                            help="The trials both sides need for the significance test (default: 3)")
+    arg_parser.add_argument('--report', help="Also write the comparison as a table")
+    args = arg_parser.parse_args(argv)
+
+    if args.source and not args.kernel:
+        arg_parser.error("--source requires --kernel")
+    frames = [read_table(path) for path in args.runs]
+    if args.source:
+        frames.append(load_runs(args.kernel, args.source))
+    if not frames:
+        arg_parser.error("no runs given, use --source or --runs")
+    runs = pd.concat(frames, ignore_index=True)
+
+    if args.action == 'update':
+        baseline = update_baseline(args.baseline, runs)
+        print(f"Stored {len(runs)} trial(s) in the baseline '{args.baseline}' ({len(baseline)} in total)")
+        return 0
+
+    report = compare(load_baseline(args.baseline), runs, args.threshold, args.confidence, args.min_samples)
+    if args.report:
+        write_table(report, args.report)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(report[CONFIG_KEYS + [BASELINE + MFLOPS, MFLOPS, CHANGE, TESTED, STATUS]].to_string(index=False))
+    counts = report[STATUS].value_counts()
+    print(', '.join(f"{counts.get(status, 0)} {status}"
+                    for status in (REGRESSION, IMPROVEMENT, UNCHANGED, NEW, INSUFFICIENT)))
+    if counts.get(INSUFFICIENT, 0):
+        print(f"Configurations with fewer than {args.min_samples} trials on either side were not compared, run the "
+              f"benchmarks with -R {max(args.min_samples, 5)} or more", file=sys.stderr)
+    return 1 if counts.get(REGRESSION, 0) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Roofline model analysis.
+
+Every run becomes one point per memory level: its operational intensity (flops per byte moved at that level)
+and its achieved performance. A run is bound by a level if its intensity at that level lies left of the ridge
+point, where the level's bandwidth ceiling meets the compute ceiling.
+
+Two sources of runs are supported:
+    - The merged LIKWID table of likwid-parser.py, where flops come from the 'DP [MFLOP/s]' counter metric
+      (or the kernel's declared flop count) and traffic from the L2 and L3 access counters.
+    - The long-form metrics table of hpc_tools.metrics, where flops and DRAM traffic are the declared counts.
+
+The compute ceiling and the DRAM ceiling are the measured peaks of the machine profile (see hpc_tools.machine);
+the nominal peaks of a Perlmutter CPU node below are used for the cache levels and where there is no profile.
+"""
+import numpy as np
+import pandas as pd
+
+from hpc_tools import machine
+from hpc_tools.metrics import BLOCK_SIZE, KERNELS, N, RUNTIME, THREADS, VARIANT, PEAK_BANDWIDTH
+
+# --- Peaks of one Perlmutter CPU node (2x AMD EPYC 7763) ---
+# 128 cores * 2.45 GHz * 16 DP flops/cycle (2 AVX2 FMA units)
+PEAK_FLOPS = 128 * 2.45e9 * 16
+# Nominal bandwidths: L2 and L3 deliver 32 bytes/cycle per core, DRAM is 8 channels DDR4-3200 per socket
+MEMORY_CEILINGS = {
+    'L2': 128 * 2.45e9 * 32,
+    'L3': 128 * 2.45e9 * 32 / 2,
+    'DRAM': PEAK_BANDWIDTH,
+}
+CACHE_LINE = 64  # bytes moved per cache access
+
+
+def machine_ceilings(peak_flops=None, ceilings=None):
+    """
+    Returns the compute ceiling and the memory ceilings, from the machine profile unless given.
+
+    Returns:
+        tuple[float, dict]: The peak flops/s, and the bandwidth in bytes/s per memory level.
+    """
+    if peak_flops is None:
+        peak_flops = machine.peak(machine.PEAK_FLOPS, PEAK_FLOPS)
+    if ceilings is None:
+        ceilings = dict(MEMORY_CEILINGS, DRAM=machine.peak(machine.PEAK_BANDWIDTH, PEAK_BANDWIDTH))
+    return peak_flops, ceilings
+
+# --- Columns of the roofline point table ---
+LEVEL = 'level'
+INTENSITY = 'intensity'  # flops / byte
+GFLOPS = 'GFLOP/s'
+ATTAINABLE = 'attainable GFLOP/s'
+BOUND = 'bound'
+POINT_KEYS = [VARIANT, N, THREADS, BLOCK_SIZE]
+
+# Columns of the merged LIKWID table
+LIKWID_COLUMNS = {
+    'Benchmark': VARIANT,
+    'Problem Size': N,
+    'Number of threads': THREADS,
+    'Number of blocks': BLOCK_SIZE,
+    'Runtime (RDTSC)': RUNTIME,
+}
+LIKWID_TRAFFIC = {'L2': 'L2 accesses', 'L3': 'L3_ACCESS_ALL_TYPES'}
+LIKWID_DP_MFLOPS = 'DP MFLOP/s'
+
+
+def points_from_likwid(merged: pd.DataFrame, kernel: str = 'dgemm') -> pd.DataFrame:
+    """
+    Computes the roofline points of the runs in the merged table of likwid-parser.py.
+
+    Traffic at L2 and L3 is the number of accesses times the cache line size. DRAM traffic is not counted
+    by the collected groups, so it is the kernel's declared byte count.
+
+    Args:
+        merged (pd.DataFrame): The merged wide table (data/likwid_merged).
+        kernel (str, optional): The kernel whose declared counts are used where counters are missing.
+                                Defaults to 'dgemm'.
+
+    Returns:
+        pd.DataFrame: One row per run and memory level, see roofline_points().
+    """
+    runs = merged.rename(columns=LIKWID_COLUMNS)
+    declared = KERNELS[kernel]
+    n = runs[N].astype('float64')
+    flops = declared.flops(n)
+    if LIKWID_DP_MFLOPS in runs.columns:
+        # The FLOPS_DP metric is summed over all threads, prefer it over the declared count where present
+        counted = runs[LIKWID_DP_MFLOPS].astype('float64') * 1e6 * runs[RUNTIME]
+        flops = counted.where(counted > 0, flops)
+
+    traffic = {level: runs[column].astype('float64') * CACHE_LINE
+               for level, column in LIKWID_TRAFFIC.items() if column in runs.columns}
+    traffic['DRAM'] = declared.bytes_moved(n)
+    return roofline_points(runs[POINT_KEYS], flops, runs[RUNTIME], traffic)
+
+
+def points_from_metrics(metrics: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes the DRAM roofline points of a long-form table of hpc_tools.metrics from the declared flop and
+    byte counts of each kernel.
+
+    Returns:
+        pd.DataFrame: One row per run, see roofline_points().
+    """
+    flops = pd.Series(np.nan, index=metrics.index)
+    traffic = pd.Series(np.nan, index=metrics.index)
+    for name, index in metrics.groupby('kernel').groups.items():
+        n = metrics.loc[index, N].astype('float64')
+        flops[index] = KERNELS[name].flops(n)
+        traffic[index] = KERNELS[name].bytes_moved(n)
+    return roofline_points(metrics[POINT_KEYS], flops, metrics[RUNTIME], {'DRAM': traffic})
+
+
+def roofline_points(keys: pd.DataFrame, flops: pd.Series, runtime: pd.Series, traffic: dict,
+                    peak_flops: float | None = None, ceilings: dict | None = None) -> pd.DataFrame:
+    """
+    Builds the long-form roofline point table.
+
+    Args:
+        keys (pd.DataFrame): The identifying columns of each run (variant, N, threads, B).
+        flops (pd.Series): The flops executed by each run.
+        runtime (pd.Series): The runtime of each run in seconds.
+        traffic (dict): Maps a memory level to the bytes each run moved at that level.
+        peak_flops (float, optional): The compute ceiling in flops/s. Defaults to the machine profile's peak.
+        ceilings (dict, optional): Maps a memory level to its bandwidth in bytes/s. Defaults to MEMORY_CEILINGS with
+                                   the machine profile's DRAM bandwidth (see machine_ceilings()).
+
+    Returns:
+        pd.DataFrame: The columns of `keys`, plus level, intensity, GFLOP/s, attainable GFLOP/s and
+                      bound ('memory' or 'compute').
+    """
+    peak_flops, ceilings = machine_ceilings(peak_flops, ceilings)
+    achieved = flops / runtime / 1e9
+    frames = []
+    for level, moved in traffic.items():
+        intensity = flops / moved.where(moved > 0)
+        attainable = np.minimum(peak_flops, intensity * ceilings[level]) / 1e9
+        frames.append(keys.assign(**{
+            LEVEL: level,
+            INTENSITY: intensity,
+            GFLOPS: achieved,
+            ATTAINABLE: attainable,
+            BOUND: np.where(intensity.isna(), None,
+                            np.where(intensity * ceilings[level] < peak_flops, 'memory', 'compute')),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def plot_roofline(points: pd.DataFrame, output_name: str, title: str,
+                  peak_flops: float | None = None, ceilings: dict | None = None):
+    """
+    Plots roofline points against the compute ceiling and one bandwidth ceiling per memory level.
+
+    Points are colored by memory level (matching their ceiling) and marked by variant.
+
+    Args:
+        points (pd.DataFrame): A table as returned by roofline_points().
+        output_name (str): The filename for the saved plot (e.g., 'roofline.pdf').
+        title (str): The title of the plot.
+        peak_flops (float, optional): The compute ceiling in flops/s. Defaults to the machine profile's peak.
+        ceilings (dict, optional): Maps a memory level to its bandwidth in bytes/s. Defaults to MEMORY_CEILINGS with
+                                   the machine profile's DRAM bandwidth (see machine_ceilings()).
+    """
+    from hpc_tools.figures import pyplot
+
+    plt = pyplot()
+    peak_flops, ceilings = machine_ceilings(peak_flops, ceilings)
+    markers = ['o', 'x', '^', 's', 'D', '*', 'P', 'H']
+    colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+    points = points.dropna(subset=[INTENSITY, GFLOPS])
+    levels = [level for level in ceilings if level in set(points[LEVEL])]
+
+    plt.figure()
+    plt.title(title)
+
+    lo = min(points[INTENSITY].min(), peak_flops / max(ceilings.values())) / 4
+    hi = max(points[INTENSITY].max(), peak_flops / min(ceilings.values())) * 4
+    x = np.geomspace(lo, hi, 256)
+    plt.plot(x, np.full_like(x, peak_flops / 1e9), color='k', linestyle='-', label=f"Peak DP: {peak_flops / 1e9:.0f} GFLOP/s")
+    for level_idx, level in enumerate(levels):
+        color = colors[level_idx % len(colors)]
+        roof = np.minimum(peak_flops, x * ceilings[level]) / 1e9
+        plt.plot(x, roof, color=color, linestyle='--', label=f"{level}: {ceilings[level] / 1e9:.1f} GB/s")
+
+        level_points = points[points[LEVEL] == level]
+        for variant_idx, (variant, group) in enumerate(level_points.groupby(VARIANT, sort=True)):
+            plt.scatter(group[INTENSITY], group[GFLOPS], color=color, marker=markers[variant_idx % len(markers)],
+                        label=f"{variant} ({level})")
+
+    plt.xscale("log")
+    plt.yscale("log")
+    plt.xlabel("Operational Intensity [FLOP/byte] (logarithmic)")
+    plt.ylabel("Performance [GFLOP/s] (logarithmic)")
+
+    plt.legend(loc="best", fontsize="x-small")
+    plt.grid(axis='both', which='both', alpha=0.3)
+
+    plt.savefig(output_name, dpi=300, format='pdf')
+    print(f"Saved plot to {output_name}")
@@ -0,0 +1,382 @@
+"""
+Strong- and weak-scaling analysis of the parallel variants.
+
+Works on the long-form run table of hpc_tools.metrics (kernel, variant, N, threads, B, runtime). A series is one
+kernel, variant and block size.
+
+Strong scaling: within a series, every N is scaled against its own single-threaded run:
+
+    - speedup S(p) = T(1) / T(p) and efficiency E(p) = S(p) / p,
+    - the Karp-Flatt metric e(p) = (1/S(p) - 1/p) / (1 - 1/p), the experimentally determined serial fraction.
+      If it grows with p, the parallel overhead grows, not the serial part.
+
+For every N, two models are fitted by least squares:
+
+    - Amdahl, 1/S = f + (1 - f)/p: the serial fraction f and the speedup limit 1/f.
+    - Amdahl with a linear parallel overhead, T(p) = t_s + t_p/p + c p, whose runtime is minimal at
+      p* = sqrt(t_p / c). This is the predicted optimal thread count. Without measurable overhead (c <= 0) the
+      runtime keeps falling and p* is infinite.
+
+The fits also report the largest measured thread count that still runs at `min_efficiency`, the count to ask
+for when cores cost allocation.
+
+Weak scaling: the problem grows with the thread count. Every single-threaded run of a series is the base of a
+weak-scaling series; at every thread count p it is paired with the run whose work per thread (the flops of
+hpc_tools.metrics over p) is closest to the work of the base run, within `max_work_ratio`. The harnesses sweep N
+and p independently, so these runs come out of the same grid, e.g. the dgemv runs at N and 2N on 1 and 4 threads.
+
+    - the scaled speedup S(p) = rate(p) / rate(1), with rate = flops / runtime. For exactly p times the work this is
+      p T(1) / T(p), and the weak efficiency S(p) / p = T(1) / T(p).
+    - Gustafson, S = p - a (p - 1), fitted to the scaled speedups: the serial fraction a of the scaled workload.
+      Gustafson's law describes scaled workloads, it is not fitted to the strong-scaling speedups.
+
+Usage, from a harness directory:
+
+    python -m hpc_tools.scaling --likwid data/flops_dp_data --output data/scaling --plot scaling.pdf
+    python -m hpc_tools.scaling --runs data/metrics --variants openmp-1,openmp-4,openmp-16,openmp-64 --as openmp \\
+        --weak-plot weak_scaling.pdf
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import BLOCK_SIZE, EFFICIENCY, KERNEL, KERNELS, N, RUNTIME, SPEEDUP, THREADS, VARIANT
+from hpc_tools.roofline import LIKWID_COLUMNS
+from hpc_tools.storage import read_table, write_table
+
+SERIES = [KERNEL, VARIANT, BLOCK_SIZE]
+
+# --- Columns of the scaling table ---
+SERIAL_RUNTIME = 'serial runtime'
+KARP_FLATT = 'Karp-Flatt'
+
+# --- Columns of the weak-scaling table ---
+BASE_N = 'base N'
+WORK_PER_THREAD = 'work per thread'  # relative to the work of the base run
+SCALED_SPEEDUP = 'scaled speedup'
+WEAK_EFFICIENCY = 'weak efficiency'
+
+# --- Columns of the model fits ---
+AMDAHL_FRACTION = 'serial fraction (Amdahl)'
+AMDAHL_LIMIT = 'speedup limit (Amdahl)'
+GUSTAFSON_FRACTION = 'serial fraction (Gustafson)'
+# t_s, t_p and c of the overhead model, in seconds
+SERIAL_TIME = 'serial time'
+PARALLEL_TIME = 'parallel time'
+OVERHEAD = 'overhead per thread'
+OPTIMAL_THREADS = 'optimal threads'
+PREDICTED_SPEEDUP = 'predicted speedup'
+BEST_THREADS = 'best measured threads'
+BEST_SPEEDUP = 'best measured speedup'
+EFFICIENT_THREADS = 'efficient threads'
+
+DEFAULT_MIN_EFFICIENCY = 0.5
+# Half a doubling: a weak-scaling run does between 0.71x and 1.41x the work per thread of its base run
+DEFAULT_MAX_WORK_RATIO = 2 ** 0.5
+
+
+def runs_from_likwid(table: pd.DataFrame, kernel: str = 'dgemm') -> pd.DataFrame:
+    """
+    Converts a table of likwid-parser.py into a long-form run table, with the RDTSC runtime.
+    """
+    runs = table.rename(columns=LIKWID_COLUMNS)[list(LIKWID_COLUMNS.values())]
+    return runs.assign(**{KERNEL: kernel})
+
+
+def scaling_table(runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes speedup, efficiency and the Karp-Flatt metric of every run against the single-threaded run of the same
+    series and N. Repeated runs are reduced to their median runtime first.
+
+    Returns:
+        pd.DataFrame: One row per (kernel, variant, B, N, threads) with the runtime, serial runtime, speedup,
+                      efficiency and Karp-Flatt columns. Series without a single-threaded run are dropped.
+    """
+    runs = runs.groupby(SERIES + [N, THREADS], dropna=False)[RUNTIME].median().reset_index()
+    serial = runs[runs[THREADS] == 1][SERIES + [N, RUNTIME]].rename(columns={RUNTIME: SERIAL_RUNTIME})
+    # merge() matches missing block sizes with each other, unlike join() on an index
+    table = runs.merge(serial, on=SERIES + [N], how='inner')
+
+    p = table[THREADS].astype(float)
+    table[SPEEDUP] = table[SERIAL_RUNTIME] / table[RUNTIME]
+    table[EFFICIENCY] = table[SPEEDUP] / p
+    table[KARP_FLATT] = ((1 / table[SPEEDUP] - 1 / p) / (1 - 1 / p)).where(p > 1)
+    return table.sort_values(SERIES + [N, THREADS], ignore_index=True)
+
+
+def fit_models(group: pd.DataFrame, min_efficiency: float = DEFAULT_MIN_EFFICIENCY) -> pd.Series:
+    """
+    Fits the Amdahl and overhead models to the strong-scaling runs of one series and N (see the module docstring).
+    """
+    p = group[THREADS].to_numpy(dtype=float)
+    speedup = group[SPEEDUP].to_numpy(dtype=float)
+    runtime = group[RUNTIME].to_numpy(dtype=float)
+    parallel = p > 1
+
+    fit = {}
+    # Amdahl: 1/S - 1/p = f (1 - 1/p), through the origin
+    x = 1 - 1 / p[parallel]
+    f = np.sum(x * (1 / speedup[parallel] - 1 / p[parallel])) / np.sum(x * x) if parallel.any() else np.nan
+    fit[AMDAHL_FRACTION] = np.clip(f, 0, 1)
+    fit[AMDAHL_LIMIT] = np.inf if fit[AMDAHL_FRACTION] == 0 else 1 / fit[AMDAHL_FRACTION]
+
+    # Overhead model T(p) = t_s + t_p/p + c p, needs three thread counts
+    t_s = t_p = c = np.nan
+    if len(p) >= 3:
+        (t_s, t_p, c), *_ = np.linalg.lstsq(np.column_stack([np.ones_like(p), 1 / p, p]), runtime, rcond=None)
+    fit[SERIAL_TIME], fit[PARALLEL_TIME], fit[OVERHEAD] = t_s, t_p, c
+    serial_runtime = group[SERIAL_RUNTIME].iloc[0]
+    if c > 0 and t_p > 0:
+        optimum = np.sqrt(t_p / c)
+        fit[OPTIMAL_THREADS] = max(1.0, optimum)
+        fit[PREDICTED_SPEEDUP] = serial_runtime / (t_s + t_p / fit[OPTIMAL_THREADS] + c * fit[OPTIMAL_THREADS])
+    else:
+        fit[OPTIMAL_THREADS] = np.inf if len(p) >= 3 else np.nan
+        fit[PREDICTED_SPEEDUP] = fit[AMDAHL_LIMIT]
+
+    best = np.argmax(speedup)
+    fit[BEST_THREADS] = int(p[best])
+    fit[BEST_SPEEDUP] = speedup[best]
+    efficient = p[group[EFFICIENCY].to_numpy() >= min_efficiency]
+    fit[EFFICIENT_THREADS] = int(efficient.max()) if len(efficient) else 1
+    return pd.Series(fit)
+
+
+def _fit_groups(table, keys, fit, int_columns):
+    fits = [fit(group).rename(key) for key, group in table.groupby(keys, dropna=False, sort=True)]
+    if not fits:
+        return pd.DataFrame(columns=keys)
+    fits = pd.DataFrame(fits)
+    fits.index = pd.MultiIndex.from_tuples(fits.index, names=keys)
+    return fits.astype({column: int for column in int_columns}).reset_index()
+
+
+def fit_table(scaling: pd.DataFrame, min_efficiency: float = DEFAULT_MIN_EFFICIENCY) -> pd.DataFrame:
+    """
+    Fits the models for every series and N of a scaling_table().
+    """
+    return _fit_groups(scaling, SERIES + [N], lambda group: fit_models(group, min_efficiency),
+                       [BEST_THREADS, EFFICIENT_THREADS])
+
+
+def weak_scaling_table(runs: pd.DataFrame, max_work_ratio: float = DEFAULT_MAX_WORK_RATIO) -> pd.DataFrame:
+    """
+    Pairs every single-threaded run with the runs of the same series that do about the same work per thread, and
+    computes their scaled speedup and weak efficiency (see the module docstring). Repeated runs are reduced to their
+    median runtime first.
+
+    Args:
+        runs (pd.DataFrame): A long-form run table.
+        max_work_ratio (float, optional): The largest factor between the work per thread of a run and the work of
+                                          its base run. Defaults to DEFAULT_MAX_WORK_RATIO.
+
+    Returns:
+        pd.DataFrame: One row per (kernel, variant, B, base N, threads) with the N and runtime of the paired run, the
+                      serial runtime of the base run, the relative work per thread, the scaled speedup and the weak
+                      efficiency. Base runs without a paired parallel run are dropped.
+    """
+    runs = runs.groupby(SERIES + [N, THREADS], dropna=False)[RUNTIME].median().reset_index()
+    work = pd.Series(np.nan, index=runs.index)
+    for name, index in runs.groupby(KERNEL).groups.items():
+        work[index] = KERNELS[name].flops(runs.loc[index, N].astype(float))
+    runs['_work'] = work
+
+    serial = runs[runs[THREADS] == 1][SERIES + [N, RUNTIME, '_work']].rename(
+        columns={N: BASE_N, RUNTIME: SERIAL_RUNTIME, '_work': '_base work'})
+    table = runs.merge(serial, on=SERIES, how='inner')
+    table[WORK_PER_THREAD] = table['_work'] / table[THREADS] / table['_base work']
+    distance = np.abs(np.log(table[WORK_PER_THREAD]))
+    table = table[distance <= np.log(max_work_ratio)].assign(_distance=distance)
+    # The closest run per thread count, the smaller N on ties
+    table = table.sort_values(SERIES + [BASE_N, THREADS, '_distance', N])
+    table = table.drop_duplicates(SERIES + [BASE_N, THREADS])
+
+    table[SCALED_SPEEDUP] = (table['_work'] / table[RUNTIME]) / (table['_base work'] / table[SERIAL_RUNTIME])
+    table[WEAK_EFFICIENCY] = table[SCALED_SPEEDUP] / table[THREADS]
+    parallel = table.groupby(SERIES + [BASE_N], dropna=False)[THREADS].transform('max') > 1
+    columns = SERIES + [BASE_N, THREADS, N, RUNTIME, SERIAL_RUNTIME, WORK_PER_THREAD, SCALED_SPEEDUP, WEAK_EFFICIENCY]
+    return table[parallel][columns].sort_values(SERIES + [BASE_N, THREADS], ignore_index=True)
+
+
+def fit_gustafson(group: pd.DataFrame, min_efficiency: float = DEFAULT_MIN_EFFICIENCY) -> pd.Series:
+    """
+    Fits Gustafson's law to the weak-scaling runs of one series and base N.
+    """
+    p = group[THREADS].to_numpy(dtype=float)
+    speedup = group[SCALED_SPEEDUP].to_numpy(dtype=float)
+    parallel = p > 1
+
+    fit = {}
+    # p - S = a (p - 1), through the origin
+    x = p[parallel] - 1
+    a = np.sum(x * (p[parallel] - speedup[parallel])) / np.sum(x * x) if parallel.any() else np.nan
+    fit[GUSTAFSON_FRACTION] = np.clip(a, 0, 1)
+    efficient = p[group[WEAK_EFFICIENCY].to_numpy() >= min_efficiency]
+    fit[EFFICIENT_THREADS] = int(efficient.max()) if len(efficient) else 1
+    return pd.Series(fit)
+
+
+def weak_fit_table(weak: pd.DataFrame, min_efficiency: float = DEFAULT_MIN_EFFICIENCY) -> pd.DataFrame:
+    """
+    Fits Gustafson's law for every series and base N of a weak_scaling_table().
+    """
+    return _fit_groups(weak, SERIES + [BASE_N], lambda group: fit_gustafson(group, min_efficiency),
+                       [EFFICIENT_THREADS])
+
+
+def series_label(key):
+    kernel, variant, block_size = key
+    return f"{variant}, B = {int(block_size)}" if pd.notna(block_size) else variant
+
+
+def plot_scaling(scaling: pd.DataFrame, output_name: str, title: str = ""):
+    """
+    Plots the speedup (with the overhead model fit and the ideal speedup), the efficiency and the Karp-Flatt metric
+    over the thread count, one row of plots per series and one line per N.
+    """
+    from hpc_tools.figures import MARKERS, STYLE, pyplot
+
+    plt = pyplot()
+
+    groups = list(scaling.groupby(SERIES, dropna=False, sort=True))
+    with plt.rc_context(STYLE):
+        fig, axes = plt.subplots(len(groups), 3, squeeze=False, figsize=(15, 4 * len(groups)))
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        for row, (key, series) in zip(axes, groups):
+            max_p = series[THREADS].max()
+            curve_p = np.geomspace(1, max_p, 50)
+            row[0].plot([1, max_p], [1, max_p], color='gray', linestyle=':', label="ideal")
+            for idx, (n, runs) in enumerate(series.groupby(N)):
+                color, marker = colors[idx % len(colors)], MARKERS[idx % len(MARKERS)]
+                row[0].plot(runs[THREADS], runs[SPEEDUP], color=color, marker=marker, linestyle='', label=f"N = {n}")
+                row[1].plot(runs[THREADS], runs[EFFICIENCY], color=color, marker=marker, label=f"N = {n}")
+                row[2].plot(runs[THREADS], runs[KARP_FLATT], color=color, marker=marker, label=f"N = {n}")
+
+                # The overhead model, with its optimal thread count if it lies in the measured range
+                fit = fit_models(runs)
+                if np.isfinite(fit[OVERHEAD]):
+                    model = runs[SERIAL_RUNTIME].iloc[0] / (fit[SERIAL_TIME] + fit[PARALLEL_TIME] / curve_p
+                                                            + fit[OVERHEAD] * curve_p)
+                    row[0].plot(curve_p, model, color=color, linestyle='--')
+                    if fit[OPTIMAL_THREADS] <= max_p:
+                        row[0].axvline(fit[OPTIMAL_THREADS], color=color, linestyle=':', alpha=0.5)
+
+            for ax, ylabel in zip(row, ["Speedup", "Parallel efficiency", "Karp-Flatt serial fraction"]):
+                ax.set_xscale("log", base=2)
+                ax.set_xlabel("Threads")
+                ax.set_ylabel(ylabel)
+                ax.set_title(series_label(key))
+            row[0].legend()
+        if title:
+            fig.suptitle(title)
+        fig.tight_layout()
+        fig.savefig(output_name)
+        plt.close(fig)
+    return output_name
+
+
+def plot_weak_scaling(weak: pd.DataFrame, output_name: str, title: str = ""):
+    """
+    Plots the scaled speedup (with the Gustafson fit and the ideal speedup) and the weak efficiency over the thread
+    count, one row of plots per series and one line per base N.
+    """
+    from hpc_tools.figures import MARKERS, STYLE, pyplot
+
+    plt = pyplot()
+
+    groups = list(weak.groupby(SERIES, dropna=False, sort=True))
+    with plt.rc_context(STYLE):
+        fig, axes = plt.subplots(max(1, len(groups)), 2, squeeze=False, figsize=(10, 4 * max(1, len(groups))))
+        colors = plt.rcParams['axes.prop_cycle'].by_key()['color']
+        for row, (key, series) in zip(axes, groups):
+            max_p = series[THREADS].max()
+            curve_p = np.geomspace(1, max_p, 50)
+            row[0].plot([1, max_p], [1, max_p], color='gray', linestyle=':', label="ideal")
+            for idx, (n, runs) in enumerate(series.groupby(BASE_N)):
+                color, marker = colors[idx % len(colors)], MARKERS[idx % len(MARKERS)]
+                row[0].plot(runs[THREADS], runs[SCALED_SPEEDUP], color=color, marker=marker, linestyle='',
+                            label=f"base N = {n}")
+                row[1].plot(runs[THREADS], runs[WEAK_EFFICIENCY], color=color, marker=marker, label=f"base N = {n}")
+                a = fit_gustafson(runs)[GUSTAFSON_FRACTION]
+                if np.isfinite(a):
+                    row[0].plot(curve_p, curve_p - a * (curve_p - 1), color=color, linestyle='--')
+
+            for ax, ylabel in zip(row, ["Scaled speedup", "Weak efficiency"]):
+                ax.set_xscale("log", base=2)
+                ax.set_xlabel("Threads")
+                ax.set_ylabel(ylabel)
+                ax.set_title(series_label(key))
+            row[0].legend()
+        if not groups:
+            axes[0][0].set_title("No weak-scaling runs")
+        if title:
+            fig.suptitle(title)
+        fig.tight_layout()
+        fig.savefig(output_name)
+        plt.close(fig)
+    return output_name
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Computes speedup, efficiency and Karp-Flatt metrics and fits "
+                                                     "scaling models.")
+    source = arg_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--runs', help="A long-form run or metrics table (see hpc_tools.metrics)")
+    source.add_argument('--likwid', help="A table of likwid-parser.py, e.g. data/flops_dp_data")
+    arg_parser.add_argument('--kernel', default='dgemm', help="The kernel of a --likwid table (default: dgemm)")
+    arg_parser.add_argument('--variants', help="Only analyze these variants, comma-separated")
+    arg_parser.add_argument('--as', dest='rename', help="Treat the selected variants as one series with this name, "
+                                                        "e.g. openmp-1,...,openmp-64 as openmp")
+    arg_parser.add_argument('--min-efficiency', type=float, default=DEFAULT_MIN_EFFICIENCY,
+                            help="The efficiency that still counts as efficient (default: %(default)s)")
+    arg_parser.add_argument('--max-work-ratio', type=float, default=DEFAULT_MAX_WORK_RATIO,
+                            help="The largest factor between the work per thread of a weak-scaling run and its base "
+                                 "run (default: %(default).3f)")
+    arg_parser.add_argument('--output', default='data/scaling',
+                            help="The strong-scaling table, the fits are written to <output>_fits, the weak-scaling "
+                                 "table and fits to <output>_weak and <output>_weak_fits (default: %(default)s)")
+    arg_parser.add_argument('--plot', help="Also plot the strong scaling to this file")
+    arg_parser.add_argument('--weak-plot', help="Also plot the weak scaling to this file")
+    arg_parser.add_argument('--title', default="", help="The title of the strong-scaling plot")
+    arg_parser.add_argument('--weak-title', default="", help="The title of the weak-scaling plot")
+    args = arg_parser.parse_args(argv)
+
+    runs = read_table(args.runs) if args.runs else runs_from_likwid(read_table(args.likwid), args.kernel)
+    if args.variants:
+        runs = runs[runs[VARIANT].isin(args.variants.split(','))]
+    if args.rename:
+        runs = runs.assign(**{VARIANT: args.rename})
+
+    scaling = scaling_table(runs)
+    fits = fit_table(scaling, args.min_efficiency)
+    write_table(scaling, args.output)
+    write_table(fits, args.output + '_fits')
+    weak = weak_scaling_table(runs, args.max_work_ratio)
+    weak_fits = weak_fit_table(weak, args.min_efficiency)
+    write_table(weak, args.output + '_weak')
+    write_table(weak_fits, args.output + '_weak_fits')
+    with pd.option_context('display.max_rows', None, 'display.width', 200, 'display.float_format', '{:.3f}'.format):
+        print("Strong scaling:")
+        print(fits[[VARIANT, BLOCK_SIZE, N, AMDAHL_FRACTION, OPTIMAL_THREADS, PREDICTED_SPEEDUP, BEST_THREADS,
+                    EFFICIENT_THREADS]].to_string(index=False))
+        if len(weak_fits):
+            print("Weak scaling:")
+            print(weak_fits[[VARIANT, BLOCK_SIZE, BASE_N, GUSTAFSON_FRACTION, EFFICIENT_THREADS]].to_string(
+                index=False))
+        else:
+            print(f"No weak-scaling runs: no parallel run does the work per thread of a single-threaded run "
+                  f"(within --max-work-ratio {args.max_work_ratio:.3f})")
+    if args.plot:
+        print(f"Saved plot to {plot_scaling(scaling, args.plot, args.title)}")
+    if args.weak_plot:
+        print(f"Saved plot to {plot_weak_scaling(weak, args.weak_plot, args.weak_title)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+A vectorized NumPy reference of the Sobel filter of sobel-harness-instructional.
+
+It computes what sobel_cpu.cpp computes: the input bytes are scaled to [0, 1] floats, every interior pixel becomes
+sqrt(Gx^2 + Gy^2) with the same 3x3 weights, clamped to [0, 1], boundary pixels become 0, and the result is
+written back as bytes (truncated, as the C++ cast does). Instead of a per-pixel function, each weight is applied to
+a shifted slice of the whole band at once.
+
+Large images are processed in bands of rows by a thread pool (NumPy releases the GIL in its array operations).
+Each band reads one halo row above and below, so the input can be a memory-mapped raw image of any size
+(see hpc_tools.rawimage) and only a few bands are in memory at a time. It serves as a correctness oracle for the
+C++/CUDA variants and as a throughput baseline in pixels/s: --table writes the elapsed time and pixels/s of every
+repetition as a run table, which scripts/heatmap_plot_hw5.py --baseline reads to compare the CUDA configurations
+against it.
+
+Usage:
+    python -m hpc_tools.sobel data/zebra-gray-int8-4x data/processed-raw-int8-4x-numpy.dat [--threads T] \
+        [-R 5 --table data/sobel_numpy]
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from hpc_tools.metrics import RUNTIME, THREADS, TRIAL, VARIANT
+from hpc_tools.rawimage import create_raw, open_raw
+from hpc_tools.storage import read_table, write_table
+
+# The weights of sobel_cpu.cpp, indexed [row offset + 1][column offset + 1]
+GX = np.array([[1.0, 0.0, -1.0],
+               [2.0, 0.0, -2.0],
+               [1.0, 0.0, -1.0]], dtype=np.float32)
+GY = np.array([[1.0, 2.0, 1.0],
+               [0.0, 0.0, 0.0],
+               [-1.0, -2.0, -1.0]], dtype=np.float32)
+
+# As in sobel_cpu.cpp, bytes are scaled to floats in double precision. The way back is scaled in float32 (NumPy 2
+# keeps the float32 dtype when multiplying by a Python float), which truncates to the same bytes as the C++ double.
+ONE_OVER_255 = 0.003921568627451
+DEFAULT_BAND_ROWS = 256
+
+# --- Columns of the run table (besides the variant, threads, runtime in seconds and trial of hpc_tools.metrics) ---
+WIDTH = 'width'
+HEIGHT = 'height'
+PIXELS = 'pixels'
+PIXELS_PER_SECOND = 'pixels/s'
+REFERENCE_VARIANT = 'numpy'
+
+
+def correlate3x3(s, weights):
+    """
+    Returns the 3x3 correlation of `s` with `weights` at the interior pixels, shape (rows - 2, cols - 2).
+    """
+    rows, cols = s.shape
+    result = np.zeros((rows - 2, cols - 2), dtype=np.float32)
+    for dy in range(3):
+        for dx in range(3):
+            w = weights[dy, dx]
+            if w != 0:
+                result += w * s[dy:dy + rows - 2, dx:dx + cols - 2]
+    return result
+
+
+def sobel_floats(s):
+    """
+    Filters a float image in [0, 1]. The boundary pixels of the result are 0.
+
+    Args:
+        s (np.ndarray): The image, shape (rows, cols), float32.
+
+    Returns:
+        np.ndarray: The filtered image, clamped to [0, 1].
+    """
+    out = np.zeros(s.shape, dtype=np.float32)
+    if min(s.shape) < 3:
+        return out
+    a = correlate3x3(s, GX)
+    b = correlate3x3(s, GY)
+    out[1:-1, 1:-1] = np.clip(np.sqrt(a * a + b * b), 0.0, 1.0)
+    return out
+
+
+def sobel_band(src, dst, y0, y1):
+    """
+    Filters the rows [y0, y1) of the byte image `src` into `dst`, reading one halo row on each side.
+    """
+    rows = src.shape[0]
+    h0, h1 = max(y0 - 1, 0), min(y1 + 1, rows)
+    s = (src[h0:h1] * ONE_OVER_255).astype(np.float32)
+    filtered = sobel_floats(s)
+    # The first and last image rows have no halo, sobel_floats() leaves them 0
+    band = filtered[y0 - h0:y0 - h0 + (y1 - y0)]
+    dst[y0:y1] = (band * 255.0).astype(np.uint8)
+
+
+def sobel(src, dst=None, band_rows=DEFAULT_BAND_ROWS, threads=None):
+    """
+    Filters a byte image band by band in a thread pool.
+
+    Args:
+        src (np.ndarray): The image, shape (rows, cols), uint8 (may be an np.memmap).
+        dst (np.ndarray, optional): The output, same shape, uint8 (may be an np.memmap). Defaults to a new array.
+        band_rows (int, optional): The rows per band. Defaults to DEFAULT_BAND_ROWS.
+        threads (int, optional): The number of threads. Defaults to the number of CPUs.
+
+    Returns:
+        np.ndarray: `dst`.
+    """
+    if dst is None:
+        dst = np.empty(src.shape, dtype=np.uint8)
+    rows = src.shape[0]
+    bands = [(y0, min(y0 + band_rows, rows)) for y0 in range(0, rows, band_rows)]
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as pool:
+        for future in [pool.submit(sobel_band, src, dst, y0, y1) for y0, y1 in bands]:
+            future.result()
+    return dst
+
+
+def sobel_file(input_path, output_path, band_rows=DEFAULT_BAND_ROWS, threads=None, width=None, height=None):
+    """
+    Filters the raw image at `input_path` into a new raw image (with sidecar) at `output_path`.
+
+    Returns:
+        tuple[float, float]: The elapsed time of the filtering in seconds and the throughput in pixels/s.
+    """
+    src = open_raw(input_path, width, height)
+    dst = create_raw(output_path, src.shape[1], src.shape[0])
+    start = time.perf_counter()
+    sobel(src, dst, band_rows=band_rows, threads=threads)
+    dst.flush()
+    elapsed = time.perf_counter() - start
+    return elapsed, src.size / elapsed
+
+
+def read_baseline(path):
+    """
+    Reads a run table written with --table.
+
+    Returns:
+        tuple[float, int]: The median runtime in seconds and the number of pixels of the filtered image.
+    """
+    runs = read_table(path)
+    return statistics.median(runs[RUNTIME]), int(runs[PIXELS].iloc[0])
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Applies the reference Sobel filter to a raw 8-bit image.")
+    arg_parser.add_argument('input', help="The raw image, with a .dims sidecar unless --size is given")
+    arg_parser.add_argument('output', help="The filtered raw image")
+    arg_parser.add_argument('--size', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'), help="The image dimensions")
+    arg_parser.add_argument('--threads', type=int, default=None, help="Number of threads (default: all CPUs)")
+    arg_parser.add_argument('--band-rows', type=int, default=DEFAULT_BAND_ROWS,
+                            help="Rows per band (default: %(default)s)")
+    arg_parser.add_argument('-R', '--repetitions', type=int, default=1,
+                            help="Number of timed runs (default: %(default)s)")
+    arg_parser.add_argument('--table', help="Write the elapsed time and pixels/s of every run to this run table")
+    args = arg_parser.parse_args(argv)
+
+    width, height = args.size if args.size else (None, None)
+    height, width = open_raw(args.input, width, height).shape
+    rows = []
+    for trial in range(max(1, args.repetitions)):
+        elapsed, pixels_per_second = sobel_file(args.input, args.output, band_rows=args.band_rows,
+                                                threads=args.threads, width=width, height=height)
+        print(f" Elapsed time is : {elapsed} ")
+        print(f" Throughput is : {pixels_per_second:.4g} pixels/s ")
+        rows.append({VARIANT: REFERENCE_VARIANT, THREADS: args.threads or os.cpu_count(), WIDTH: width,
+                     HEIGHT: height, PIXELS: width * height, RUNTIME: elapsed, PIXELS_PER_SECOND: pixels_per_second,
+                     TRIAL: trial})
+    print(f" Wrote the output file {args.output} ")
+    if args.table:
+        print(f" Wrote the run table {write_table(pd.DataFrame(rows), args.table)} ")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Statistics over repeated trials of the same configuration.
+
+The benchmark binaries accept `-R repetitions` and print one row per repetition; hpc_tools.metrics.load_runs()
+numbers the rows of each configuration as trials. This module drops warm-up trials and reduces the remaining
+samples of every configuration to median, MAD and a bootstrap confidence interval of the median. All steps are
+vectorized across configurations, there is no Python loop over groups.
+"""
+import numpy as np
+import pandas as pd
+
+from hpc_tools.metrics import CI_HIGH, CI_LOW, CONFIG_KEYS, RUNTIME, TRIAL
+
+# Columns added by summarize_trials(), next to '<value> CI low' and '<value> CI high'
+MAD = ' MAD'
+SAMPLES = 'samples'
+WARMUP_SAMPLES = 'warm-up samples'
+
+MAD_SCALE = 1.4826  # scales the MAD to the standard deviation of normally distributed samples
+
+
+def detect_warmup(runs: pd.DataFrame, keys: list[str] = CONFIG_KEYS, value: str = RUNTIME,
+                  threshold: float = 3.0, rel_tol: float = 0.05) -> pd.Series:
+    """
+    Flags the warm-up trials of every configuration.
+
+    The steady state of a configuration is estimated from the second half of its trials. A trial is a warm-up
+    trial if it is in the first half, is slower than the steady-state median by more than `threshold` scaled
+    MADs (and at least `rel_tol` of the median), and all earlier trials are warm-up trials as well. A single
+    trial is never a warm-up trial. With two trials, as in the harnesses that run the smallest problem twice to
+    "condition" BLAS, the first one is dropped if it is more than `rel_tol` slower than the second.
+
+    Args:
+        runs (pd.DataFrame): A long-form run table with a trial column.
+        keys (list[str], optional): The columns identifying a configuration. Defaults to CONFIG_KEYS.
+        value (str, optional): The measured column. Defaults to runtime.
+        threshold (float, optional): The number of scaled MADs a warm-up trial is slower. Defaults to 3.0.
+        rel_tol (float, optional): The minimum relative slowdown of a warm-up trial. Defaults to 0.05.
+
+    Returns:
+        pd.Series: A boolean mask, aligned with `runs`, that is True for warm-up trials.
+    """
+    ordered = runs.sort_values(TRIAL, kind='stable')
+    by_config = _by(ordered, keys)
+    order = ordered.groupby(by_config, dropna=False, sort=False).cumcount()
+    count = ordered[value].groupby(by_config, dropna=False, sort=False).transform('size')
+    first_half = order < count // 2
+
+    steady = ordered[value].where(~first_half)
+    median = steady.groupby(by_config, dropna=False, sort=False).transform('median')
+    mad = (steady - median).abs().groupby(by_config, dropna=False, sort=False).transform('median')
+    margin = np.maximum(threshold * MAD_SCALE * mad, rel_tol * median)
+    slow = first_half & (ordered[value] > median + margin)
+
+    # Only a leading run of slow trials is warm-up, a slow trial after a fast one is noise
+    leading = slow.astype(int).groupby(by_config, dropna=False, sort=False).cumprod().astype(bool)
+    return leading.reindex(runs.index)
+
+
+def _by(df, keys):
+    return [df[k] for k in keys]
+
+
+def bootstrap_medians(samples: np.ndarray, counts: np.ndarray, n_boot: int = 1000,
+                      seed: int | np.random.SeedSequence = 0) -> np.ndarray:
+    """
+    Draws bootstrap resamples of many configurations at once and returns the median of each resample.
+
+    Args:
+        samples (np.ndarray): A (configurations x max samples) array, padded with NaN (see padded_samples()).
+        counts (np.ndarray): The number of valid samples per configuration.
+        n_boot (int, optional): The number of bootstrap resamples. Defaults to 1000.
+        seed (int | np.random.SeedSequence, optional): The seed of the random number generator. Defaults to 0.
+
+    Returns:
+        np.ndarray: A (configurations x n_boot) array of resample medians.
+    """
+    rng = np.random.default_rng(seed)
+    n_configs, width = samples.shape
+    # Draw sample indices uniformly within the valid samples of each configuration
+    draws = (rng.random((n_configs, n_boot, width)) * counts[:, None, None]).astype(np.intp)
+    resampled = samples[np.arange(n_configs)[:, None, None], draws]
+    # Resamples have as many samples as the configuration, not as the widest configuration
+    resampled = np.where(np.arange(width)[None, None, :] < counts[:, None, None], resampled, np.nan)
+    with np.errstate(all='ignore'):
+        return np.nanmedian(resampled, axis=2)
+
+
+def bootstrap_median_ci(samples: np.ndarray, counts: np.ndarray, n_boot: int = 1000, confidence: float = 0.95,
+                        seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Computes percentile bootstrap confidence intervals of the median for many configurations at once.
+
+    Args:
+        samples (np.ndarray): A (configurations x max samples) array, padded with NaN.
+        counts (np.ndarray): The number of valid samples per configuration.
+        n_boot (int, optional): The number of bootstrap resamples. Defaults to 1000.
+        confidence (float, optional): The confidence level. Defaults to 0.95.
+        seed (int, optional): The seed of the random number generator. Defaults to 0.
+
+    Returns:
+        tuple: The lower and upper bounds, one per configuration.
+    """
+    return percentile_interval(bootstrap_medians(samples, counts, n_boot, seed), confidence)
+
+
+def percentile_interval(resamples: np.ndarray, confidence: float = 0.95) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the central `confidence` interval of every row of a (configurations x resamples) array.
+    """
+    alpha = (1 - confidence) / 2
+    with np.errstate(all='ignore'):
+        return np.nanquantile(resamples, alpha, axis=1), np.nanquantile(resamples, 1 - alpha, axis=1)
+
+
+def padded_samples(runs: pd.DataFrame, keys: list[str] = CONFIG_KEYS,
+                   value: str = RUNTIME) -> tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+    """
+    Gathers the samples of every configuration into one 2D array for the vectorized bootstrap.
+
+    Returns:
+        tuple: The configurations (one row per configuration, in groupby order), the (configurations x max samples)
+               array padded with NaN, and the number of samples per configuration.
+    """
+    groups = runs.groupby(keys, dropna=False, sort=False)
+    position = groups.cumcount().to_numpy()
+    config = groups.ngroup().to_numpy()
+    padded = np.full((groups.ngroups, position.max() + 1 if len(runs) else 1), np.nan)
+    padded[config, position] = runs[value].to_numpy(dtype='float64')
+    counts = np.bincount(config, minlength=groups.ngroups)
+    # ngroup() numbers groups in the order of the groupby result
+    configs = groups.size().index.to_frame(index=False)
+    return configs, padded, counts
+
+
+def summarize_trials(runs: pd.DataFrame, keys: list[str] = CONFIG_KEYS, value: str = RUNTIME,
+                     drop_warmup: bool = True, n_boot: int = 1000, confidence: float = 0.95) -> pd.DataFrame:
+    """
+    Reduces the trials of every configuration to one row.
+
+    Args:
+        runs (pd.DataFrame): A long-form run table with a trial column (see hpc_tools.metrics.load_runs()).
+        keys (list[str], optional): The columns identifying a configuration. Defaults to CONFIG_KEYS.
+        value (str, optional): The measured column. Defaults to runtime.
+        drop_warmup (bool, optional): Whether to drop warm-up trials first (see detect_warmup()). Defaults to True.
+        n_boot (int, optional): The number of bootstrap resamples. Defaults to 1000.
+        confidence (float, optional): The confidence level of the interval. Defaults to 0.95.
+
+    Returns:
+        pd.DataFrame: One row per configuration with the median of `value` in `value`, plus '<value> MAD', the
+                      bounds '<value> CI low' and '<value> CI high' of the confidence interval, the number of
+                      samples and the number of dropped warm-up trials.
+    """
+    warmup = detect_warmup(runs, keys, value) if drop_warmup else pd.Series(False, index=runs.index)
+    kept = runs[~warmup]
+
+    groups = kept.groupby(keys, dropna=False, sort=False)
+    summary = groups[value].median().rename(value).to_frame()
+    deviation = (kept[value] - groups[value].transform('median')).abs()
+    summary[value + MAD] = deviation.groupby(_by(kept, keys), dropna=False, sort=False).median()
+    summary[SAMPLES] = groups[value].size()
+    summary[WARMUP_SAMPLES] = warmup.groupby(_by(runs, keys), dropna=False, sort=False).sum()
+
+    # padded_samples() orders configurations like the groupby result, which is the order of `summary`
+    _, padded, counts = padded_samples(kept, keys, value)
+    summary[value + CI_LOW], summary[value + CI_HIGH] = bootstrap_median_ci(padded, counts, n_boot, confidence)
+    return summary.reset_index()
@@ -0,0 +1,189 @@
+"""
+Typed, columnar storage for the tables passed between parser, aggregators and plotters.
+
+Tables are written as uncompressed Feather (Arrow IPC) files, which keep their column types (including the
+nullable Int64 columns of the LIKWID parser) and are read back memory-mapped instead of being re-parsed from
+text. CSV is an optional export next to the Feather file, e.g. for LaTeX tables or spreadsheets.
+
+Paths are given without extension (or with '.csv' / '.feather', which is ignored): `write_table(df, "data/mflops")`
+writes 'data/mflops.feather'. `read_table` prefers the Feather file and falls back to a CSV file of the same name,
+so the raw CSV output of the benchmark binaries can be read through the same function.
+
+pyarrow is an optional dependency. Without it, tables are written and read as CSV only.
+
+pandas and pyarrow are imported on first use, so that importing this module (e.g. for table_files() in the
+pipelines) stays cheap. preview_table() reads the first rows of a table without pandas, for quick queries.
+"""
+import csv
+import functools
+import itertools
+import os
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+FEATHER_SUFFIX = '.feather'
+CSV_SUFFIX = '.csv'
+
+# Set to '1' to also export every table written with write_table() as CSV.
+EXPORT_CSV_ENV = 'HPC_EXPORT_CSV'
+
+
+@functools.cache
+def _feather():
+    """
+    Returns the pyarrow.feather module, or None if pyarrow is not installed.
+    """
+    try:
+        import pyarrow.feather as feather
+    except ImportError:
+        return None
+    return feather
+
+
+def table_stem(path):
+    """
+    Strips a '.csv' or '.feather' extension from a table path.
+    """
+    stem, ext = os.path.splitext(path)
+    return stem if ext in (CSV_SUFFIX, FEATHER_SUFFIX) else path
+
+
+def table_files(path):
+    """
+    Returns the paths of the existing files that back a table, Feather first.
+    """
+    stem = table_stem(path)
+    return [p for p in (stem + FEATHER_SUFFIX, stem + CSV_SUFFIX) if os.path.exists(p)]
+
+
+def write_table(df: 'pd.DataFrame', path: str, export_csv: bool | None = None, index: bool = False) -> str:
+    """
+    Writes a DataFrame as a typed columnar table.
+
+    Args:
+        df (pd.DataFrame): The table to write.
+        path (str): The path of the table, with or without extension.
+        export_csv (bool, optional): Whether to additionally write a CSV file. Defaults to the
+                                     HPC_EXPORT_CSV environment variable, or always if pyarrow is missing.
+        index (bool, optional): Whether to store the index as a column (e.g. for pivoted tables). Defaults to False.
+
+    Returns:
+        str: The path of the primary file that was written.
+    """
+    stem = table_stem(path)
+    directory = os.path.dirname(stem)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if export_csv is None:
+        export_csv = os.environ.get(EXPORT_CSV_ENV, '0') == '1'
+
+    feather = _feather()
+    written = None
+    if feather is not None:
+        out = df.reset_index() if index else df.reset_index(drop=True)
+        # Feather requires string column names
+        out.columns = [str(col) for col in out.columns]
+        # Uncompressed, so the file can be memory-mapped without decompression. Written to a temporary file
+        # and renamed, so readers that still map the previous version keep seeing consistent data.
+        tmp_path = f"{stem}{FEATHER_SUFFIX}.tmp"
+        feather.write_feather(out, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, stem + FEATHER_SUFFIX)
+        written = stem + FEATHER_SUFFIX
+    if export_csv or feather is None:
+        df.to_csv(stem + CSV_SUFFIX, index=index)
+        written = written or stem + CSV_SUFFIX
+    return written
+
+
+def _csv_file(files):
+    """
+    Returns the CSV file among the files of a table, for reading it without pyarrow.
+
+    Raises:
+        ImportError: If the table only exists as Feather.
+    """
+    for file_path in files:
+        if file_path.endswith(CSV_SUFFIX):
+            return file_path
+    raise ImportError(f"pyarrow is required to read '{files[0]}' (no CSV export of the table exists)")
+
+
+def read_table(path: str, columns: list[str] | None = None, index_col: str | None = None) -> 'pd.DataFrame':
+    """
+    Reads a table written with write_table(), or a plain CSV file.
+
+    Feather files are memory-mapped, and only the requested columns are materialized.
+
+    Args:
+        path (str): The path of the table, with or without extension.
+        columns (list[str], optional): Only read these columns. Defaults to all columns.
+        index_col (str, optional): A column to use as the index of the returned DataFrame. Defaults to None.
+
+    Returns:
+        pd.DataFrame: The table, with the column types it was written with.
+
+    Raises:
+        ImportError: If the table only exists as Feather and pyarrow is not installed.
+    """
+    files = table_files(path)
+    if not files:
+        raise FileNotFoundError(f"No table found at '{table_stem(path)}' (.feather or .csv)")
+
+    import pandas as pd
+
+    feather = _feather()
+    if files[0].endswith(FEATHER_SUFFIX) and feather is not None:
+        table = feather.read_table(files[0], columns=columns, memory_map=True)
+        df = table.to_pandas(split_blocks=True)
+    else:
+        df = pd.read_csv(_csv_file(files), comment="#", usecols=columns)
+        df.columns = df.columns.str.strip()
+
+    if index_col is not None:
+        df = df.set_index(index_col)
+    return df
+
+
+def preview_table(path: str, columns: list[str] | None = None, limit: int | None = None) -> tuple[list, list]:
+    """
+    Reads the first rows of a table as plain Python values, without importing pandas.
+
+    Feather files are read with pyarrow (memory-mapped, only the requested rows are converted), CSV files with the
+    csv module, in which case all values are strings.
+
+    Args:
+        path (str): The path of the table, with or without extension.
+        columns (list[str], optional): Only read these columns. Defaults to all columns.
+        limit (int, optional): Read at most this many rows. Defaults to all rows.
+
+    Returns:
+        tuple: The column names and the rows, each a tuple of values.
+
+    Raises:
+        KeyError: If a requested column is not in the table.
+        ImportError: If the table only exists as Feather and pyarrow is not installed.
+    """
+    files = table_files(path)
+    if not files:
+        raise FileNotFoundError(f"No table found at '{table_stem(path)}' (.feather or .csv)")
+
+    feather = _feather() if files[0].endswith(FEATHER_SUFFIX) else None
+    if feather is not None:
+        table = feather.read_table(files[0], memory_map=True)
+        table = table.select(columns) if columns else table
+        if limit is not None:
+            table = table.slice(0, limit)
+        return table.column_names, list(zip(*(table.column(name).to_pylist() for name in table.column_names)))
+
+    csv_path = _csv_file(files)
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(line for line in f if not line.startswith('#'))
+        header = [name.strip() for name in next(reader, [])]
+        missing = set(columns or []) - set(header)
+        if missing:
+            raise KeyError(f"No column(s) {', '.join(sorted(missing))} in '{csv_path}'")
+        positions = [header.index(name) for name in columns] if columns else list(range(len(header)))
+        rows = [tuple(row[i].strip() for i in positions) for row in itertools.islice(reader, limit) if row]
+    return [header[i] for i in positions], rows
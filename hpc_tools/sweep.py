@@ -0,0 +1,375 @@
+"""
+Parameter sweeps over the benchmark binaries, run through a local process pool.
+
+A sweep is a declarative grid: a command template and a list of values per parameter. Every combination is
+one configuration, run as its own process. Each run is pinned to a disjoint set of cores with
+os.sched_setaffinity(), sized by its 'threads' parameter, so small configurations share a node without sharing
+cores. Results are appended to a JSON Lines store as runs complete; a sweep that is restarted with the same store
+skips the configurations that already finished successfully.
+
+Example, the BMMCO sweep of job-blocked-omp without editing a job script (run from the repository root):
+
+    python -m hpc_tools.sweep --store data/blocked-omp.jsonl --log data/blocked-omp_flops_dp.out \\
+        -p N=128,512,2048 -p B=4,16 -p threads=1,4,16,64 -- \\
+        likwid-perfctr -m -g FLOPS_DP -C {cores} ./benchmark-blocked-omp -N {N} -B {B}
+
+A grid can also be given as a JSON file: {"command": [...], "parameters": {"N": [...], ...}}.
+"""
+import argparse
+import itertools
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+if __package__ in (None, ''):
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.storage import write_table
+
+THREADS_PARAM = 'threads'
+
+# --- Fields of a store record ---
+PARAMS = 'params'
+CORES = 'cores'
+COMMAND = 'command'
+RETURNCODE = 'returncode'
+WALLTIME = 'walltime'
+ROWS = 'rows'
+STDOUT = 'stdout'
+STDERR = 'stderr'
+
+
+class Sweep:
+    """
+    A parameter grid over a command.
+
+    Args:
+        command (list[str]): The command template. Every argument is formatted with the parameters of a
+                             configuration, plus {cores} (the pinned cores, e.g. '0,1,2,3').
+        parameters (dict): Maps a parameter name to the list of its values. The parameter 'threads', if present,
+                           sets the number of cores each run is pinned to and OMP_NUM_THREADS.
+    """
+    def __init__(self, command, parameters):
+        self.command = list(command)
+        self.parameters = {name: list(values) for name, values in parameters.items()}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        command = spec['command']
+        return cls(shlex.split(command) if isinstance(command, str) else command, spec['parameters'])
+
+    def configurations(self):
+        """
+        Yields every configuration of the grid as a dict, the last parameter varying fastest.
+        """
+        names = list(self.parameters)
+        for values in itertools.product(*self.parameters.values()):
+            yield dict(zip(names, values))
+
+
+def config_key(params):
+    """
+    Returns the identity of a configuration in the store, independent of the parameter order.
+    """
+    return json.dumps(params, sort_keys=True)
+
+
+def parse_param(text):
+    """
+    Parses a '-p name=v1,v2,...' argument. Values are converted to int or float where possible.
+    """
+    name, sep, values = text.partition('=')
+    if not sep or not name:
+        raise argparse.ArgumentTypeError(f"expected name=value[,value...], got '{text}'")
+    return name, [_convert(value) for value in values.split(',')]
+
+
+def _convert(value):
+    for cast in (int, float):
+        try:
+            return cast(value)
+        except ValueError:
+            pass
+    return value
+
+
+def parse_csv_rows(stdout):
+    """
+    Extracts the CSV table that the benchmark binaries print (a header line followed by rows with the same
+    number of comma-separated fields). Other lines, such as descriptions or LIKWID tables, are ignored.
+
+    Returns:
+        list[dict]: One dict per CSV row.
+    """
+    header, rows = None, []
+    for line in stdout.splitlines():
+        fields = [field.strip() for field in line.split(',')]
+        if len(fields) < 2 or '|' in line:
+            continue
+        if header is None or len(fields) != len(header):
+            if all(not _is_number(field) for field in fields):
+                header = fields
+            continue
+        if all(_is_number(field) for field in fields):
+            rows.append({name: _convert(field) for name, field in zip(header, fields)})
+    return rows
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+
+def load_store(path):
+    """
+    Reads the records of a sweep store. A line truncated by an interrupted write is skipped.
+
+    Returns:
+        list[dict]: The records in completion order.
+    """
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def finished_keys(records):
+    """
+    Returns the keys of the configurations that have a successful run in the store.
+    """
+    return {config_key(record[PARAMS]) for record in records if record[RETURNCODE] == 0}
+
+
+def store_table(records):
+    """
+    Flattens store records into a long-form table with one row per CSV row printed by a run (or one row per run
+    if it printed none), with the configuration parameters as columns.
+    """
+    rows = []
+    for record in records:
+        base = {**record[PARAMS], RETURNCODE: record[RETURNCODE], WALLTIME: record[WALLTIME]}
+        for row in record[ROWS] or [{}]:
+            # Parameters win over printed columns of the same name (e.g. N), they are what was requested
+            rows.append({**row, **base})
+    return pd.DataFrame(rows)
+
+
+def run_config(command, cores, env):
+    """
+    Runs one configuration pinned to `cores`. Executed in a worker process of the pool; the child inherits the
+    worker's affinity.
+
+    Returns:
+        tuple: The return code, the wall time in seconds, stdout and stderr.
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    start = time.perf_counter()
+    result = subprocess.run(command, env=env, capture_output=True, text=True)
+    return result.returncode, time.perf_counter() - start, result.stdout, result.stderr
+
+
+def available_cores():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+class CoreAllocator:
+    """
+    Hands out disjoint, contiguous-as-possible sets of cores.
+    """
+    def __init__(self, cores):
+        self.free = list(cores)
+        self.total = len(self.free)
+
+    def acquire(self, count):
+        if count > len(self.free):
+            return None
+        cores, self.free = self.free[:count], self.free[count:]
+        return cores
+
+    def release(self, cores):
+        self.free = sorted(self.free + cores)
+
+
+def pending_configurations(sweep, records, total_cores, retry_failed=True):
+    """
+    Returns the configurations of a sweep that are not finished in the store records, in grid order.
+
+    Raises:
+        ValueError: If a configuration needs more cores than `total_cores`.
+    """
+    done = finished_keys(records) if retry_failed else {config_key(record[PARAMS]) for record in records}
+    pending = [params for params in sweep.configurations() if config_key(params) not in done]
+    skipped = sum(1 for _ in sweep.configurations()) - len(pending)
+    print(f"Skipping {skipped} finished configuration(s), running {len(pending)}")
+
+    for params in pending:
+        if int(params.get(THREADS_PARAM, 1)) > total_cores:
+            raise ValueError(f"Configuration {params} needs more than the {total_cores} available cores")
+    return pending
+
+
+def open_store(path):
+    """
+    Opens a store for appending records. A record truncated by an interrupted sweep is terminated, so it does not
+    swallow the next one.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    store_file = open(path, 'a')
+    if store_file.tell():
+        with open(path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                store_file.write('\n')
+    return store_file
+
+
+def append_record(store_file, record):
+    """
+    Appends a record as one line, flushed immediately so an interrupted sweep loses no finished run and the store
+    can be read while the sweep runs.
+    """
+    store_file.write(json.dumps(record) + '\n')
+    store_file.flush()
+
+
+def start_pending(pending, allocator, running, command, launch, max_running=None):
+    """
+    Starts every pending configuration that fits on the free cores, in grid order.
+
+    Args:
+        pending (list[dict]): The configurations not started yet, started ones are removed.
+        allocator (CoreAllocator): The free cores.
+        running (dict): Maps the handle of every running configuration to (params, cores, command), started ones
+                        are added.
+        command (list[str]): The command template, formatted with the parameters and {cores}.
+        launch (callable): Starts a configuration, called with the parameters, the pinned cores and the formatted
+                           command. Returns the handle of the run (e.g. a future or an asyncio task).
+        max_running (int, optional): The most configurations running at once. Defaults to no limit but the cores.
+    """
+    for params in list(pending):
+        if max_running is not None and len(running) >= max_running:
+            break
+        pinned = allocator.acquire(int(params.get(THREADS_PARAM, 1)))
+        if pinned is None:
+            continue
+        pending.remove(params)
+        formatted = [arg.format(**params, cores=','.join(map(str, pinned))) for arg in command]
+        running[launch(params, pinned, formatted)] = (params, pinned, formatted)
+
+
+def run_sweep(sweep: Sweep, store: str, log: str | None = None, cores: list[int] | None = None,
+              set_omp_threads: bool = True, retry_failed: bool = True) -> list[dict]:
+    """
+    Runs the configurations of a sweep that are not finished in `store`, appending one record per run.
+
+    Args:
+        sweep (Sweep): The grid to run.
+        store (str): The JSON Lines store. Finished configurations are skipped on resume.
+        log (str, optional): A text file the command line and stdout of every run are appended to, e.g. for
+                             likwid-parser.py. Defaults to None.
+        cores (list[int], optional): The cores to schedule on. Defaults to the affinity of this process.
+        set_omp_threads (bool, optional): Whether to set OMP_NUM_THREADS to the 'threads' parameter. Disable it for
+                                          likwid-perfctr, which sets it itself. Defaults to True.
+        retry_failed (bool, optional): Whether to rerun configurations whose stored run failed. Defaults to True.
+
+    Returns:
+        list[dict]: The records written by this call.
+    """
+    cores = available_cores() if cores is None else list(cores)
+    allocator = CoreAllocator(cores)
+    pending = pending_configurations(sweep, load_store(store), allocator.total, retry_failed)
+
+    written = []
+    with open_store(store) as store_file, ProcessPoolExecutor(max_workers=len(cores)) as pool:
+        def launch(params, pinned, command):
+            env = dict(os.environ)
+            if set_omp_threads and THREADS_PARAM in params:
+                env['OMP_NUM_THREADS'] = str(params[THREADS_PARAM])
+            return pool.submit(run_config, command, pinned, env)
+
+        log_file = open(log, 'a') if log else None
+        running = {}
+        try:
+            while pending or running:
+                start_pending(pending, allocator, running, sweep.command, launch)
+                completed, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    params, pinned, command = running.pop(future)
+                    allocator.release(pinned)
+                    returncode, walltime, stdout, stderr = future.result()
+                    record = {PARAMS: params, CORES: pinned, COMMAND: command, RETURNCODE: returncode,
+                              WALLTIME: walltime, ROWS: parse_csv_rows(stdout), STDOUT: stdout, STDERR: stderr}
+                    append_record(store_file, record)
+                    if log_file:
+                        log_file.write(shlex.join(command) + '\n' + stdout)
+                        log_file.flush()
+                    written.append(record)
+                    status = 'ok' if returncode == 0 else f'failed ({returncode})'
+                    print(f"{status}: {shlex.join(command)} [{walltime:.2f} s]")
+        finally:
+            if log_file:
+                log_file.close()
+    return written
+
+
+def parse_cores(text):
+    """
+    Parses a core list such as '0-3,8,10-11'.
+    """
+    cores = []
+    for part in text.split(','):
+        lo, _, hi = part.partition('-')
+        cores.extend(range(int(lo), int(hi or lo) + 1))
+    return cores
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Runs a parameter sweep over a benchmark binary.")
+    arg_parser.add_argument('command', nargs='*', help="The command template, e.g. ./benchmark-blocked-omp -N {N} -B {B}")
+    arg_parser.add_argument('-p', '--param', action='append', type=parse_param, default=[],
+                            help="A parameter and its values, e.g. -p N=128,512,2048 (repeatable)")
+    arg_parser.add_argument('--grid', help="A JSON file with 'command' and 'parameters', instead of -p and command")
+    arg_parser.add_argument('--store', required=True, help="The JSON Lines store results are appended to")
+    arg_parser.add_argument('--log', help="A text file the command line and stdout of every run are appended to")
+    arg_parser.add_argument('--table', help="Also write the store as a long-form table (see hpc_tools.storage)")
+    arg_parser.add_argument('--cores', help="The cores to schedule on, e.g. 0-63 or 0,2,4 (default: all available)")
+    arg_parser.add_argument('--no-omp-threads', action='store_true',
+                            help="Do not set OMP_NUM_THREADS (e.g. when running through likwid-perfctr)")
+    arg_parser.add_argument('--keep-failed', action='store_true', help="Do not rerun configurations that failed")
+    args = arg_parser.parse_args(argv)
+
+    if args.grid:
+        sweep = Sweep.from_file(args.grid)
+    elif args.command:
+        sweep = Sweep(args.command, dict(args.param))
+    else:
+        arg_parser.error("either a command or --grid is required")
+
+    records = run_sweep(sweep, args.store, log=args.log, cores=parse_cores(args.cores) if args.cores else None,
+                        set_omp_threads=not args.no_omp_threads, retry_failed=not args.keep_failed)
+    if args.table:
+        write_table(store_table(load_store(args.store)), args.table)
+    return 1 if any(record[RETURNCODE] != 0 for record in records) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,25 +1,46 @@
-import pandas as pd
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hpc_tools import reference
+from hpc_tools.metrics import BLOCK_SIZE, MFLOPS, VARIANT, RunSource, compute_metrics, load_runs, write_pivot
+from hpc_tools.stats import summarize_trials
+from hpc_tools.storage import write_table
 
 problems = ["basic", "blocked", "blas"]
-input_dfs = [pd.read_csv(f"data/{problem}.csv") for problem in problems]
 
-# Compare basic with blas
-basic_blas = pd.DataFrame()
-basic_blas["N"] = input_dfs[0]["N"]
 
-basic_blas["basic"] = 2 * input_dfs[0]["N"]**3 / input_dfs[0]["runtime"] / 10**6
-basic_blas["blas"] = 2 * input_dfs[2]["N"]**3 / input_dfs[2]["runtime"] / 10**6
+def block_label(col):
+    variant, block_size = col
+    if variant == "blocked":
+        return f"b = {int(block_size)}"
+    if variant == reference.NUMPY_BLOCKED:
+        return f"numpy b = {int(block_size)}"
+    return variant
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Aggregates the dgemm runs into metric tables.")
+    arg_parser.add_argument('--data', default="data",
+                            help="The directory of the result files and tables (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+    data = args.data
+
+    # The NumPy references (see hpc_tools/reference.py) are extra series, if they were run
+    sources = [RunSource(problem, os.path.join(data, problem)) for problem in problems]
+    runs = load_runs("dgemm", sources + reference.sources("dgemm", data))
+    # Median over the repetitions of each configuration, without warm-up trials
+    metrics = compute_metrics(summarize_trials(runs))
+    write_table(metrics, os.path.join(data, "metrics"))
+
+    # Compare basic with blas
+    write_pivot(metrics, MFLOPS, os.path.join(data, "mflops_basic"), ["basic", "blas", reference.NUMPY])
 
-basic_blas.to_csv("data/mflops_basic.csv", index=False)
+    # Compare blocked with blas
+    write_pivot(metrics, MFLOPS, os.path.join(data, "mflops_blocked"), ["blocked", "blas", reference.NUMPY_BLOCKED],
+                columns=[VARIANT, BLOCK_SIZE], labels=block_label)
 
-# Compare blocked with blas
-blocked_blas = pd.DataFrame()
-blocked_blas["N"] = input_dfs[0]["N"]
-vars = input_dfs[1].groupby("block_size")
-for key in vars.groups.keys():
-    group = vars.get_group(key)
-    values = (2 * group["N"]**3 / group["runtime"] / 10**6).reset_index(drop=True)
-    blocked_blas[f"b = {key}"] = values
 
-blocked_blas["blas"] = 2 * input_dfs[2]["N"]**3 / input_dfs[2]["runtime"] / 10**6
-blocked_blas.to_csv("data/mflops_blocked.csv", index=False)
+if __name__ == "__main__":
+    main()
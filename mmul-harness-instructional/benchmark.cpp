@@ -3,11 +3,17 @@
 // benchmark-* hardness for running different versions of matrix multiply
 //    over different problem sizes
 //
-// usage: no command line arguments
-// set problem sizes, block sizes in the code below
+// usage: [-N problem size] [-B block size] [-R repetitions]
+// set the default problem sizes, block sizes in the code below
+//
+// -N and -B run only the given problem size and block size instead of the defaults, as the benchmark of
+// mmul-omp-harness-instructional does (e.g. for hpc_tools/autotune.py).
+// -R sets the number of timed repetitions per problem (and block) size (default 1). Every
+// repetition prints its own row, so the analysis can drop warm-up samples and compute statistics.
 
 #include <cblas.h>
 #include <string.h>
+#include <unistd.h>
 
 #include <algorithm>
 #include <chrono>
@@ -47,6 +53,16 @@ bool check_accuracy(double* A, double* Anot, int nvalues) {
 
 /* The benchmarking program */
 int main(int argc, char** argv) {
+	int n_reps = 1;
+	int cmdline_N = -1;
+	int cmdline_B = -1;
+	int c;
+	while ((c = getopt(argc, argv, "N:B:R:")) != -1) {
+		if (c == 'N') cmdline_N = std::atoi(optarg);
+		if (c == 'B') cmdline_B = std::atoi(optarg);
+		if (c == 'R') n_reps = std::max(1, std::atoi(optarg));
+	}
+
 #ifndef BLOCKED
 	std::cout << "N,runtime" << std::endl;
 #else
@@ -62,6 +78,8 @@ int main(int argc, char** argv) {
 	// second problem size and beyond.
 	std::vector<int> test_sizes{64, 64, 128, 256, 512, 1024, 2048};
 	std::vector<int> block_sizes{2, 16, 32, 64};
+	if (cmdline_N > 0) test_sizes = {cmdline_N};
+	if (cmdline_B > 0) block_sizes = {cmdline_B};
 
 	int n_problems = test_sizes.size();
 
@@ -93,25 +111,30 @@ int main(int argc, char** argv) {
 			memcpy((void*) Bcopy, (const void*) B, sizeof(double) * n * n);
 			memcpy((void*) Ccopy, (const void*) C, sizeof(double) * n * n);
 
-			// insert timer code here
-			auto start_time = std::chrono::high_resolution_clock::now();
+			for (int rep = 0; rep < n_reps; rep++) {
+				// every repetition starts from the original C, so the result can still be verified
+				memcpy((void*) C, (const void*) Ccopy, sizeof(double) * n * n);
+
+				// insert timer code here
+				auto start_time = std::chrono::high_resolution_clock::now();
 
 #ifdef BLOCKED
-			square_dgemm_blocked(n, b, A, B, C);
+				square_dgemm_blocked(n, b, A, B, C);
 #else
-		square_dgemm(n, A, B, C);
+				square_dgemm(n, A, B, C);
 #endif
 
-			// insert timer code here
-			auto end_time = std::chrono::high_resolution_clock::now();
-			std::chrono::duration<double> elapsed = end_time - start_time;
+				// insert timer code here
+				auto end_time = std::chrono::high_resolution_clock::now();
+				std::chrono::duration<double> elapsed = end_time - start_time;
 
-			// Print result
+				// Print result
 #ifndef BLOCKED
-			std::cout << n << "," << elapsed.count() << std::endl;
+				std::cout << n << "," << elapsed.count() << std::endl;
 #else
-		std::cout << n << "," << elapsed.count() << "," << b << std::endl;
+				std::cout << n << "," << elapsed.count() << "," << b << std::endl;
 #endif
+			}
 
 			reference_dgemm(n, 1.0, Acopy, Bcopy, Ccopy);
 
@@ -0,0 +1,21 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from hpc_tools.pipeline import Stage, main
+from plot_data import figures
+
+problems = ["basic", "blocked", "blas"]
+tables = ["data/metrics"] + [f"data/mflops_{name}{band}" for name in ("basic", "blocked") for band in ("", "_low", "_high")]
+
+# Raw benchmark output (job scripts, ../hpc_tools/reference.py) -> aggregated tables -> one stage per figure
+stages = [
+    Stage("aggregate", [sys.executable, "aggregator.py"],
+          [f"data/{problem}.csv" for problem in problems] + ["data/numpy*.csv", "aggregator.py"], tables),
+]
+stages += [Stage(spec.output_name, [sys.executable, "plot_data.py", "--force", spec.output_name],
+                 spec.tables() + ["plot_data.py"], [spec.output_name]) for spec in figures]
+
+if __name__ == "__main__":
+    sys.exit(main(stages, HERE))
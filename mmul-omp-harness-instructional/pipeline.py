@@ -0,0 +1,35 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from hpc_tools.pipeline import Stage, main
+from cache_tables import normalized_tables, ratios_table
+from plot_data import BASIC_SPEEDUP, BLOCKED_SPEEDUP, BLOCK_SIZES, figures
+
+group_tables = ["data/flops_dp_data", "data/l2_cache_data", "data/l3_cache_data"]
+speedup_tables = [BASIC_SPEEDUP] + [BLOCKED_SPEEDUP.format(b) for b in BLOCK_SIZES]
+
+# Raw LIKWID output (job scripts) -> parsed group tables -> cache tables, roofline and speedup figures
+stages = [
+    Stage("parse", [sys.executable, "likwid-parser.py", "data/raw"], ["data/raw/*.out", "likwid-parser.py", "../hpc_tools/likwid.py"],
+          group_tables + ["data/likwid_merged"]),
+    Stage("cache tables", [sys.executable, "cache_tables.py"], ["data/likwid_merged", "cache_tables.py", "../hpc_tools/counters.py"],
+          [f"{prefix}_normalized" for prefix in normalized_tables] + [ratios_table]),
+    Stage("roofline", [sys.executable, "plot_roofline.py"], ["data/likwid_merged", "plot_roofline.py"],
+          ["data/roofline", "roofline.pdf"]),
+    Stage("scaling", [sys.executable, "../hpc_tools/scaling.py", "--likwid", "data/flops_dp_data",
+                      "--output", "data/scaling", "--plot", "scaling.pdf",
+                      "--title", "Strong scaling of OMP DGEMM variants (RDTSC runtime)",
+                      "--weak-plot", "weak_scaling.pdf",
+                      "--weak-title", "Weak scaling of OMP DGEMM variants (RDTSC runtime)"],
+          ["data/flops_dp_data", "../hpc_tools/scaling.py"],
+          ["data/scaling", "data/scaling_fits", "data/scaling_weak", "data/scaling_weak_fits", "scaling.pdf",
+           "weak_scaling.pdf"]),
+    # plot_data.py derives the speedup tables before rendering its figures
+    Stage("speedup figures", [sys.executable, "plot_data.py", "--force"], ["data/flops_dp_data", "plot_data.py"],
+          speedup_tables + [spec.output_name for spec in figures]),
+]
+
+if __name__ == "__main__":
+    sys.exit(main(stages, HERE))
@@ -0,0 +1,33 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hpc_tools.roofline import BOUND, LEVEL, plot_roofline, points_from_likwid
+from hpc_tools.storage import read_table, write_table
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Computes and plots the roofline points of the OMP DGEMM runs.")
+    arg_parser.add_argument('--input', default="data/likwid_merged",
+                            help="The merged FLOPS_DP, L2CACHE and L3CACHE table written by likwid-parser.py "
+                                 "(default: %(default)s)")
+    arg_parser.add_argument('--output', default="data/roofline", help="The roofline table (default: %(default)s)")
+    arg_parser.add_argument('--plot', default="roofline.pdf", help="The roofline plot (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+
+    points = points_from_likwid(read_table(args.input), kernel="dgemm")
+    write_table(points, args.output)
+
+    print("-= Bound per run (DRAM level) =-")
+    print(points[points[LEVEL] == "DRAM"].to_string(index=False))
+    print("-= Number of memory-bound runs per level =-")
+    print(points[points[BOUND] == "memory"].groupby(LEVEL).size())
+
+    plot_roofline(points,
+                  args.plot,
+                  "Roofline of OMP DGEMM variants:\nPerlmutter CPU Node, -O3, -march=native, 64-bit floats")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,58 +4,152 @@
 @author: wes
 Created: Thu Sep 30 05:51:28 PDT 2021
 
-Description: this code generates a 2D "heatmap" style plot using sample data that
-is hard-coded into the code.
+Description: this code generates 2D "heatmap" style plots of the ncu metrics collected by
+run-cp5-cuda-configs-gpu-perlmutter.sh, one heatmap per metric (gpu__time_duration,
+smsp__cycles_active, dram__throughput) over threads per block x number of blocks. The
+fastest configuration (smallest gpu__time_duration) is outlined in every heatmap. With --baseline,
+the run table of the NumPy reference filter (python -m hpc_tools.sobel ... --table) is the
+throughput baseline: its runtime is shown with the runtime heatmap, and the fastest configuration
+is reported in pixels/s and relative to it (both filter the same image).
 
-Inputs: none, all problem parameters are hard-coded.
+Inputs: one or more captured logs of the sweep script (ncu text or --csv output, e.g. the
+slurm-<jobid>.out of the batch job), parsed by hpc_tools.ncu. No GPU is needed.
 
-Outputs: a plot showing the heatmap, displayed to the screen
+Outputs: a figure with one heatmap per metric for every profiled kernel, saved to a file
+(--output) or displayed to the screen (--show)
 
-Dependencies: matplotlib, numpy
+Usage:
+    python scripts/heatmap_plot_hw5.py slurm-12345.out [--kernel sobel_kernel_gpu] [--output heatmap_hw5.pdf] \
+        [--baseline data/sobel_numpy]
 
-Assumptions: Developed and Tested with Python 3.8.8 on MacOS 11.6
+Dependencies: matplotlib, numpy, pandas
 '''
 
-import numpy as np
+import argparse
+import os
+import sys
+
 import matplotlib
-import matplotlib.pyplot as plt
-
-threads_per_block = ['32', '64', '128', '256', '512', '1024'] # y axis, 6 of them
-thread_blocks = ["1", "4", "16", "64", "256", "1024", "4096"] # x axis, 7 of them
-
-runtime = np.array([[0.8, 2.4, 2.5, 3.9, 0.0, 4.0, 0.0],
-                    [2.4, 0.0, 4.0, 1.0, 2.7, 0.0, 0.0],
-                    [1.1, 2.4, 0.8, 4.3, 1.9, 4.4, 0.0],
-                    [0.6, 0.0, 0.3, 0.0, 3.1, 0.0, 0.0],
-                    [0.7, 1.7, 0.6, 2.6, 2.2, 6.2, 0.0],
-                    [1.3, 1.2, 0.0, 0.0, 0.0, 3.2, 5.1]])
-
-
-fig, ax = plt.subplots()
-im = ax.imshow(runtime, cmap="coolwarm")
-
-# We want to show all ticks...
-ax.set_xticks(np.arange(len(thread_blocks)))
-ax.set_yticks(np.arange(len(threads_per_block)))
-# ... and label them with the respective list entries
-ax.set_xticklabels(thread_blocks)
-ax.set_yticklabels(threads_per_block)
-
-# Rotate the tick labels and set their alignment.
-plt.setp(ax.get_xticklabels(), rotation=45, ha="right",
-         rotation_mode="anchor")
-
-# Loop over data dimensions and create text annotations.
-for i in range(len(threads_per_block)): # y axis
-    for j in range(len(thread_blocks)): # x axis
-        text = ax.text(j, i, runtime[i, j],
-                       ha="center", va="center", color="k")
-
-ax.set_title("Runtime on <what platform> at Varying Block Size and Number of Blocks")
-ax.set_ylabel('Threads per block')
-ax.set_xlabel('Block Sizes')
-fig.colorbar(im, ax=ax)
-fig.tight_layout()
-plt.show()
-
-# EOF
+import numpy as np
+from matplotlib.artist import setp
+from matplotlib.patches import Rectangle
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from hpc_tools.ncu import SWEEP_METRICS, TIME, best_config, find_metric, iter_records, metric_grids
+from hpc_tools.sobel import read_baseline
+
+TITLES = {
+    TIME: "Runtime",
+    'smsp__cycles_active': "SM cycles active",
+    'dram__throughput': "DRAM throughput",
+}
+UNIT_LABELS = {'msecond': 'ms', '%': '% of peak'}
+
+
+def read_records(paths):
+    for path in paths:
+        with open(path, 'r', errors='replace') as f:
+            yield from iter_records(f)
+
+
+def plot_heatmap(ax, grid, title, best, note=None):
+    """
+    Draws one (N, B) grid, annotated with its values, and outlines the `best` (N, B) configuration. A `note` is
+    added below the title.
+    """
+    threads_per_block = [str(n) for n in grid.index]  # y axis
+    thread_blocks = [str(b) for b in grid.columns]  # x axis
+    values = grid.to_numpy(dtype=float)
+
+    im = ax.imshow(np.ma.masked_invalid(values), cmap="coolwarm")
+
+    # We want to show all ticks...
+    ax.set_xticks(np.arange(len(thread_blocks)))
+    ax.set_yticks(np.arange(len(threads_per_block)))
+    # ... and label them with the respective list entries
+    ax.set_xticklabels(thread_blocks)
+    ax.set_yticklabels(threads_per_block)
+
+    # Rotate the tick labels and set their alignment.
+    setp(ax.get_xticklabels(), rotation=45, ha="right", rotation_mode="anchor")
+
+    # Loop over data dimensions and create text annotations.
+    for i in range(len(threads_per_block)):  # y axis
+        for j in range(len(thread_blocks)):  # x axis
+            if not np.isnan(values[i, j]):
+                ax.text(j, i, f"{values[i, j]:.3g}", ha="center", va="center", color="k", fontsize=7)
+
+    # Outline the best configuration
+    if best is not None and best[0] in grid.index and best[1] in grid.columns:
+        i, j = grid.index.get_loc(best[0]), grid.columns.get_loc(best[1])
+        ax.add_patch(Rectangle((j - 0.5, i - 0.5), 1, 1, fill=False, edgecolor="k", linewidth=2.5))
+
+    unit = UNIT_LABELS.get(grid.attrs.get('unit'), grid.attrs.get('unit', ''))
+    title = f"{title} [{unit}]" if unit else title
+    ax.set_title(f"{title}\n{note}" if note else title)
+    ax.set_ylabel('Threads per block')
+    ax.set_xlabel('Number of blocks')
+    ax.figure.colorbar(im, ax=ax)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Plots heatmaps of the ncu metrics of a CUDA launch configuration sweep.")
+    parser.add_argument('logs', nargs='+', help="Captured output of run-cp5-cuda-configs-gpu-perlmutter.sh")
+    parser.add_argument('--kernel', help="Only plot this kernel (default: every profiled kernel)")
+    parser.add_argument('--output', default="heatmap_hw5.pdf",
+                        help="The saved figure (default: %(default)s), suffixed by the kernel if there are several")
+    parser.add_argument('--show', action='store_true', help="Display the figures instead of saving them")
+    parser.add_argument('--baseline', help="The run table of the NumPy reference filter of the same image "
+                                           "(python -m hpc_tools.sobel ... --table)")
+    args = parser.parse_args(argv)
+
+    if not args.show:
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    baseline_seconds, pixels = read_baseline(args.baseline) if args.baseline else (None, None)
+    grids = metric_grids(read_records(args.logs))
+    kernels = sorted({kernel for _, kernel in grids if args.kernel is None or kernel == args.kernel})
+    if not kernels:
+        print(f"No ncu metrics found in {', '.join(args.logs)}")
+        return 1
+
+    for kernel in kernels:
+        keys = [find_metric(grids, prefix, kernel) for prefix in SWEEP_METRICS]
+        keys = [(prefix, key) for prefix, key in zip(SWEEP_METRICS, keys) if key is not None]
+        if not keys:
+            continue
+        time_key = find_metric(grids, TIME, kernel)
+        best = best_config(grids[time_key]) if time_key else None
+        if best is not None:
+            print(f"{kernel}: fastest configuration is N={best[0]} threads per block, B={best[1]} blocks, "
+                  f"{grids[time_key].loc[best]:.4g} ms")
+            if baseline_seconds is not None:
+                best_seconds = grids[time_key].loc[best] / 1e3
+                print(f"{kernel}: {pixels / best_seconds:.4g} pixels/s, {baseline_seconds / best_seconds:.3g} x the "
+                      f"NumPy reference ({pixels / baseline_seconds:.4g} pixels/s)")
+
+        fig, axes = plt.subplots(1, len(keys), squeeze=False, figsize=(6.5 * len(keys), 5.5))
+        for ax, (prefix, key) in zip(axes[0], keys):
+            note = None
+            if prefix == TIME and baseline_seconds is not None:
+                note = f"NumPy reference: {baseline_seconds * 1e3:.3g} ms"
+            plot_heatmap(ax, grids[key], TITLES[prefix], best, note)
+        fig.suptitle(f"{kernel} at varying threads per block and number of blocks")
+        fig.tight_layout()
+
+        if args.show:
+            plt.show()
+        else:
+            output = args.output
+            if len(kernels) > 1:
+                stem, ext = os.path.splitext(args.output)
+                output = f"{stem}-{kernel}{ext}"
+            fig.savefig(output)
+            print(f"Saved plot to {output}")
+        plt.close(fig)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
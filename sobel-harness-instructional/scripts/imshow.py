@@ -3,32 +3,122 @@
 
 
 # args:
-# 1. name of raw data file to display (2D image, 8bit pixels)
-# 2. xsize of data file (# cols)
-# 3. ysize of data file (# rows)
+# 1. name(s) of raw data file(s) to display (2D image, 8bit pixels), side by side
+# 2. xsize of data file (# cols), optional if the file has a .dims sidecar
+# 3. ysize of data file (# rows), optional if the file has a .dims sidecar
 #
+# usage:
+#     python scripts/imshow.py data/zebra-gray-int8-4x 7112 5146
+#     python scripts/imshow.py data/zebra-gray-int8-64x data/processed-raw-int8-64x-cpu.dat
+#     python scripts/imshow.py data/zebra-gray-int8-64x --region 0 0 4096 4096 --output zebra.png
+#
+# Files are memory-mapped, never read as a whole. Each image is shown from a downsampled pyramid
+# (cached next to the file in <file>.pyramid/), and only the region in view is read from the
+# coarsest level that still has about one pixel per screen pixel. Zooming and panning re-render
+# the view at the matching level. Several images share their axes, so they zoom together.
+#
+import argparse
+import math
+import os
 import sys
-import numpy as np
+
 import matplotlib.pyplot as plt
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from hpc_tools.rawimage import pyramid
 
-# read data
-#print ("Reading data from the file: ", sys.argv[1])
-srcImg = np.fromfile(sys.argv[1],dtype='uint8')
 
-# read dims
-cols = int(sys.argv[2])
-rows = int(sys.argv[3])
+class PyramidView:
+    """
+    Shows one raw image in a matplotlib axes, re-reading the visible region from the matching pyramid level
+    whenever the view limits change.
+    """
+    def __init__(self, ax, levels, title):
+        self.ax = ax
+        self.levels = levels
+        self.height, self.width = levels[0].shape
+        self.artist = None
+        ax.set_title(title)
+        ax.set_xlim(0, self.width)
+        ax.set_ylim(self.height, 0)
 
-#print(" Reshaping to size cols = ", cols, " rows = ", rows)
+    def level_for(self, view_width):
+        """
+        Returns the coarsest level with at least one image pixel per screen pixel of the axes.
+        """
+        screen_width = max(self.ax.get_window_extent().width, 1)
+        level = int(math.floor(math.log2(max(view_width / screen_width, 1))))
+        return min(level, len(self.levels) - 1)
 
+    def render(self, _ax=None):
+        x0, x1 = sorted(self.ax.get_xlim())
+        y0, y1 = sorted(self.ax.get_ylim())
+        x0, y0 = max(int(x0), 0), max(int(y0), 0)
+        x1, y1 = min(int(math.ceil(x1)), self.width), min(int(math.ceil(y1)), self.height)
+        if x1 <= x0 or y1 <= y0:
+            return
 
-# Reshape data from a 1D thing into a 2D image of the requested dimensions
-srcImg=srcImg.reshape([rows, cols])
+        level = self.level_for(x1 - x0)
+        data = self.levels[level]
+        scale = self.width / data.shape[1]
+        # The visible region in level coordinates, widened to whole level pixels
+        lx0, ly0 = int(x0 // scale), int(y0 // scale)
+        lx1, ly1 = int(math.ceil(x1 / scale)), int(math.ceil(y1 / scale))
+        region = data[ly0:ly1, lx0:lx1]
+        extent = (lx0 * scale, lx1 * scale, ly1 * scale, ly0 * scale)
 
-#print(" after reshape, array shapw is" , np.shape(srcImg))
-plt.imshow(srcImg, cmap="gray", vmin=0, vmax=255)
-plt.show()
+        if self.artist is None:
+            self.artist = self.ax.imshow(region, cmap="gray", vmin=0, vmax=255, extent=extent,
+                                         interpolation="nearest")
+        else:
+            self.artist.set_data(region)
+            self.artist.set_extent(extent)
+        self.ax.set_xlabel(f"level {level} (1/{2 ** level}), region {x1 - x0} x {y1 - y0}")
+        self.ax.figure.canvas.draw_idle()
 
-# EOF
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Displays raw 8-bit grayscale images, side by side.")
+    parser.add_argument('args', nargs='+', help="raw files, optionally followed by cols rows")
+    parser.add_argument('--region', nargs=4, type=int, metavar=('X0', 'Y0', 'X1', 'Y1'),
+                        help="Show only this region (in pixels of the full image)")
+    parser.add_argument('--output', help="Save the view to this file instead of displaying it")
+    parser.add_argument('--min-size', type=int, default=1024,
+                        help="Longer side of the coarsest pyramid level (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    # read dims, from the command line (as before) or from the .dims sidecar of each file
+    files, cols, rows = args.args, None, None
+    if len(files) >= 3 and files[-1].isdigit() and files[-2].isdigit():
+        files, cols, rows = files[:-2], int(files[-2]), int(files[-1])
+
+    fig, axes = plt.subplots(1, len(files), sharex=True, sharey=True, squeeze=False,
+                             figsize=(6 * len(files), 6))
+    views = []
+    for ax, fname in zip(axes[0], files):
+        levels = pyramid(fname, min_size=args.min_size, width=cols, height=rows)
+        views.append(PyramidView(ax, levels, os.path.basename(fname)))
+
+    if args.region:
+        x0, y0, x1, y1 = args.region
+        axes[0][0].set_xlim(x0, x1)
+        axes[0][0].set_ylim(y1, y0)
+
+    fig.canvas.draw()
+    for view in views:
+        view.render()
+        # Shared axes propagate the limits, every view re-renders its own image
+        view.ax.callbacks.connect('xlim_changed', view.render)
+        view.ax.callbacks.connect('ylim_changed', view.render)
+
+    if args.output:
+        fig.savefig(args.output, dpi=150)
+        print(f"Saved view to {args.output}")
+    else:
+        plt.show()
+
+
+if __name__ == "__main__":
+    main()
+
+# EOF
@@ -15,6 +15,9 @@
 #
 # See https://docs.nvidia.com/nsight-compute/NsightComputeCli/index.html#command-line-options
 #
+# The output of this script (e.g. slurm-<jobid>.out) is the input of scripts/heatmap_plot_hw5.py,
+# which plots the metrics over all configurations and marks the fastest one.
+#
 
 # first, "reset" the GPU to work around a known potential error
 dcgmi profile --pause
@@ -3,67 +3,118 @@
 #
 # (C) 2021, E. Wes Bethel
 # Load an image file, convert to grayscale, write out grayscale image as raw bytes,
-# create a 2x2 tiled version, an augmented data set, display it, and write it out
-# to disk as raw bytes.
-
+# create an augmented data set (an R x C tiling or a resampled version of the image),
+# and write it out to disk as raw bytes.
+#
+# The augmented image is written band by band into a memory-mapped output file, so its
+# size is not limited by the memory of the machine. Next to every raw image, a sidecar
+# '<image>.dims' holds its dimensions ("width height"), which the Sobel codes read
+# instead of their hard-coded data_dims.
+#
+# Usage, from the sobel-harness-instructional directory:
+#
+#     python scripts/zebra-convert.py Zebra_July_2008-1.jpg --tiles 2 2    # data/zebra-gray-int8-4x, as before
+#     python scripts/zebra-convert.py Zebra_July_2008-1.jpg --tiles 8 8    # data/zebra-gray-int8-64x
+#     python scripts/zebra-convert.py Zebra_July_2008-1.jpg --size 14224 10292 -o data/zebra-gray-int8-resampled
 #
-# Future work:
-# Get rid of hard-coded input file name, use a command line argument (was doing dev in jupyter)
-# Provide for additional processing options
 
+import argparse
+import os
+import sys
 
-import sys 
 import numpy as np
-import matplotlib.pyplot as plt
 from PIL import Image
 
-#print ("number of arguments is ", len(sys.argv))
-#print ('Argument List:', str(sys.argv))
-
-#fname = sys.argv[1]
-fname = "Zebra_July_2008-1.jpg"
-
-# load the image file 
-image = Image.open(fname)
-
-# uncomment to display the image just loaded
-#imgplot=plt.imshow(image)
-#plt.show()
-
-# now convert the input image to grayscale
-gray_image = image.convert('L')
-
-
-gray_image_array = np.asarray(gray_image)
-print("Zebra dimensions are", np.shape(gray_image_array)), " rows,cols"
-# uncomment to  display the new grayscale image
-#plt.imshow(gray_image_array, cmap='gray', vmin=0, vmax=255)
-#plt.show()
-
-# write out the grayscale image
-gray_image_array.astype('int8').tofile("zebra-gray-int8")
-
-
-
-# print out the size of the grayscle image
-np.shape(gray_image_array)
-
-
-
-# now, create an augmented version that is a 2x2 tiling of the original image
-augmented_array = np.concatenate( (gray_image_array, gray_image_array) , axis=1 )
-augmented_array = np.concatenate( (augmented_array, augmented_array) , axis=0 )
-
-# display the augmented image, should be a 2x2 tiling of the input
-plt.imshow(augmented_array, cmap='gray', vmin=0, vmax=255)
-plt.show()
-
-
-# and write to disk the augmented image
-augmented_array.astype('int8').tofile("zebra-gray-int8-4x")
-
-# and display the dimensions of the augmented image
-print ("Dimensions of augmented array", np.shape(augmented_array))
-
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from hpc_tools.rawimage import create_raw, write_dims
+
+# Rows of the output written per band, bounds the memory used besides the source image
+DEFAULT_BAND_ROWS = 1024
+
+
+def write_tiled(src, output, tiles_y, tiles_x, band_rows=DEFAULT_BAND_ROWS):
+    """
+    Writes a tiles_y x tiles_x tiling of `src` into a new raw image, band_rows source rows at a time.
+    """
+    rows, cols = src.shape
+    out = create_raw(output, cols * tiles_x, rows * tiles_y)
+    for y0 in range(0, rows, band_rows):
+        band = np.tile(src[y0:y0 + band_rows], (1, tiles_x))
+        for tile_y in range(tiles_y):
+            out[tile_y * rows + y0:tile_y * rows + y0 + len(band)] = band
+    out.flush()
+    return out.shape
+
+
+def write_resampled(src, output, width, height, band_rows=DEFAULT_BAND_ROWS):
+    """
+    Writes a bilinear resampling of `src` to width x height pixels into a new raw image, band by band.
+    """
+    rows, cols = src.shape
+    out = create_raw(output, width, height)
+
+    # Pixel centers of the output in source coordinates, clamped to the image
+    x = np.clip((np.arange(width) + 0.5) * cols / width - 0.5, 0, cols - 1)
+    x0 = np.floor(x).astype(np.intp)
+    x1 = np.minimum(x0 + 1, cols - 1)
+    wx = (x - x0).astype(np.float32)
+
+    for j0 in range(0, height, band_rows):
+        y = np.clip((np.arange(j0, min(j0 + band_rows, height)) + 0.5) * rows / height - 0.5, 0, rows - 1)
+        y0 = np.floor(y).astype(np.intp)
+        y1 = np.minimum(y0 + 1, rows - 1)
+        wy = (y - y0).astype(np.float32)[:, None]
+        top = src[y0][:, x0] * (1 - wx) + src[y0][:, x1] * wx
+        bottom = src[y1][:, x0] * (1 - wx) + src[y1][:, x1] * wx
+        out[j0:j0 + len(y)] = np.clip(np.rint(top * (1 - wy) + bottom * wy), 0, 255).astype(np.uint8)
+    out.flush()
+    return out.shape
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Converts an image to raw 8-bit grayscale and writes an augmented version.")
+    parser.add_argument('image', nargs='?', default="Zebra_July_2008-1.jpg", help="The source image (default: %(default)s)")
+    parser.add_argument('-o', '--output', help="The augmented raw image (default: data/zebra-gray-int8-<factor>x)")
+    parser.add_argument('--gray-output', default="data/zebra-gray-int8",
+                        help="The raw grayscale source image (default: %(default)s), '' to skip it")
+    augment = parser.add_mutually_exclusive_group()
+    augment.add_argument('--tiles', nargs=2, type=int, metavar=('ROWS', 'COLS'), default=(2, 2),
+                         help="Tile the image ROWS x COLS times (default: 2 2)")
+    augment.add_argument('--size', nargs=2, type=int, metavar=('WIDTH', 'HEIGHT'),
+                         help="Resample the image to WIDTH x HEIGHT pixels instead of tiling it")
+    parser.add_argument('--band-rows', type=int, default=DEFAULT_BAND_ROWS,
+                        help="Rows written per band, bounds the memory use (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    for path in (args.output, args.gray_output, "data/"):
+        if path and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # now convert the input image to grayscale
+    gray_image_array = np.asarray(Image.open(args.image).convert('L'))
+    rows, cols = gray_image_array.shape
+    print(f"{args.image} dimensions are {cols} x {rows} (cols x rows)")
+
+    # write out the grayscale image
+    if args.gray_output:
+        gray_image_array.tofile(args.gray_output)
+        write_dims(args.gray_output, cols, rows)
+        print(f"Wrote {args.gray_output}")
+
+    if args.size:
+        width, height = args.size
+        output = args.output or f"data/zebra-gray-int8-{width}x{height}"
+        height, width = write_resampled(gray_image_array, output, width, height, args.band_rows)
+    else:
+        tiles_y, tiles_x = args.tiles
+        output = args.output or f"data/zebra-gray-int8-{tiles_y * tiles_x}x"
+        height, width = write_tiled(gray_image_array, output, tiles_y, tiles_x, args.band_rows)
+
+    # and display the dimensions of the augmented image
+    print(f"Wrote {output}, dimensions {width} x {height} (cols x rows), sidecar {output}.dims")
+
+
+if __name__ == "__main__":
+    main()
 
 # EOF
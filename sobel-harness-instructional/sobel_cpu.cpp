@@ -2,7 +2,8 @@
 // (C) 2021, E. Wes Bethel
 // conv_harness_cpu.cpp:
 // usage:
-//      conv_harness_cpu [no args, all is hard coded]
+//      conv_harness_cpu [input [output]]
+//      input and output default to the names hard coded below
 //
 
 #include <math.h>
@@ -29,6 +30,32 @@ static char input_fname[] = "../data/zebra-gray-int8-4x";
 static int data_dims[2] = {7112, 5146};  // width=ncols, height=nrows
 char output_fname[] = "../data/processed-raw-int8-4x-cpu.dat";
 
+// read_data_dims(): if the input file has a sidecar "<fname>.dims" holding "ncols nrows", as written by
+// scripts/zebra-convert.py, its dimensions replace the hard-coded data_dims.
+static void read_data_dims(const char *fname, int dims[2]) {
+	char dims_fname[4096];
+	snprintf(dims_fname, sizeof(dims_fname), "%s.dims", fname);
+	FILE *f = fopen(dims_fname, "r");
+	if (f == NULL) return;
+	int cols, rows;
+	if (fscanf(f, "%d %d", &cols, &rows) == 2) {
+		dims[0] = cols;
+		dims[1] = rows;
+		printf(" Read dimensions %d x %d from the file %s \n", cols, rows, dims_fname);
+	}
+	fclose(f);
+}
+
+// write_data_dims(): write the sidecar "<fname>.dims" of an output file, for scripts/imshow.py and friends
+static void write_data_dims(const char *fname, const int dims[2]) {
+	char dims_fname[4096];
+	snprintf(dims_fname, sizeof(dims_fname), "%s.dims", fname);
+	FILE *f = fopen(dims_fname, "w");
+	if (f == NULL) return;
+	fprintf(f, "%d %d\n", dims[0], dims[1]);
+	fclose(f);
+}
+
 //
 // sobel_filtered_pixel(): perform the sobel filtering at a given i,j location
 //
@@ -97,13 +124,16 @@ int main(int ac, char *av[]) {
 //	   int data_dims[2] = {3556, 2573};
 //	   char output_fname[] = "../data/processed-raw-int8-cpu.dat";
 
-	off_t nvalues = data_dims[0] * data_dims[1];
+	const char *input_path = ac > 1 ? av[1] : input_fname;
+	const char *output_path = ac > 2 ? av[2] : output_fname;
+	read_data_dims(input_path, data_dims);
+	off_t nvalues = (off_t) data_dims[0] * data_dims[1];
 	unsigned char *in_data_bytes = (unsigned char *) malloc(sizeof(unsigned char) * nvalues);
 
-	FILE *f = fopen(input_fname, "r");
+	FILE *f = fopen(input_path, "r");
 	if (f == NULL) {
     perror("fopen: ");
-		printf(" Error opening the input file: %s \n", input_fname);
+		printf(" Error opening the input file: %s \n", input_path);
 		return 1;
 	}
 	if (fread((void *) in_data_bytes, sizeof(unsigned char), nvalues, f) != nvalues * sizeof(unsigned char)) {
@@ -111,7 +141,7 @@ int main(int ac, char *av[]) {
 		fclose(f);
 		return 1;
 	} else
-		printf(" Read data from the file %s \n", input_fname);
+		printf(" Read data from the file %s \n", input_path);
 	fclose(f);
 
 #define ONE_OVER_255 0.003921568627451
@@ -137,15 +167,16 @@ int main(int ac, char *av[]) {
 	unsigned char *out_data_bytes = in_data_bytes;  // just reuse the buffer from before
 	for (off_t i = 0; i < nvalues; i++) out_data_bytes[i] = (unsigned char) (out_data_floats[i] * 255.0);
 
-	f = fopen(output_fname, "w");
+	f = fopen(output_path, "w");
 
 	if (fwrite((void *) out_data_bytes, sizeof(unsigned char), nvalues, f) != nvalues * sizeof(unsigned char)) {
 		printf("Error writing output file. \n");
 		fclose(f);
 		return 1;
 	} else
-		printf(" Wrote the output file %s \n", output_fname);
+		printf(" Wrote the output file %s \n", output_path);
 	fclose(f);
+	write_data_dims(output_path, data_dims);
 }
 
 // eof
@@ -2,7 +2,8 @@
 // (C) 2021, E. Wes Bethel
 // sobel_gpu.cpp
 // usage:
-//      sobel_gpu [no args, all is hard coded]
+//      sobel_gpu [-N threads per block] [-B blocks] [-i input] [-o output]
+//      input and output default to the names hard coded below
 //
 
 #include <math.h>
@@ -29,6 +30,32 @@ static char input_fname[] = "../data/zebra-gray-int8-4x";
 static int data_dims[2] = {7112, 5146};  // width=ncols, height=nrows
 char output_fname[] = "../data/processed-raw-int8-4x-cpu.dat";
 
+// read_data_dims(): if the input file has a sidecar "<fname>.dims" holding "ncols nrows", as written by
+// scripts/zebra-convert.py, its dimensions replace the hard-coded data_dims.
+static void read_data_dims(const char *fname, int dims[2]) {
+	char dims_fname[4096];
+	snprintf(dims_fname, sizeof(dims_fname), "%s.dims", fname);
+	FILE *f = fopen(dims_fname, "r");
+	if (f == NULL) return;
+	int cols, rows;
+	if (fscanf(f, "%d %d", &cols, &rows) == 2) {
+		dims[0] = cols;
+		dims[1] = rows;
+		printf(" Read dimensions %d x %d from the file %s \n", cols, rows, dims_fname);
+	}
+	fclose(f);
+}
+
+// write_data_dims(): write the sidecar "<fname>.dims" of an output file, for scripts/imshow.py and friends
+static void write_data_dims(const char *fname, const int dims[2]) {
+	char dims_fname[4096];
+	snprintf(dims_fname, sizeof(dims_fname), "%s.dims", fname);
+	FILE *f = fopen(dims_fname, "w");
+	if (f == NULL) return;
+	fprintf(f, "%d %d\n", dims[0], dims[1]);
+	fclose(f);
+}
+
 // see
 // https://stackoverflow.com/questions/14038589/what-is-the-canonical-way-to-check-for-errors-using-the-cuda-runtime-api
 // macro to check for cuda errors. basic idea: wrap this macro around every cuda call
@@ -113,19 +140,26 @@ __global__ void sobel_kernel_gpu(float *s,  // source image pixels
 	__constant__ float device_gy[9] = {1.0, 2.0, 1.0, 0.0, 0.0, 0.0, -1.0, -2.0, -1.0};
 
 int main(int argc, char *argv[]) {
-	// input, output file names hard coded at top of file
+	// input, output file names default to the ones hard coded at top of file
 
 	// load the input file
-	off_t nvalues = data_dims[0] * data_dims[1];
+	const char *input_path = input_fname;
+	const char *output_path = output_fname;
+	for (int i = 1; i + 1 < argc; i++) {  // -i/-o, the launch configuration is parsed with getopt below
+		if (strcmp(argv[i], "-i") == 0) input_path = argv[i + 1];
+		if (strcmp(argv[i], "-o") == 0) output_path = argv[i + 1];
+	}
+	read_data_dims(input_path, data_dims);
+	off_t nvalues = (off_t) data_dims[0] * data_dims[1];
 	unsigned char *in_data_bytes = (unsigned char *) malloc(sizeof(unsigned char) * nvalues);
 
-	FILE *f = fopen(input_fname, "r");
+	FILE *f = fopen(input_path, "r");
 	if (fread((void *) in_data_bytes, sizeof(unsigned char), nvalues, f) != nvalues * sizeof(unsigned char)) {
 		printf("Error reading input file. \n");
 		fclose(f);
 		return 1;
 	} else
-		printf(" Read data from the file %s \n", input_fname);
+		printf(" Read data from the file %s \n", input_path);
 	fclose(f);
 
 #define ONE_OVER_255 0.003921568627451
@@ -169,7 +203,7 @@ int main(int argc, char *argv[]) {
 
 	// ADD CODE HERE: insert your code here to set a different number of thread blocks or # of threads per block
 	int c;
-   while ( (c = getopt(argc, argv, "N:B:")) != -1) {
+   while ( (c = getopt(argc, argv, "N:B:i:o:")) != -1) {
       switch(c) {
          case 'N':
             nThreadsPerBlock = std::atoi(optarg == NULL ? "256" : optarg);
@@ -194,15 +228,16 @@ int main(int argc, char *argv[]) {
 	unsigned char *out_data_bytes = in_data_bytes;  // just reuse the buffer from before
 	for (off_t i = 0; i < nvalues; i++) out_data_bytes[i] = (unsigned char) (out_data_floats[i] * 255.0);
 
-	f = fopen(output_fname, "w");
+	f = fopen(output_path, "w");
 
 	if (fwrite((void *) out_data_bytes, sizeof(unsigned char), nvalues, f) != nvalues * sizeof(unsigned char)) {
 		printf("Error writing output file. \n");
 		fclose(f);
 		return 1;
 	} else
-		printf(" Wrote the output file %s \n", output_fname);
+		printf(" Wrote the output file %s \n", output_path);
 	fclose(f);
+	write_data_dims(output_path, data_dims);
 }
 
 // eof
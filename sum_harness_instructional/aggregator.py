@@ -1,37 +1,42 @@
-import pandas as pd
+import argparse
+import os
+import sys
 
-problems = ["direct", "vector", "indirect"]
-input_dfs = [pd.read_csv(f"data/{problem}.csv") for problem in problems]
-
-# FLOPS/s
-flops_df = pd.DataFrame()
-flops_df["N"] = input_dfs[0]["N"]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hpc_tools import reference
+from hpc_tools.metrics import (BANDWIDTH, MFLOPS, NS_PER_ELEMENT, RunSource, compute_metrics, load_runs,
+                               pivot_metric, write_pivot)
+from hpc_tools.stats import summarize_trials
+from hpc_tools.storage import write_table
 
-for problem, df in zip(problems, input_dfs):
-    # MFLOP / time
-    flops_df[problem] = df["N"] / df["runtime"] / 10**6
+problems = ["direct", "vector", "indirect"]
 
-flops_df.to_csv("data/mflops.csv", index=False)
 
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Aggregates the sum runs into metric tables.")
+    arg_parser.add_argument('--data', default="data",
+                            help="The directory of the result files and tables (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+    data = args.data
 
-# Memory Bandwidth
-bandwidth_df = pd.DataFrame()
-bandwidth_df["N"] = input_dfs[0]["N"]
-THEORETICAL_BANDWIDTH = 204.8e9  # 204.8 GB/s
+    # The NumPy references (see hpc_tools/reference.py) are extra series, if they were run
+    sources = [RunSource(problem, os.path.join(data, problem)) for problem in problems]
+    runs = load_runs("sum", sources + reference.sources("sum", data))
+    # Median over the repetitions of each problem size, without warm-up trials
+    metrics = compute_metrics(summarize_trials(runs))
+    write_table(metrics, os.path.join(data, "metrics"))
 
-for problem, df in zip(problems, input_dfs):
-    # Bytes moved / time / theo. max. bandwidth
-    # 1GB in 0.22 Seconds ~ 4.5GB/s <<< 204.8 GB/s
-    bandwidth_df[problem] = (df["N"] * 4) / df["runtime"] / THEORETICAL_BANDWIDTH
+    # FLOPS/s
+    write_pivot(metrics, MFLOPS, os.path.join(data, "mflops"), problems + reference.VARIANTS["sum"])
 
-bandwidth_df.to_csv("data/bandwidth.csv", index=False)
+    # Memory Bandwidth: bytes moved / time / peak bandwidth of the machine profile (see hpc_tools.machine)
+    write_pivot(metrics, BANDWIDTH, os.path.join(data, "bandwidth"), problems)
 
+    # Average Memory Latencay in nanoseconds, the direct sum does not access memory
+    latency_df = pivot_metric(metrics, NS_PER_ELEMENT, problems)
+    latency_df["direct"] = 0.0
+    write_table(latency_df, os.path.join(data, "latency"))
 
-# Average Memory Latencay in milliseconds
-latency_df = pd.DataFrame()
-latency_df["N"] = input_dfs[0]["N"]
 
-latency_df["direct"] = [0.0] * len(input_dfs[0]["N"])
-latency_df["vector"] = input_dfs[1]["runtime"].clip(lower=0) / latency_df["N"] * 1e9
-latency_df["indirect"] = input_dfs[2]["runtime"].clip(lower=0) / latency_df["N"] * 1e9
-latency_df.to_csv("data/latency.csv", index=False)
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,21 @@
 // benchmark-* harness for running different versions of the sum study
 //    over different problem sizes
 //
-// usage: no command line arguments
+// usage: [-R repetitions] [-m min_bytes -M max_bytes [-P points_per_doubling]] [-T min_seconds]
 // set problem sizes, block sizes in the code below
+//
+// -R sets the number of timed repetitions per problem size (default 1). Every repetition
+// prints its own row, so the analysis can drop warm-up samples and compute statistics.
+//
+// -m/-M replace the fixed problem sizes by a working-set sweep: sizes are log-spaced from
+// min_bytes to max_bytes (suffixes K, M, G are powers of 1024), with -P sizes per doubling
+// (default 8). Small working sets finish in microseconds, so -T repeats the sum() call until
+// a timed repetition takes at least min_seconds (default 1 ms in a sweep, 0 otherwise) and
+// reports the runtime of one call. The untimed first call also loads the working set into
+// the caches. See hpc_tools/hierarchy.py for the analysis.
 
 #include <string.h>
+#include <unistd.h>
 
 #include <algorithm>
 #include <chrono>
@@ -20,14 +31,62 @@
 
 #define MAX_PROBLEM_SIZE 1 << 28  //  256M
 
+// Parses a byte count with an optional K, M or G suffix (powers of 1024)
+static int64_t parse_bytes(const char *arg) {
+	char *end;
+	double value = strtod(arg, &end);
+	switch (*end) {
+		case 'G': case 'g': value *= 1024.0;  // fall through
+		case 'M': case 'm': value *= 1024.0;  // fall through
+		case 'K': case 'k': value *= 1024.0;
+	}
+	return (int64_t) value;
+}
+
+// Log-spaced problem sizes whose working sets span min_bytes to max_bytes, at least 2 elements each
+static std::vector<int64_t> sweep_sizes(int64_t min_bytes, int64_t max_bytes, int points_per_doubling) {
+	std::vector<int64_t> sizes;
+	int64_t min_n = std::max<int64_t>(2, min_bytes / (int64_t) sizeof(float));
+	int64_t max_n = std::max(min_n, max_bytes / (int64_t) sizeof(float));
+	int steps = (int) std::ceil(std::log2((double) max_n / min_n) * points_per_doubling);
+	for (int k = 0; k <= steps; k++) {
+		int64_t n = std::min(max_n, (int64_t) std::llround(min_n * std::exp2((double) k / points_per_doubling)));
+		if (sizes.empty() || n > sizes.back()) sizes.push_back(n);
+	}
+	return sizes;
+}
+
 /* The benchmarking program */
 int main(int argc, char **argv) {
+	int n_reps = 1;
+	int64_t min_bytes = 0, max_bytes = 0;
+	int points_per_doubling = 8;
+	double min_seconds = -1.0;
+	int c;
+	while ((c = getopt(argc, argv, "R:m:M:P:T:")) != -1) {
+		if (c == 'R') n_reps = std::max(1, std::atoi(optarg));
+		if (c == 'm') min_bytes = parse_bytes(optarg);
+		if (c == 'M') max_bytes = parse_bytes(optarg);
+		if (c == 'P') points_per_doubling = std::max(1, std::atoi(optarg));
+		if (c == 'T') min_seconds = std::atof(optarg);
+	}
+	bool sweep = min_bytes > 0 || max_bytes > 0;
+	if (min_seconds < 0) min_seconds = sweep ? 1e-3 : 0.0;
+
 	std::cout << std::fixed << std::setprecision(2);
 
 	std::vector<int64_t> problem_sizes{MAX_PROBLEM_SIZE >> 5, MAX_PROBLEM_SIZE >> 4, MAX_PROBLEM_SIZE >> 3,
 	                                   MAX_PROBLEM_SIZE >> 2, MAX_PROBLEM_SIZE >> 1, MAX_PROBLEM_SIZE};
+	if (sweep) {
+		problem_sizes = sweep_sizes(min_bytes > 0 ? min_bytes : 4096, max_bytes > 0 ? max_bytes : (int64_t) 1 << 32,
+		                            points_per_doubling);
+	}
 
-	float *A = (float *) malloc(sizeof(float) * MAX_PROBLEM_SIZE);
+	float *A = (float *) malloc(sizeof(float) * problem_sizes.back());
+	if (A == NULL) {
+		fprintf(stderr, "Could not allocate %ld bytes\n", (long) (sizeof(float) * problem_sizes.back()));
+		return 1;
+	}
 
 	// int n_problems = problem_sizes.size(); // unused variable
 	printf("N,runtime,expected,result\n");
@@ -41,17 +100,30 @@ int main(int argc, char **argv) {
 		// invoke user code to set up the problem
 		setup(n, &A[0]);
 
-		// Start time measurement
-		auto start_time = std::chrono::high_resolution_clock::now();
-
-		// invoke method to perform the sum
-		t = sum(n, &A[0]);
-
-		// stop measurement
-		auto end_time = std::chrono::high_resolution_clock::now();
-		std::chrono::duration<double> elapsed = end_time - start_time;
-
-		printf("%ld, %f, %f, %lf\n", n, elapsed.count(), expected, t);
+		// calls of sum() per timed repetition, so that a repetition takes at least min_seconds
+		int64_t calls = 1;
+		if (min_seconds > 0) {
+			auto start_time = std::chrono::high_resolution_clock::now();
+			t = sum(n, &A[0]);
+			std::chrono::duration<double> elapsed = std::chrono::high_resolution_clock::now() - start_time;
+			calls = std::max<int64_t>(1, (int64_t) std::ceil(min_seconds / std::max(elapsed.count(), 1e-9)));
+		}
+
+		for (int rep = 0; rep < n_reps; rep++) {
+			// Start time measurement
+			auto start_time = std::chrono::high_resolution_clock::now();
+
+			// invoke method to perform the sum
+			for (int64_t call = 0; call < calls; call++) {
+				t = sum(n, &A[0]);
+			}
+
+			// stop measurement
+			auto end_time = std::chrono::high_resolution_clock::now();
+			std::chrono::duration<double> elapsed = end_time - start_time;
+
+			printf("%ld, %.9f, %f, %lf\n", n, elapsed.count() / calls, expected, t);
+		}
 
 	}  // end loop over problem sizes
 }
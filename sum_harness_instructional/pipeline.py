@@ -0,0 +1,27 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from hpc_tools.pipeline import Stage, main
+from plot_data import figures
+
+problems = ["direct", "vector", "indirect"]
+tables = ["data/metrics", "data/latency"] + [f"data/{metric}{band}" for metric in ("mflops", "bandwidth")
+                                              for band in ("", "_low", "_high")]
+
+# Raw benchmark output (run.sh, ../hpc_tools/reference.py) -> aggregated tables -> one stage per figure
+stages = [
+    Stage("aggregate", [sys.executable, "aggregator.py"],
+          [f"data/{problem}.csv" for problem in problems] + ["data/numpy-*.csv", "aggregator.py"], tables),
+]
+# Working-set sweep (run_sweep.sh) -> memory levels, only once the sweep was run
+sweeps = [f"data/sweep_{problem}.csv" for problem in problems]
+if all(os.path.exists(os.path.join(HERE, sweep)) for sweep in sweeps):
+    stages.append(Stage("hierarchy", [sys.executable, "../hpc_tools/hierarchy.py", "--plot", "hierarchy.pdf"],
+                        sweeps + ["../hpc_tools/hierarchy.py"], ["data/hierarchy", "data/hierarchy_curves", "hierarchy.pdf"]))
+stages += [Stage(spec.output_name, [sys.executable, "plot_data.py", "--force", spec.output_name],
+                 spec.tables() + ["plot_data.py"], [spec.output_name]) for spec in figures]
+
+if __name__ == "__main__":
+    sys.exit(main(stages, HERE))
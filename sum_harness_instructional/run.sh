@@ -1,11 +1,12 @@
 #!/bin/bash
 mkdir -p data
+# Every problem size is timed REPS times, the aggregator reports the median without warm-up trials
 
 echo "Executing sum_direct..."
-./build/sum_direct > data/direct.csv
+./build/sum_direct -R ${REPS:-5} > data/direct.csv
 echo "Executing sum_vector..."
-./build/sum_vector > data/vector.csv
+./build/sum_vector -R ${REPS:-5} > data/vector.csv
 echo "Executing sum_direct..."
-./build/sum_indirect > data/indirect.csv
+./build/sum_indirect -R ${REPS:-5} > data/indirect.csv
 echo "Done!"
 
@@ -0,0 +1,12 @@
+#!/bin/bash
+mkdir -p data
+# Working-set sweep for hpc_tools/hierarchy.py: log-spaced sizes from MIN to MAX bytes, POINTS per doubling.
+# The indirect sum walks exact indices only up to 2^24 floats (64 MiB), larger sizes are not run.
+
+for problem in direct vector; do
+    echo "Sweeping sum_${problem}..."
+    ./build/sum_${problem} -m ${MIN:-4K} -M ${MAX:-4G} -P ${POINTS:-8} -R ${REPS:-3} > data/sweep_${problem}.csv
+done
+echo "Sweeping sum_indirect..."
+./build/sum_indirect -m ${MIN:-4K} -M ${INDIRECT_MAX:-64M} -P ${POINTS:-8} -R ${REPS:-3} > data/sweep_indirect.csv
+echo "Done!"
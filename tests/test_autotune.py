@@ -0,0 +1,90 @@
+"""
+Tunes tests/fake-benchmark-blocked, a stand-in for benchmark-blocked of mmul-harness-instructional, with
+hpc_tools.autotune.
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.autotune import main, make_candidates, parse_runtime, reported_sizes, successive_halving
+
+FAKE_BENCHMARK = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake-benchmark-blocked')]
+COMMAND = FAKE_BENCHMARK + ['-N', '{N}', '-B', '{B}']
+
+OMP_OUTPUT = """Working on problem size N=128
+ Working on Block size = 16
+ Elapsed time is : 0.0210 (sec)
+ Elapsed time is : 0.0190 (sec)
+ Elapsed time is : 0.0200 (sec)
+"""
+SERIAL_GRID_OUTPUT = """N,runtime,block_size
+64,0.001,2
+64,0.0003,16
+128,0.008,2
+128,0.002,16
+"""
+
+
+class OutputTest(unittest.TestCase):
+
+    def test_runtime(self):
+        self.assertAlmostEqual(parse_runtime(OMP_OUTPUT), 0.02)
+        self.assertAlmostEqual(parse_runtime("N,runtime,block_size\n128,0.002,16\n128,0.004,16\n"), 0.003)
+        self.assertIsNone(parse_runtime("Description:\tblocked dgemm\n"))
+
+    def test_reported_sizes(self):
+        self.assertEqual(reported_sizes(OMP_OUTPUT), ({128}, {16}))
+        self.assertEqual(reported_sizes(SERIAL_GRID_OUTPUT), ({64, 128}, {2, 16}))
+        self.assertEqual(reported_sizes("N,runtime\n128,0.002\n"), ({128}, set()))
+
+
+class SuccessiveHalvingTest(unittest.TestCase):
+
+    def tune(self, n=128, block_sizes=(4, 8, 16, 32, 64)):
+        candidates = make_candidates(n, block_sizes, [1])
+        # The runtimes are not measured, so a large slack keeps slow process startups from stopping runs
+        best = successive_halving(COMMAND, candidates, cores=[0], slack=100.0, verbose=False)
+        return best, candidates
+
+    def test_finds_the_fastest_block_size(self):
+        best, candidates = self.tune()
+
+        self.assertEqual(best.params, {'N': 128, 'B': 16, 'threads': 1})
+        self.assertAlmostEqual(best.score, 128 ** 3 * 1e-9)
+        self.assertTrue(all(candidate.dropped for candidate in candidates if candidate is not best))
+        self.assertGreater(len(best.runtimes), 1)
+
+    def test_binary_ignoring_the_sizes_is_dropped(self):
+        with mock.patch.dict(os.environ, {'FAKE_BENCHMARK_IGNORE_ARGS': '1'}):
+            best, candidates = self.tune()
+
+        self.assertIsNone(best)
+        for candidate in candidates:
+            self.assertIn("does it take -N and -B", candidate.dropped)
+            self.assertEqual(candidate.runtimes, [])
+
+
+class TuningDatabaseTest(unittest.TestCase):
+
+    def test_tune_then_best(self):
+        with tempfile.TemporaryDirectory() as directory:
+            db = os.path.join(directory, 'tuning.json')
+            options = ['--db', db, '--name', 'benchmark-blocked', '-N', '128']
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(['tune', *options, '--threads', '1', '--block-sizes', '4,16,64',
+                                       '--slack', '100', '--', *COMMAND]), 0)
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(main(['best', *options]), 0)
+        self.assertEqual(stdout.getvalue().split(), ['16', '1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""
+Checks the normalization of counter tables against the baseline variant.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.counters import counter_table, normalize, pivot_counters
+from hpc_tools.likwid import BENCHMARK, L2_ACCESSES, NUM_BLOCKS, NUM_THREADS, PROBLEM_SIZE
+
+
+def merged(runs):
+    return pd.DataFrame([{BENCHMARK: benchmark, NUM_BLOCKS: blocks, NUM_THREADS: threads, PROBLEM_SIZE: 128,
+                          L2_ACCESSES: value} for benchmark, blocks, threads, value in runs])
+
+
+# blas only at one thread, as in mmul-omp-harness-instructional/job.in
+RUNS = [('blas', None, 1, 10.0), ('basic-omp', None, 1, 20.0), ('basic-omp', None, 4, 40.0),
+        ('blocked-omp', 16, 1, 30.0), ('blocked-omp', 16, 4, 50.0)]
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def normalized(self, runs, **kwargs):
+        return counter_table(normalize(pivot_counters(merged(runs), [L2_ACCESSES]), **kwargs), L2_ACCESSES).loc[128]
+
+    def test_missing_thread_count_falls_back_to_single_threaded_baseline(self):
+        row = self.normalized(RUNS)
+
+        self.assertFalse(row.isna().any())
+        self.assertEqual(row['basic t=4'], 4.0)
+        self.assertEqual(row['blocked B16 t=4'], 5.0)
+
+    def test_baseline_at_the_same_thread_count_is_preferred(self):
+        row = self.normalized(RUNS + [('blas', None, 4, 5.0)])
+
+        self.assertEqual(row['basic t=1'], 2.0)
+        self.assertEqual(row['basic t=4'], 8.0)
+        self.assertEqual(row['CBLAS t=4'], 1.0)
+
+    def test_fixed_baseline_threads(self):
+        row = self.normalized(RUNS + [('blas', None, 4, 5.0)], baseline_threads=1)
+
+        self.assertEqual(row['basic t=4'], 4.0)
+        self.assertEqual(row['CBLAS t=4'], 0.5)
+
+    def test_unknown_baseline(self):
+        with self.assertRaises(ValueError):
+            normalize(pivot_counters(merged(RUNS), [L2_ACCESSES]), baseline='mkl')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Segments synthetic working-set sweeps of the sum harness into memory levels with hpc_tools.hierarchy: noisy
+plateaus at known capacities, joined by one transition point each.
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.hierarchy import (CAPACITY, DRAM, FIRST_SIZE, FIT, IN_CORE_FRACTION, LEVEL, POINTS, WORKING_SET,
+                                 find_levels, isotonic, main, profile, segment)
+from hpc_tools.metrics import N, NS_PER_ELEMENT, RUNTIME, VARIANT
+from hpc_tools.storage import read_table, write_table
+
+KIB = 1024
+MIB = 1024 * KIB
+
+# ns per element of every level, and the largest working set (bytes) on it
+PLATEAUS = [(0.3, 32 * KIB), (1.0, MIB), (3.0, 32 * MIB), (10.0, None)]
+SIZES = 4 * 2.0 ** np.arange(8, 29)  # 1 KiB to 1 GiB of floats
+NOISE = 1 + 0.03 * np.sin(np.arange(len(SIZES)) * 2.1)  # +-3 %, below the default min_step
+
+
+def sweep_cost(sizes=SIZES, plateaus=PLATEAUS, noise=NOISE):
+    """
+    Returns the ns per element of a sweep: the plateau costs, and the geometric mean of the neighboring plateaus
+    at the first working set beyond a capacity.
+    """
+    cost = np.empty(len(sizes))
+    for i, size in enumerate(sizes):
+        level = next(j for j, (_, capacity) in enumerate(plateaus) if capacity is None or size <= capacity)
+        cost[i] = plateaus[level][0]
+        if level and size / 2 <= plateaus[level - 1][1]:
+            cost[i] = np.sqrt(plateaus[level - 1][0] * plateaus[level][0])
+    return cost * noise
+
+
+def curve(cost, sizes=SIZES, variant='vector'):
+    return pd.DataFrame({VARIANT: variant, N: (sizes / 4).astype(int), WORKING_SET: sizes, NS_PER_ELEMENT: cost})
+
+
+class IsotonicTest(unittest.TestCase):
+
+    def test_pools_violators(self):
+        np.testing.assert_allclose(isotonic(np.array([1.0, 3.0, 2.0, 4.0])), [1.0, 2.5, 2.5, 4.0])
+        np.testing.assert_allclose(isotonic(np.array([3.0, 2.0, 1.0])), [2.0, 2.0, 2.0])
+
+    def test_monotone_input_is_unchanged(self):
+        y = np.log(sweep_cost(noise=1.0))
+        np.testing.assert_array_equal(isotonic(y), y)
+
+
+class SegmentTest(unittest.TestCase):
+
+    def test_steps_below_min_step_are_merged(self):
+        log_y = np.log([1.0, 1.1, 1.2, 2.0, 2.1, 2.2])
+
+        self.assertEqual(segment(log_y), [(0, 3), (3, 6)])
+        self.assertEqual(segment(log_y, min_step=1.04), [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5), (5, 6)])
+        self.assertEqual(segment(log_y, min_step=3.0), [(0, 6)])
+
+
+class FindLevelsTest(unittest.TestCase):
+
+    def assertLevels(self, levels, expected):
+        self.assertEqual(list(levels[LEVEL]), [name for name, _ in expected])
+        np.testing.assert_array_equal(levels[CAPACITY], [capacity for _, capacity in expected])
+
+    def test_levels_and_capacities(self):
+        levels, point_levels = find_levels(curve(sweep_cost()))
+
+        self.assertLevels(levels, [('L1', 32 * KIB), ('L2', MIB), ('L3', 32 * MIB), (DRAM, np.nan)])
+        self.assertEqual(list(levels[FIRST_SIZE]), [KIB, 128 * KIB, 4 * MIB, 128 * MIB])
+        self.assertEqual(list(levels[POINTS]), [6, 4, 4, 4])
+        np.testing.assert_allclose(levels[NS_PER_ELEMENT], [cost for cost, _ in PLATEAUS], rtol=0.03)
+        # The first working set beyond every capacity is a transition
+        transitions = SIZES[point_levels.isna().to_numpy()]
+        np.testing.assert_array_equal(transitions, [64 * KIB, 2 * MIB, 64 * MIB])
+
+    def test_slow_outlier_on_a_plateau(self):
+        cost = sweep_cost()
+        cost[SIZES == 256 * KIB] *= 1.2
+
+        levels, _ = find_levels(curve(cost))
+
+        self.assertLevels(levels, [('L1', 32 * KIB), ('L2', MIB), ('L3', 32 * MIB), (DRAM, np.nan)])
+
+    def test_narrow_plateaus_are_transitions(self):
+        # A plateau of a single working set is not a level
+        cost = sweep_cost(plateaus=[(0.3, 32 * KIB), (1.0, 64 * KIB), (3.0, 32 * MIB), (10.0, None)])
+
+        levels, _ = find_levels(curve(cost))
+
+        self.assertLevels(levels, [('L1', 32 * KIB), ('L2', 32 * MIB), (DRAM, np.nan)])
+        # Without a minimum width, every segment is a level, the narrow plateau too
+        levels, _ = find_levels(curve(cost), min_width=0.0)
+        self.assertIn(64 * KIB, list(levels[FIRST_SIZE]))
+        self.assertEqual(len(levels), 6)
+
+    def test_flat_curve_is_a_single_level(self):
+        levels, point_levels = find_levels(curve(2.0 * NOISE))
+
+        self.assertLevels(levels, [(DRAM, np.nan)])
+        self.assertEqual(set(point_levels), {DRAM})
+
+
+class ProfileTest(unittest.TestCase):
+
+    def curves(self):
+        return pd.concat([curve(sweep_cost()), curve(0.5 * NOISE, variant='direct')], ignore_index=True)
+
+    def test_in_core_fraction_and_fit(self):
+        levels, curves = profile(self.curves(), ['vector'])
+
+        self.assertEqual(set(levels[VARIANT]), {'vector'})
+        np.testing.assert_allclose(levels[IN_CORE_FRACTION], [0.5 / cost for cost, _ in PLATEAUS], rtol=0.05)
+        vector = curves[curves[VARIANT] == 'vector']
+        self.assertTrue((np.diff(vector[FIT]) >= 0).all())
+        self.assertTrue(curves.loc[curves[VARIANT] == 'direct', FIT].isna().all())
+
+    def test_main_drops_inexact_indirect_sizes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sources = []
+            for variant, cost in [('direct', 0.5 * NOISE), ('vector', sweep_cost()), ('indirect', sweep_cost())]:
+                path = os.path.join(directory, f'sweep_{variant}')
+                n = (SIZES / 4).astype(int)
+                write_table(pd.DataFrame({N: n, RUNTIME: cost * n / 1e9}), path)
+                sources.append(f'{variant}={path}')
+            output = os.path.join(directory, 'hierarchy')
+            with contextlib.redirect_stdout(io.StringIO()):
+                self.assertEqual(main(sources + ['--output', output]), 0)
+
+            levels = read_table(output)
+            curves = read_table(output + '_curves')
+        self.assertEqual(list(levels[VARIANT]), ['vector'] * 4 + ['indirect'] * 3)
+        self.assertEqual(curves.loc[curves[VARIANT] == 'indirect', N].max(), 1 << 24)
+        # The indirect sweep stops at 64 MiB (2^24 floats), so its largest level is the plateau up to 32 MiB
+        indirect = levels[levels[VARIANT] == 'indirect']
+        self.assertEqual(list(indirect[LEVEL]), ['L1', 'L2', DRAM])
+        self.assertEqual(list(indirect[CAPACITY].iloc[:2]), [32 * KIB, MIB])
+
+
+if __name__ == '__main__':
+    unittest.main()
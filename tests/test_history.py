@@ -0,0 +1,72 @@
+"""
+Inserts runs into the SQLite history from several connections at once, as concurrent job epilogues do.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.history import connect, insert_runs, query_runs
+from hpc_tools.metrics import BLOCK_SIZE, KERNEL, N, RUNTIME, THREADS, TRIAL, VARIANT
+
+WRITERS = 8
+IMPORTS = 20
+TRIALS = 5
+
+
+def runs(variant):
+    return pd.DataFrame({KERNEL: 'dgemm', VARIANT: variant, N: 512, THREADS: 4, BLOCK_SIZE: 16,
+                         RUNTIME: [0.1 * (trial + 1) for trial in range(TRIALS)], TRIAL: range(TRIALS),
+                         'L2 misses': 1000.0})
+
+
+class ConcurrentInsertTest(unittest.TestCase):
+
+    def test_concurrent_imports_get_distinct_ids(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'history.sqlite')
+            connect(path).close()
+            errors = []
+            barrier = threading.Barrier(WRITERS)
+
+            def write(writer):
+                conn = connect(path)
+                barrier.wait()
+                try:
+                    for i in range(IMPORTS):
+                        insert_runs(conn, runs(f'writer-{writer}'), f'2025-10-01T12:00:{i:02d}', 'abc123',
+                                    'node', metrics=['L2 misses'])
+                except Exception as error:
+                    errors.append(error)
+                finally:
+                    conn.close()
+
+            threads = [threading.Thread(target=write, args=(writer,)) for writer in range(WRITERS)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.assertEqual(errors, [])
+            conn = connect(path)
+            try:
+                count, distinct = conn.execute('SELECT COUNT(*), COUNT(DISTINCT id) FROM runs').fetchone()
+                self.assertEqual(count, WRITERS * IMPORTS * TRIALS)
+                self.assertEqual(distinct, count)
+                # Every metric belongs to the run of its own writer
+                self.assertEqual(conn.execute('SELECT COUNT(*) FROM metrics').fetchone()[0], count)
+                table = query_runs(conn, kernel='dgemm', variant='writer-0', metrics=True)
+                self.assertEqual(len(table), IMPORTS * TRIALS)
+                self.assertTrue((table['L2 misses'] == 1000.0).all())
+            finally:
+                conn.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+Parses tests/data/likwid-flops_dp.out, captured likwid-perfctr output of a FLOPS_DP job: text before the first run,
+single- and multi-threaded runs, a blocked run whose command line starts mid-line, and a run killed before LIKWID
+printed anything.
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.likwid import (BENCHMARK, CPI, DP_MFLOPS, EVENT, EVENT_STAT, GROUPS_BY_NAME, INSTRUCTION_COUNT,
+                              L2_ACCESSES, L2_MISSES, METRIC, METRIC_STAT, NUM_BLOCKS, NUM_THREADS, PROBLEM_SIZE,
+                              RUN_COMMAND, RUNTIME_CHRONO, RUNTIME_RDTSC, RunCache, RunParser, build_group_table,
+                              detect_group, iter_run_blocks, merge_group_tables, parse_likwid_output, tokenize_run)
+
+RAW = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'likwid-flops_dp.out')
+FLOPS_DP = GROUPS_BY_NAME['FLOPS_DP']
+
+
+def row(command, threads, benchmark, n, blocks, chrono, rdtsc, instructions, cpi, mflops):
+    return {RUN_COMMAND: f"likwid-perfctr {command}", NUM_THREADS: threads, BENCHMARK: benchmark, PROBLEM_SIZE: n,
+            NUM_BLOCKS: blocks, RUNTIME_CHRONO: chrono, RUNTIME_RDTSC: rdtsc, INSTRUCTION_COUNT: instructions,
+            CPI: cpi, DP_MFLOPS: mflops}
+
+
+# What likwid-parser.py wrote for the file before the tokenizer: the RDTSC runtime is the Max and CPI the Avg of
+# the STAT tables, the other metrics their Sum; single-threaded runs take the only value.
+EXPECTED_ROWS = [
+    row("-m -g FLOPS_DP -C N:0-0 ./benchmark-basic-omp -N 128", 1, 'basic-omp', 128, None,
+        0.0052, 0.005213, 29884462, 0.4421, 804.6),
+    row("-m -g FLOPS_DP -C N:0-3 ./benchmark-basic-omp -N 128", 4, 'basic-omp', 128, None,
+        0.0017, 0.001688, 29907401, 0.550525, 2552.2),
+    row("-m -g FLOPS_DP -C N:0-3 ./benchmark-blocked-omp -N 512 -B 16", 4, 'blocked-omp', 512, 16,
+        0.0741, 0.074025, 1649239412, 0.44835, 3629.9),
+    row("-m -g FLOPS_DP -C N:0-63 ./benchmark-basic-omp -N 2048", 64, 'basic-omp', 2048, None,
+        None, None, None, None, None),
+]
+
+
+def parse(cache=None):
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        rows = parse_likwid_output(RAW, FLOPS_DP, cache)
+    return rows, stdout.getvalue()
+
+
+class RunBlockTest(unittest.TestCase):
+
+    def test_blocks(self):
+        blocks = list(iter_run_blocks(RAW))
+
+        self.assertEqual(len(blocks), 5)
+        self.assertEqual(blocks[0][0], "Loading modules for job 31415926\n")
+        commands = [expected[RUN_COMMAND].removeprefix('likwid-perfctr ') for expected in EXPECTED_ROWS]
+        self.assertEqual([block[0].strip() for block in blocks[1:]], commands)
+        # The text before the mid-line command line stays with the previous run
+        self.assertEqual(blocks[2][-1], "srun: step 31415926.2 started: ")
+
+    def test_detect_group(self):
+        self.assertIs(detect_group(RAW), FLOPS_DP)
+
+
+class TokenizerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.blocks = list(iter_run_blocks(RAW))
+
+    def test_single_threaded_tables(self):
+        run = tokenize_run(self.blocks[1])
+
+        self.assertEqual(run.chrono, 0.0052)
+        self.assertEqual(run.tables[EVENT]['RETIRED_INSTRUCTIONS'], ['29884462'])
+        self.assertEqual(run.tables[METRIC]['DP [MFLOP/s]'], ['804.6'])
+        self.assertEqual(run.tables[EVENT_STAT], {})
+        self.assertEqual(run.tables[METRIC_STAT], {})
+        self.assertNotIn('RDTSC Runtime [s]', run.tables[METRIC])  # the 'Region Info' table is skipped
+
+    def test_multi_threaded_tables(self):
+        run = tokenize_run(self.blocks[2])
+
+        self.assertEqual(run.tables[EVENT]['RETIRED_INSTRUCTIONS'], ['7490212', '7471008', '7466180', '7480001'])
+        self.assertEqual(run.tables[EVENT_STAT]['RETIRED_INSTRUCTIONS'],
+                         {'Sum': '29907401', 'Min': '7466180', 'Max': '7490212', 'Avg': '7476850.25'})
+        self.assertEqual(run.tables[METRIC_STAT]['CPI']['Avg'], '0.550525')
+        self.assertEqual(run.get_metric('Runtime (RDTSC) [s]', 'Max'), 0.001688)
+        self.assertEqual(run.get_metric('RETIRED_INSTRUCTIONS', value_type=int), 29907401)
+        self.assertIsNone(run.get_metric('L2 accesses'))
+
+    def test_streaming_matches_block_tokenizer(self):
+        # Fed one line at a time as it is printed, e.g. by hpc_tools.likwid_live
+        for block in self.blocks[1:]:
+            parser = RunParser(block[0].rstrip('\n'))
+            for line in ''.join(block[1:]).splitlines(keepends=True):
+                parser.feed(line)
+            self.assertEqual(parser.run.tables, tokenize_run(block).tables)
+            self.assertEqual(parser.run.chrono, tokenize_run(block).chrono)
+
+
+class ParseTest(unittest.TestCase):
+
+    def test_rows(self):
+        rows, stdout = parse()
+
+        self.assertEqual(rows, EXPECTED_ROWS)
+        self.assertIn("Could not parse command line", stdout)  # the text before the first run
+
+    def test_cached_runs_are_reused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = RunCache(directory)
+            first, _ = parse(cache)
+            second, stdout = parse(cache)
+
+        self.assertEqual(second, first)
+        self.assertIn("Reused 5 cached run(s), parsed 0 run(s)", stdout)
+
+
+class MergeTest(unittest.TestCase):
+
+    def test_reruns_are_joined_run_by_run(self):
+        rows, _ = parse()
+        flops = build_group_table(FLOPS_DP, rows[:2] + rows[1:2])  # the 4-thread run was rerun
+        l2 = build_group_table(GROUPS_BY_NAME['L2CACHE'], [
+            {**rows[0], L2_ACCESSES: 100, L2_MISSES: 10},
+            {**rows[1], L2_ACCESSES: 400, L2_MISSES: 40},
+            {**rows[1], L2_ACCESSES: 410, L2_MISSES: 41},
+        ])
+
+        merged = merge_group_tables({'FLOPS_DP': flops, 'L2CACHE': l2})
+
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(list(merged[L2_ACCESSES]), [100, 400, 410])
+        self.assertEqual(list(merged[NUM_THREADS]), [1, 4, 4])
+        self.assertNotIn('Run index', merged.columns)
+        self.assertEqual(list(merged[NUM_BLOCKS].isna()), [True, True, True])
+
+    def test_missing_runs_are_kept(self):
+        rows, _ = parse()
+        flops = build_group_table(FLOPS_DP, rows[:3])
+        l2 = build_group_table(GROUPS_BY_NAME['L2CACHE'], [{**rows[0], L2_ACCESSES: 100, L2_MISSES: 10}])
+
+        merged = merge_group_tables({'FLOPS_DP': flops, 'L2CACHE': l2})
+
+        self.assertEqual(len(merged), 3)
+        self.assertEqual(list(merged[L2_ACCESSES].isna()), [False, True, True])
+        self.assertEqual(merged[NUM_BLOCKS].iloc[-1], 16)
+
+
+if __name__ == '__main__':
+    unittest.main()
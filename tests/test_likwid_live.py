@@ -0,0 +1,84 @@
+"""
+Drives the live LIKWID runner through tests/fake-likwid-perfctr, a stand-in for likwid-perfctr.
+
+    python -m unittest discover -s tests
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.likwid import DP_MFLOPS, INSTRUCTION_COUNT, NUM_THREADS, PROBLEM_SIZE, RUNTIME_RDTSC
+from hpc_tools.likwid_live import GROUP, _run_live, store_rows
+from hpc_tools.sweep import PARAMS, RETURNCODE, ROWS, Sweep, available_cores, load_store
+
+FAKE_LIKWID = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake-likwid-perfctr')]
+
+COMMAND = ['-m', '-g', 'FLOPS_DP', '-C', '{cores}', './benchmark-basic-omp', '-N', '{N}']
+
+
+class RunLiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = os.path.join(self.directory.name, 'likwid.jsonl')
+        self.sweep = Sweep(COMMAND, {'N': [128, 512], 'threads': [1]})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def run_live(self, sweep=None, retry_failed=True):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return asyncio.run(_run_live(sweep or self.sweep, self.store, FAKE_LIKWID, available_cores()[:1], 1,
+                                         retry_failed))
+
+    def test_rows_are_extracted_from_streamed_output(self):
+        written = self.run_live()
+
+        self.assertEqual(len(written), 2)
+        self.assertEqual(load_store(self.store), written)
+        for record in written:
+            self.assertEqual(record[RETURNCODE], 0)
+            self.assertEqual(record[GROUP], 'FLOPS_DP')
+            row, = record[ROWS]
+            n = record[PARAMS]['N']
+            self.assertEqual(row[PROBLEM_SIZE], n)
+            self.assertEqual(row[NUM_THREADS], 1)
+            self.assertAlmostEqual(row[RUNTIME_RDTSC], n / 1000)
+            self.assertEqual(row[INSTRUCTION_COUNT], 1000 * n)
+            self.assertAlmostEqual(row[DP_MFLOPS], n)
+        self.assertEqual(len(store_rows(written)['FLOPS_DP']), 2)
+
+    def test_resume_skips_finished_runs(self):
+        self.run_live()
+        self.assertEqual(self.run_live(), [])
+        self.assertEqual(len(load_store(self.store)), 2)
+
+    def test_truncated_last_record_is_repaired(self):
+        self.run_live(Sweep(COMMAND, {'N': [128], 'threads': [1]}))
+        with open(self.store, 'a') as store_file:
+            store_file.write('{"params": {"N": 512')
+
+        written = self.run_live()
+
+        self.assertEqual([record[PARAMS]['N'] for record in written], [512])
+        self.assertEqual(len(load_store(self.store)), 2)
+
+    def test_failed_runs_are_stored_and_retried(self):
+        with mock.patch.dict(os.environ, {'FAKE_LIKWID_FAIL': '1'}):
+            failed = self.run_live()
+        self.assertTrue(all(record[RETURNCODE] == 1 and record[ROWS] == [] for record in failed))
+        self.assertEqual(self.run_live(retry_failed=False), [])
+
+        retried = self.run_live()
+
+        self.assertEqual([record[RETURNCODE] for record in retried], [0, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
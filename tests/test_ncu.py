@@ -0,0 +1,118 @@
+"""
+Parses the captured ncu logs in tests/data: ncu-text.log (default text report) and ncu-csv.log (--csv output in
+the long layout, with and without launch columns, and the --page raw layout).
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.ncu import DRAM_THROUGHPUT, SM_ACTIVE, TIME, TIME_UNIT, best_config, find_metric, metric_grids, parse_log
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+TEXT_LOG = os.path.join(DATA, 'ncu-text.log')
+CSV_LOG = os.path.join(DATA, 'ncu-csv.log')
+HEATMAP_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sobel-harness-instructional',
+                              'scripts', 'heatmap_plot_hw5.py')
+
+KERNEL = 'sobel_kernel_gpu'
+
+
+def times(records):
+    return {(record.threads_per_block, record.blocks): record.value
+            for record in records if record.metric.startswith(TIME)}
+
+
+class TextReportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = parse_log(TEXT_LOG)
+
+    def test_records(self):
+        self.assertEqual(len(self.records), 12)
+        self.assertEqual({record.kernel for record in self.records}, {KERNEL})
+        self.assertEqual({record.metric.split('.')[0] for record in self.records}, {TIME, SM_ACTIVE, DRAM_THROUGHPUT})
+
+    def test_times_are_converted_to_milliseconds(self):
+        self.assertTrue(all(record.unit == TIME_UNIT for record in self.records if record.metric.startswith(TIME)))
+        self.assertAlmostEqual(times(self.records)[(32, 1)], 0.24567)  # 245.67 usecond
+        self.assertAlmostEqual(times(self.records)[(64, 1)], 0.18)  # 0.18 msecond
+        self.assertEqual({record.unit for record in self.records if not record.metric.startswith(TIME)}, {'%'})
+
+    def test_launch_configuration(self):
+        # (32, 4): the (grid)x(block) kernel header. (64, 1): no dimensions in the header, the 'Working on config'
+        # line. (64, 4): the header, although the last announced configuration is still N=64, B=1.
+        self.assertEqual(sorted(times(self.records)), [(32, 1), (32, 4), (64, 1), (64, 4)])
+        self.assertAlmostEqual(times(self.records)[(64, 4)], 0.03072)
+
+    def test_metric_grids(self):
+        grids = metric_grids(self.records)
+
+        self.assertEqual(len(grids), 3)
+        grid = grids[find_metric(grids, TIME, KERNEL)]
+        self.assertEqual(list(grid.index), [32, 64])
+        self.assertEqual(list(grid.columns), [1, 4])
+        self.assertEqual(grid.attrs['unit'], TIME_UNIT)
+        self.assertAlmostEqual(grid.loc[32, 4], 0.06144)
+
+    def test_best_config(self):
+        grids = metric_grids(self.records)
+
+        self.assertEqual(best_config(grids[find_metric(grids, TIME)]), (64, 4))
+        self.assertEqual(best_config(grids[find_metric(grids, SM_ACTIVE)], minimize=False), (32, 4))
+
+
+class CsvReportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.records = parse_log(CSV_LOG)
+
+    def test_records(self):
+        self.assertEqual(len(self.records), 9)  # the non-numeric 'Function Cache Configuration' is skipped
+        self.assertEqual({record.kernel for record in self.records}, {KERNEL})
+
+    def test_times_are_converted_to_milliseconds(self):
+        self.assertAlmostEqual(times(self.records)[(128, 16)], 1.0245)  # '1,024.50' usecond
+        self.assertAlmostEqual(times(self.records)[(128, 64)], 0.29811)  # 298.11 usecond
+        self.assertAlmostEqual(times(self.records)[(256, 16)], 0.512768)  # '512,768' nsecond, raw page unit row
+
+    def test_launch_configuration(self):
+        # (128, 16) and (256, 16): the 'Block Size'/'Grid Size' columns. (128, 64): no launch columns, the
+        # 'Working on config' line.
+        self.assertEqual(sorted(times(self.records)), [(128, 16), (128, 64), (256, 16)])
+
+    def test_metric_grids_and_best_config(self):
+        grids = metric_grids(self.records)
+        grid = grids[find_metric(grids, TIME, KERNEL)]
+
+        self.assertEqual(list(grid.index), [128, 256])
+        self.assertEqual(list(grid.columns), [16, 64])
+        self.assertTrue(grid.isna().loc[256, 64])
+        self.assertEqual(best_config(grid), (128, 64))
+        self.assertEqual(best_config(grids[find_metric(grids, DRAM_THROUGHPUT)], minimize=False), (128, 64))
+
+
+@unittest.skipUnless(importlib.util.find_spec('matplotlib'), "matplotlib is not installed")
+class HeatmapScriptTest(unittest.TestCase):
+
+    def test_plots_both_logs(self):
+        spec = importlib.util.spec_from_file_location('heatmap_plot_hw5', HEATMAP_SCRIPT)
+        heatmap = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(heatmap)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'heatmap.pdf')
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                self.assertEqual(heatmap.main([TEXT_LOG, CSV_LOG, '--output', output]), 0)
+            self.assertTrue(os.path.exists(output))
+        self.assertIn("fastest configuration is N=64 threads per block, B=4 blocks", stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""
+Compares synthetic dgemm runs with a baseline using hpc_tools.regression, one configuration per status.
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import BLOCK_SIZE, KERNEL, MFLOPS, N, RUNTIME, THREADS, TRIAL, VARIANT
+from hpc_tools.regression import (BASELINE, CHANGE, IMPROVEMENT, INSUFFICIENT, NEW, REGRESSION, SIGNIFICANT, STATUS,
+                                  TESTED, UNCHANGED, compare, load_baseline, main, update_baseline)
+from hpc_tools.storage import write_table
+
+# Runtime noise of +-2 %, in a different order for the baseline and the new runs
+NOISE = np.array([1.0, 1.01, 0.99, 1.02, 0.98, 1.0, 1.01, 0.99])
+TRIALS = len(NOISE)
+
+# The new runtime relative to the baseline, and the number of new trials, per problem size
+CHANGES = {
+    64: (1.0, TRIALS),
+    128: (1.25, TRIALS),
+    256: (0.8, TRIALS),
+    512: (1.03, TRIALS),  # significant, but within the 5 % threshold
+    1024: (1.5, 2),  # too few trials for the significance test
+}
+EXPECTED = {64: UNCHANGED, 128: REGRESSION, 256: IMPROVEMENT, 512: UNCHANGED, 1024: INSUFFICIENT, 2048: NEW}
+
+
+def runs(runtimes_by_n):
+    return pd.DataFrame([{KERNEL: 'dgemm', VARIANT: 'blas', N: n, THREADS: 1, BLOCK_SIZE: np.nan,
+                          RUNTIME: runtime, TRIAL: trial}
+                         for n, runtimes in runtimes_by_n.items() for trial, runtime in enumerate(runtimes)])
+
+
+def scaled(n):
+    return 2 * n**3 / 1e10  # 10 GFLOP/s
+
+
+BASELINE_RUNS = runs({n: scaled(n) * NOISE for n in CHANGES})
+NEW_RUNS = runs({**{n: scaled(n) * factor * NOISE[::-1][:count] for n, (factor, count) in CHANGES.items()},
+                 2048: scaled(2048) * NOISE})
+
+
+def quiet_compare(baseline, new_runs):
+    # Without a machine profile, the nominal peak bandwidth is used with a note on stderr
+    with contextlib.redirect_stderr(io.StringIO()):
+        return compare(baseline, new_runs)
+
+
+class CompareTest(unittest.TestCase):
+
+    def setUp(self):
+        self.report = quiet_compare(BASELINE_RUNS, NEW_RUNS).set_index(N)
+
+    def test_statuses(self):
+        self.assertEqual(self.report[STATUS].to_dict(), EXPECTED)
+
+    def test_change(self):
+        change = self.report[CHANGE]
+
+        self.assertAlmostEqual(change[64], 0.0)
+        self.assertAlmostEqual(change[128], 1 / 1.25 - 1)
+        self.assertAlmostEqual(change[256], 1 / 0.8 - 1)
+        self.assertAlmostEqual(self.report.loc[256, MFLOPS], 10_000 / 0.8)
+        self.assertTrue(np.isnan(change[2048]))
+        self.assertTrue(np.isnan(self.report.loc[2048, BASELINE + MFLOPS]))
+
+    def test_significance(self):
+        self.assertEqual(self.report[TESTED].to_dict(), {n: n != 1024 and n != 2048 for n in EXPECTED})
+        self.assertFalse(self.report.loc[64, SIGNIFICANT])
+        self.assertTrue(self.report.loc[512, SIGNIFICANT])
+        self.assertFalse(self.report.loc[1024, SIGNIFICANT])
+
+    def test_no_baseline(self):
+        report = quiet_compare(load_baseline(os.path.join(tempfile.gettempdir(), 'no-such-baseline')), NEW_RUNS)
+
+        self.assertEqual(set(report[STATUS]), {NEW})
+
+
+class BaselineTest(unittest.TestCase):
+
+    def test_update_replaces_configurations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline')
+            update_baseline(path, BASELINE_RUNS)
+            updated = update_baseline(path, NEW_RUNS[NEW_RUNS[N] == 1024])
+
+            self.assertEqual(len(load_baseline(path)), len(updated))
+        self.assertEqual(updated.groupby(N).size().to_dict(), {64: 8, 128: 8, 256: 8, 512: 8, 1024: 2})
+        self.assertEqual(sorted(updated[updated[N] == 1024][RUNTIME]), sorted(scaled(1024) * 1.5 * NOISE[::-1][:2]))
+
+
+class MainTest(unittest.TestCase):
+
+    def check(self, directory, new_runs):
+        path = os.path.join(directory, 'new')
+        write_table(new_runs, path)
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(io.StringIO()):
+            status = main(['check', '--baseline', os.path.join(directory, 'baseline'), '--runs', path])
+        return status, stdout.getvalue()
+
+    def test_exit_code(self):
+        with tempfile.TemporaryDirectory() as directory:
+            write_table(BASELINE_RUNS, os.path.join(directory, 'baseline'))
+            status, stdout = self.check(directory, NEW_RUNS)
+            self.assertEqual(status, 1)
+            self.assertIn("1 regression, 1 improvement, 2 unchanged, 1 new, 1 insufficient samples", stdout)
+
+            status, _ = self.check(directory, NEW_RUNS[NEW_RUNS[N] != 128])
+            self.assertEqual(status, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
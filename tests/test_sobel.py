@@ -0,0 +1,171 @@
+"""
+Checks that the NumPy Sobel reference of hpc_tools.sobel computes what sobel-harness-instructional/sobel_cpu.cpp
+computes: against a per-pixel port of sobel_filtered_pixel() on small images, against the compiled sobel_cpu.cpp
+when g++ is available, for every band size and thread count, and on memory-mapped raw images.
+
+    python -m unittest discover -s tests
+"""
+import contextlib
+import io
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import RUNTIME, TRIAL, VARIANT
+from hpc_tools.rawimage import create_raw, open_raw, read_dims
+from hpc_tools.sobel import (GX, GY, ONE_OVER_255, PIXELS, PIXELS_PER_SECOND, REFERENCE_VARIANT, main, read_baseline,
+                             sobel, sobel_file)
+from hpc_tools.storage import read_table
+
+SOBEL_CPU = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'sobel-harness-instructional',
+                         'sobel_cpu.cpp')
+
+
+def cpp_weights(name):
+    """
+    Returns the weights `float <name>[] = {...}` of do_sobel_filtering() in sobel_cpu.cpp, as a 3x3 array.
+    """
+    with open(SOBEL_CPU) as f:
+        values = re.search(rf'float {name}\[\] = \{{([^}}]*)\}}', f.read()).group(1)
+    return np.array([float(value) for value in values.split(',')], dtype=np.float32).reshape(3, 3)
+
+
+def pixel_loop(src):
+    """
+    Ports sobel_cpu.cpp pixel by pixel: bytes to floats in double precision, float accumulation over the 3x3
+    neighbourhood in row-major order, sqrt and clamp in float, and the truncating cast of the double product to bytes.
+    """
+    rows, cols = src.shape
+    s = (src.astype(np.float64) * ONE_OVER_255).astype(np.float32)
+    gx, gy = cpp_weights('Gx').ravel(), cpp_weights('Gy').ravel()
+    out = np.zeros(src.shape, dtype=np.uint8)
+    for j in range(1, rows - 1):
+        for i in range(1, cols - 1):
+            a = b = np.float32(0.0)
+            for idx, (row, col) in enumerate((row, col) for row in (-1, 0, 1) for col in (-1, 0, 1)):
+                val = s[j + row, i + col]
+                a = np.float32(a + val * gx[idx])
+                b = np.float32(b + val * gy[idx])
+            g = min(max(np.sqrt(a * a + b * b), np.float32(0.0)), np.float32(1.0))
+            out[j, i] = int(np.float64(g) * 255.0)
+    return out
+
+
+def random_image(rows, cols, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, size=(rows, cols), dtype=np.uint8)
+
+
+class OracleTest(unittest.TestCase):
+
+    def test_weights_match_sobel_cpu(self):
+        np.testing.assert_array_equal(GX, cpp_weights('Gx'))
+        np.testing.assert_array_equal(GY, cpp_weights('Gy'))
+
+    def test_matches_the_pixel_loop(self):
+        for seed, (rows, cols) in enumerate([(17, 23), (3, 3), (5, 40)]):
+            src = random_image(rows, cols, seed)
+            np.testing.assert_array_equal(sobel(src, threads=1), pixel_loop(src))
+
+    def test_smooth_gradients_are_truncated_like_the_loop(self):
+        # Small gradients keep G below the clamp, so every byte goes through the truncating cast
+        y, x = np.mgrid[0:12, 0:16]
+        src = (3 * x + 5 * y + (x * y) % 7).astype(np.uint8)
+
+        result = sobel(src, threads=1)
+
+        np.testing.assert_array_equal(result, pixel_loop(src))
+        self.assertTrue(((result[1:-1, 1:-1] > 0) & (result[1:-1, 1:-1] < 255)).all())
+
+    def test_boundary_is_zero(self):
+        result = sobel(random_image(9, 11), threads=1)
+
+        for edge in (result[0], result[-1], result[:, 0], result[:, -1]):
+            self.assertFalse(edge.any())
+
+    def test_strong_edges_are_clamped(self):
+        src = np.zeros((6, 8), dtype=np.uint8)
+        src[:, 4:] = 255
+
+        result = sobel(src, threads=1)
+
+        self.assertEqual(list(result[2]), [0, 0, 0, 255, 255, 0, 0, 0])
+        np.testing.assert_array_equal(sobel(np.ascontiguousarray(src.T), threads=1), result.T)
+
+    def test_images_without_interior_are_zero(self):
+        for shape in [(1, 5), (2, 7), (6, 2)]:
+            self.assertFalse(sobel(random_image(*shape), threads=1).any())
+
+
+class BandTest(unittest.TestCase):
+
+    def test_bands_and_threads_do_not_change_the_result(self):
+        src = random_image(37, 29)
+        expected = pixel_loop(src)
+
+        for band_rows in (1, 2, 3, 7, 36, 37, 256):
+            for threads in (1, 4):
+                with self.subTest(band_rows=band_rows, threads=threads):
+                    np.testing.assert_array_equal(sobel(src, band_rows=band_rows, threads=threads), expected)
+
+
+class RawImageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.directory.name, 'input')
+        self.output = os.path.join(self.directory.name, 'output.dat')
+        self.src = random_image(40, 24, seed=3)
+        image = create_raw(self.input, 24, 40)
+        image[:] = self.src
+        image.flush()
+        del image
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_memory_mapped_file(self):
+        elapsed, pixels_per_second = sobel_file(self.input, self.output, band_rows=8, threads=2)
+
+        self.assertEqual(read_dims(self.output), (24, 40))
+        np.testing.assert_array_equal(open_raw(self.output), sobel(self.src, threads=1))
+        self.assertAlmostEqual(pixels_per_second * elapsed, self.src.size)
+
+    def test_run_table(self):
+        table = os.path.join(self.directory.name, 'sobel_numpy')
+        with contextlib.redirect_stdout(io.StringIO()):
+            main([self.input, self.output, '--threads', '2', '-R', '3', '--table', table])
+
+        runs = read_table(table)
+        self.assertEqual(list(runs[TRIAL]), [0, 1, 2])
+        self.assertEqual(set(runs[VARIANT]), {REFERENCE_VARIANT})
+        self.assertEqual(set(runs[PIXELS]), {24 * 40})
+        np.testing.assert_allclose(runs[PIXELS_PER_SECOND] * runs[RUNTIME], 24 * 40)
+        self.assertEqual(read_baseline(table), (sorted(runs[RUNTIME])[1], 24 * 40))
+
+
+@unittest.skipUnless(shutil.which('g++'), "g++ is not installed")
+class CompiledTest(unittest.TestCase):
+
+    def test_matches_sobel_cpu(self):
+        with tempfile.TemporaryDirectory() as directory:
+            binary = os.path.join(directory, 'sobel_cpu')
+            subprocess.run(['g++', '-O2', '-std=c++17', '-fopenmp', SOBEL_CPU, '-o', binary], check=True)
+            src = random_image(61, 83, seed=4)
+            image = create_raw(os.path.join(directory, 'input'), 83, 61)
+            image[:] = src
+            image.flush()
+            output = os.path.join(directory, 'output.dat')
+            subprocess.run([binary, os.path.join(directory, 'input'), output], check=True, capture_output=True)
+
+            np.testing.assert_array_equal(open_raw(output), sobel(src, band_rows=16, threads=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
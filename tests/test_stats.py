@@ -0,0 +1,133 @@
+"""
+Checks warm-up detection and the vectorized bootstrap of hpc_tools.stats on synthetic trials.
+
+    python -m unittest discover -s tests
+"""
+import os
+import sys
+import unittest
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from hpc_tools.metrics import BLOCK_SIZE, CI_HIGH, CI_LOW, KERNEL, N, RUNTIME, THREADS, TRIAL, VARIANT
+from hpc_tools.stats import (MAD, SAMPLES, WARMUP_SAMPLES, bootstrap_median_ci, bootstrap_medians, detect_warmup,
+                             padded_samples, summarize_trials)
+
+
+def trials(runtimes_by_n):
+    """
+    Returns a run table with one configuration per problem size and the given runtimes as its trials.
+    """
+    return pd.DataFrame([{KERNEL: 'sum', VARIANT: 'direct', N: n, THREADS: 1, BLOCK_SIZE: np.nan,
+                          RUNTIME: runtime, TRIAL: trial}
+                         for n, runtimes in runtimes_by_n.items() for trial, runtime in enumerate(runtimes)])
+
+
+def warmup_by_n(runs):
+    warmup = detect_warmup(runs)
+    return {n: list(warmup[runs[N] == n]) for n in runs[N].unique()}
+
+
+class WarmupTest(unittest.TestCase):
+
+    def test_leading_slow_trials(self):
+        runs = trials({1: [5.0, 3.0, 1.0, 1.01, 0.99, 1.0, 1.02, 0.98],
+                       2: [1.0, 1.01, 0.99, 1.0, 1.02, 0.98]})
+
+        self.assertEqual(warmup_by_n(runs), {1: [True, True] + [False] * 6, 2: [False] * 6})
+
+    def test_slow_trial_after_a_fast_one_is_noise(self):
+        runs = trials({1: [1.0, 1.5, 1.0, 1.01, 0.99, 1.0]})
+
+        self.assertEqual(warmup_by_n(runs), {1: [False] * 6})
+
+    def test_slow_trial_in_the_second_half_is_kept(self):
+        runs = trials({1: [1.0, 1.01, 0.99, 5.0]})
+
+        self.assertEqual(warmup_by_n(runs), {1: [False] * 4})
+
+    def test_few_trials(self):
+        # Two trials: the first is dropped if more than 5% slower, as the BLAS "conditioning" run
+        runs = trials({1: [2.0], 2: [1.2, 1.0], 3: [1.03, 1.0]})
+
+        self.assertEqual(warmup_by_n(runs), {1: [False], 2: [True, False], 3: [False, False]})
+
+    def test_mask_is_aligned_with_the_table(self):
+        runs = trials({1: [5.0, 1.0, 1.0, 1.0], 2: [1.0, 1.0, 1.0, 1.0]})
+        shuffled = runs.sample(frac=1, random_state=1)
+
+        warmup = detect_warmup(shuffled)
+
+        self.assertTrue(warmup.index.equals(shuffled.index))
+        self.assertEqual(list(shuffled[warmup][RUNTIME]), [5.0])
+        self.assertEqual(list(shuffled[warmup][TRIAL]), [0])
+
+
+class BootstrapTest(unittest.TestCase):
+
+    def setUp(self):
+        runs = trials({1: [3.0], 2: [1.0, 2.0, 3.0, 4.0, 5.0], 3: [2.0, 2.0, 2.0]})
+        self.configs, self.padded, self.counts = padded_samples(runs)
+
+    def test_padded_samples(self):
+        self.assertEqual(list(self.configs[N]), [1, 2, 3])
+        self.assertEqual(list(self.counts), [1, 5, 3])
+        self.assertEqual(self.padded.shape, (3, 5))
+        self.assertTrue(np.isnan(self.padded[0, 1:]).all())
+        self.assertEqual(list(self.padded[1]), [1.0, 2.0, 3.0, 4.0, 5.0])
+
+    def test_resamples_stay_within_each_configuration(self):
+        medians = bootstrap_medians(self.padded, self.counts, n_boot=200)
+
+        self.assertEqual(medians.shape, (3, 200))
+        self.assertTrue((medians[0] == 3.0).all())  # the padding is never drawn
+        self.assertTrue(((medians[1] >= 1.0) & (medians[1] <= 5.0)).all())
+        self.assertGreater(len(np.unique(medians[1])), 1)
+        self.assertTrue((medians[2] == 2.0).all())
+
+    def test_confidence_interval(self):
+        low, high = bootstrap_median_ci(self.padded, self.counts)
+
+        self.assertEqual((low[0], high[0]), (3.0, 3.0))
+        self.assertEqual((low[2], high[2]), (2.0, 2.0))
+        self.assertLess(low[1], 3.0)
+        self.assertGreater(high[1], 3.0)
+        self.assertGreaterEqual(low[1], 1.0)
+        self.assertLessEqual(high[1], 5.0)
+
+    def test_seed_makes_it_reproducible(self):
+        first = bootstrap_median_ci(self.padded, self.counts, seed=7)
+        second = bootstrap_median_ci(self.padded, self.counts, seed=7)
+
+        np.testing.assert_array_equal(first, second)
+
+
+class SummarizeTest(unittest.TestCase):
+
+    def test_summary(self):
+        runs = trials({1: [5.0, 1.0, 1.2, 0.8, 1.0, 1.0], 2: [2.0, 2.0, 3.0]})
+
+        summary = summarize_trials(runs).set_index(N)
+
+        self.assertEqual(list(summary.index), [1, 2])
+        self.assertEqual(list(summary[SAMPLES]), [5, 3])
+        self.assertEqual(list(summary[WARMUP_SAMPLES]), [1, 0])
+        self.assertEqual(list(summary[RUNTIME]), [1.0, 2.0])
+        self.assertEqual(list(summary[RUNTIME + MAD]), [0.0, 0.0])
+        self.assertTrue((summary[RUNTIME + CI_LOW] <= summary[RUNTIME]).all())
+        self.assertTrue((summary[RUNTIME + CI_HIGH] >= summary[RUNTIME]).all())
+
+    def test_keep_warmup(self):
+        runs = trials({1: [5.0, 1.0, 1.0, 1.0]})
+
+        summary = summarize_trials(runs, drop_warmup=False)
+
+        self.assertEqual(summary[SAMPLES].iloc[0], 4)
+        self.assertEqual(summary[WARMUP_SAMPLES].iloc[0], 0)
+        self.assertGreater(summary[RUNTIME + CI_HIGH].iloc[0], 1.0)  # the warm-up trial widens the interval
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,43 +1,49 @@
-import pandas as pd
+import argparse
+import os
+import sys
 
-problems = ["basic", "vector", "blas"] + [f"openmp-{n}" for n in (1, 4, 16, 64)]
-input_dfs = [pd.read_csv(f"data/{problem}.csv") for problem in problems]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hpc_tools import reference
+from hpc_tools.metrics import BANDWIDTH, MFLOPS, SPEEDUP, VARIANT, RunSource, compute_metrics, load_runs, write_pivot
+from hpc_tools.stats import summarize_trials
+from hpc_tools.storage import write_table
 
-n_to_flops = lambda n: 2*n**2
+threads = (1, 4, 16, 64)
+parallel_variants = [f"openmp-{n}" for n in threads]
 
-# Compare basic with vecotrized and blas
-serial = pd.DataFrame()
-serial["N"] = input_dfs[0]["N"]
 
-serial["basic"] = n_to_flops(input_dfs[0]["N"]) / input_dfs[0]["t"] / 10**6
-serial["vectorized"] = n_to_flops(input_dfs[1]["N"]) / input_dfs[1]["t"] / 10**6
-serial["blas"] = n_to_flops(input_dfs[2]["N"]) / input_dfs[2]["t"] / 10**6
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Aggregates the dgemv runs into metric tables.")
+    arg_parser.add_argument('--data', default="data",
+                            help="The directory of the result files and tables (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+    data = args.data
 
-serial.to_csv("data/mflops_serial.csv", index=False)
+    sources = [RunSource("basic", os.path.join(data, "basic")), RunSource("vectorized", os.path.join(data, "vector")),
+               RunSource("blas", os.path.join(data, "blas"))]
+    sources += [RunSource(f"openmp-{n}", os.path.join(data, f"openmp-{n}"), threads=n) for n in threads]
+    # The NumPy reference (see hpc_tools/reference.py) is an extra series, if it was run
+    sources += reference.sources("dgemv", data)
 
+    runs = load_runs("dgemv", sources)
+    # Median over the repetitions of each problem size, without warm-up trials (such as the first N=1024 run)
+    metrics = compute_metrics(summarize_trials(runs))
+    write_table(metrics, os.path.join(data, "metrics"))
 
-# Compare best parallel to blas
-best_idx = 5
-parallel = pd.DataFrame()
-parallel["N"] = input_dfs[0]["N"]
-parallel["blas"] = n_to_flops(input_dfs[2]["N"]) / input_dfs[2]["t"] / 10**6
-parallel[problems[best_idx]] = n_to_flops(input_dfs[best_idx]["N"]) / input_dfs[best_idx]["t"] / 10**6
-parallel.to_csv("data/mflops_parallel.csv", index=False)
+    # Compare basic with vecotrized, blas and numpy
+    write_pivot(metrics, MFLOPS, os.path.join(data, "mflops_serial"), ["basic", "vectorized", "blas", reference.NUMPY])
 
-# Calculate speedup
-speedup = pd.DataFrame()
-speedup["N"] = input_dfs[0]["N"]
-for i in range(3, 7):
-    speedup[problems[i]] = input_dfs[0]["t"] / input_dfs[i]["t"] 
+    # Compare best parallel to blas, the best variant has the highest median MFLOP/s over all problem sizes
+    parallel = metrics[metrics[VARIANT].isin(parallel_variants)]
+    best = parallel.groupby(VARIANT)[MFLOPS].median().idxmax()
+    write_pivot(metrics, MFLOPS, os.path.join(data, "mflops_parallel"), ["blas", best])
 
-speedup.to_csv("data/speedup.csv", index=False)
+    # Calculate speedup
+    write_pivot(metrics, SPEEDUP, os.path.join(data, "speedup"), parallel_variants)
 
-# Calculate memory bandwidth for CBLAS, Basic, OMP 1-64
-C = 204.8e9  # 204.8 GB/s
-n_to_bytes = lambda n: 2*n + 2*n**2 * 8
-bandwidth = pd.DataFrame()
-bandwidth["N"] = input_dfs[0]["N"]
-bandwidth["basic"] = n_to_bytes(input_dfs[0]["N"]) / input_dfs[0]["t"] / C
-for i in range(2, 7):
-    bandwidth[problems[i]] = (n_to_bytes(input_dfs[i]["N"]) / input_dfs[i]["t"]) / C
-bandwidth.to_csv("data/bandwidth.csv", index=False)
+    # Calculate memory bandwidth for CBLAS, Basic, OMP 1-64
+    write_pivot(metrics, BANDWIDTH, os.path.join(data, "bandwidth"), ["basic", "blas"] + parallel_variants)
+
+
+if __name__ == "__main__":
+    main()
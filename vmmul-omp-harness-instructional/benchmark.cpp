@@ -3,12 +3,17 @@
 // benchmark-* harness for running different versions of vector-matrix multiply
 //    over different problem sizes
 //
-// usage: no command line arguments
+// usage: [-R repetitions]
 // set problem sizes in the code below
+//
+// -R sets the number of timed repetitions per problem size (default 1). Every repetition
+// prints its own row, so the analysis can drop warm-up samples and compute statistics.
 
 #include <cblas.h>
 #include <string.h>
+#include <unistd.h>
 
+#include <algorithm>
 #include <chrono>
 #include <cmath>  // For: fabs
 #include <iomanip>
@@ -47,6 +52,12 @@ bool check_accuracy(double* A, double* Anot, int nvalues) {
 
 /* The benchmarking program */
 int main(int argc, char** argv) {
+	int n_reps = 1;
+	int c;
+	while ((c = getopt(argc, argv, "R:")) != -1) {
+		if (c == 'R') n_reps = std::max(1, std::atoi(optarg));
+	}
+
 	std::cerr << "Description:\t" << dgemv_desc << std::endl << std::endl;
 
 	std::cout << std::fixed << std::setprecision(5);
@@ -86,17 +97,22 @@ int main(int argc, char** argv) {
 		memcpy((void*) Xcopy, (const void*) X, sizeof(double) * n);
 		memcpy((void*) Ycopy, (const void*) Y, sizeof(double) * n);
 
-		// insert start timer code here
+		for (int rep = 0; rep < n_reps; rep++) {
+			// every repetition starts from the original Y, so the result can still be verified
+			memcpy((void*) Y, (const void*) Ycopy, sizeof(double) * n);
 
-		auto start_time = std::chrono::high_resolution_clock::now();
-		// call the method to do the work
-		my_dgemv(n, A, X, Y);
+			// insert start timer code here
 
-		// insert end timer code here, and print out the elapsed time for this problem size
+			auto start_time = std::chrono::high_resolution_clock::now();
+			// call the method to do the work
+			my_dgemv(n, A, X, Y);
 
-		auto end_time = std::chrono::high_resolution_clock::now();
-		std::chrono::duration<double> elapsed = end_time - start_time;
-		std::cout << n << "," << elapsed.count() << std::endl;
+			// insert end timer code here, and print out the elapsed time for this problem size
+
+			auto end_time = std::chrono::high_resolution_clock::now();
+			std::chrono::duration<double> elapsed = end_time - start_time;
+			std::cout << n << "," << elapsed.count() << std::endl;
+		}
 		// now invoke the cblas method to compute the matrix-vector multiplye
 		reference_dgemv(n, Acopy, Xcopy, Ycopy);
 
@@ -0,0 +1,31 @@
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from hpc_tools.pipeline import Stage, main
+from plot_data import figures
+
+threads = (1, 4, 16, 64)
+raw = ["data/basic.csv", "data/vector.csv", "data/blas.csv", "data/openmp-*.csv", "data/numpy.csv"]
+tables = ["data/metrics"] + [f"data/{name}{band}" for name in ("mflops_serial", "mflops_parallel", "speedup", "bandwidth")
+                             for band in ("", "_low", "_high")]
+
+# Raw benchmark output (job scripts, ../hpc_tools/reference.py) -> aggregated tables -> roofline and one stage per figure
+stages = [
+    Stage("aggregate", [sys.executable, "aggregator.py"], raw + ["aggregator.py"], tables),
+    Stage("roofline", [sys.executable, "plot_roofline.py"], ["data/metrics", "plot_roofline.py"],
+          ["data/roofline", "roofline.pdf"]),
+    Stage("scaling", [sys.executable, "../hpc_tools/scaling.py", "--runs", "data/metrics",
+                      "--variants", ",".join(f"openmp-{n}" for n in threads), "--as", "openmp",
+                      "--output", "data/scaling", "--plot", "scaling.pdf", "--title", "Strong scaling of OpenMP DGEMV",
+                      "--weak-plot", "weak_scaling.pdf", "--weak-title", "Weak scaling of OpenMP DGEMV"],
+          ["data/metrics", "../hpc_tools/scaling.py"],
+          ["data/scaling", "data/scaling_fits", "data/scaling_weak", "data/scaling_weak_fits", "scaling.pdf",
+           "weak_scaling.pdf"]),
+]
+stages += [Stage(spec.output_name, [sys.executable, "plot_data.py", "--force", spec.output_name],
+                 spec.tables() + ["plot_data.py"], [spec.output_name]) for spec in figures]
+
+if __name__ == "__main__":
+    sys.exit(main(stages, HERE))
@@ -0,0 +1,28 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from hpc_tools.roofline import plot_roofline, points_from_metrics
+from hpc_tools.storage import read_table, write_table
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Computes and plots the roofline points of the VMMUL variants.")
+    arg_parser.add_argument('--input', default="data/metrics",
+                            help="The long-form metrics table written by aggregator.py (default: %(default)s)")
+    arg_parser.add_argument('--output', default="data/roofline", help="The roofline table (default: %(default)s)")
+    arg_parser.add_argument('--plot', default="roofline.pdf", help="The roofline plot (default: %(default)s)")
+    args = arg_parser.parse_args(argv)
+
+    points = points_from_metrics(read_table(args.input))
+    write_table(points, args.output)
+    print(points.to_string(index=False))
+
+    plot_roofline(points,
+                  args.plot,
+                  "Roofline of VMMUL variants:\nPerlmutter CPU Node, 64-bit floats")
+
+
+if __name__ == "__main__":
+    main()